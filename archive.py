@@ -0,0 +1,138 @@
+"""
+Raw HTML archive for the Trafikverket Scraper
+Stores every fetched result page once, compressed and addressed by the
+SHA-256 of its content, plus one JSON-lines index entry per fetch (URL,
+occasion, punkt, page metadata, fetch time). The archive can be re-parsed
+into the database later without touching the live site (cli.py reingest).
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    from config import ARCHIVE_DIRECTORY, ARCHIVE_COMPRESSION
+except ImportError:
+    ARCHIVE_DIRECTORY = "./archive"
+    ARCHIVE_COMPRESSION = 'zstd'
+
+
+COMPRESSIONS = {'zstd': '.html.zst', 'gzip': '.html.gz'}
+INDEX_FILE = "index.jsonl"
+
+
+def _compress(data, compression):
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=9)
+
+
+def _decompress(data, path):
+    if path.endswith(COMPRESSIONS['zstd']):
+        if zstandard is None:
+            raise ImportError(f"{path} is zstd-compressed; install it with: pip install zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class RawHtmlArchive:
+    """Content-addressed store of result pages with an append-only index"""
+
+    def __init__(self, directory=None, compression=None):
+        self.directory = directory or ARCHIVE_DIRECTORY
+        compression = compression or ARCHIVE_COMPRESSION
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown archive compression '{compression}', expected one of {tuple(COMPRESSIONS)}")
+        if compression == 'zstd' and zstandard is None:
+            compression = 'gzip'  # zstandard is optional
+        self.compression = compression
+        self.index_path = os.path.join(self.directory, INDEX_FILE)
+
+    def object_path(self, digest, compression=None):
+        """Relative path of a stored page: objects/<2 hex>/<sha256><ext>"""
+        return os.path.join('objects', digest[:2], digest + COMPRESSIONS[compression or self.compression])
+
+    def find_object(self, digest):
+        """Relative path of an already stored page in any compression, or None"""
+        for compression in COMPRESSIONS:
+            path = self.object_path(digest, compression)
+            if os.path.exists(os.path.join(self.directory, path)):
+                return path
+        return None
+
+    def store(self, html, url, occasion=None, text=None, metadata=None, page_url=None):
+        """Archive one fetched page; returns its SHA-256.
+
+        Identical pages are stored once; every call still adds an index entry.
+        """
+        data = html.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+
+        path = self.find_object(digest)
+        if path is None:
+            path = self.object_path(digest)
+            full_path = os.path.join(self.directory, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            # Written under a temporary name so readers never see a partial object
+            tmp_path = f"{full_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(_compress(data, self.compression))
+            os.replace(tmp_path, full_path)
+
+        metadata = metadata or {}
+        self._append({
+            'sha256': digest,
+            'path': path,
+            'size': len(data),
+            'url': url,
+            'page_url': page_url,
+            'occasion': occasion,
+            'text': text,
+            'punkt': metadata.get('punkt nummer'),
+            'metadata': metadata,
+            'fetched_at': datetime.now().isoformat(timespec='seconds'),
+        })
+        return digest
+
+    def _append(self, entry):
+        line = (json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8')
+        os.makedirs(self.directory, exist_ok=True)
+        # One O_APPEND write per entry, safe with several worker processes
+        fd = os.open(self.index_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def entries(self):
+        """All index entries in fetch order; skips a truncated last line"""
+        if not os.path.exists(self.index_path):
+            return []
+        entries = []
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+        return entries
+
+    def latest_entries(self):
+        """One entry per stored page (its most recent fetch)"""
+        latest = {}
+        for entry in self.entries():
+            latest[entry['sha256']] = entry
+        return list(latest.values())
+
+    def read(self, entry):
+        """HTML of an archived page"""
+        path = os.path.join(self.directory, entry['path'])
+        with open(path, 'rb') as f:
+            return _decompress(f.read(), path).decode('utf-8')
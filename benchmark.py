@@ -0,0 +1,329 @@
+"""
+Benchmark suite for the Trafikverket Scraper
+Runs TrafikverketScraper end to end against a local mock of the tmg104 pages
+(benchmark_server.py) and the local PostgreSQL, times every stage
+(navigate, form setup, popup, extract, parse, DB insert), adds
+micro-benchmarks of the value parsers and apply_translations, and saves the
+results as JSON so runs of different versions can be compared.
+
+Usage:
+  python benchmark.py --engine http --iterations 5
+  python benchmark.py --compare benchmark_results/benchmark_<old>.json
+"""
+
+import argparse
+import contextlib
+import functools
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+from datetime import datetime
+
+import pandas as pd
+from psycopg2 import sql
+
+import scraper as scraper_module
+from benchmark_server import BENCHMARK_PUNKT, VEHICLE_TYPE_HEADERS, MockTrafikverketServer
+from browser import BrowserSession
+from http_engine import create_session
+from instrumentation import Instrumentation
+from long_format import LONG_TABLE
+from rollups import ROLLUPS
+from scraper import ENGINES, TrafikverketScraper, connect_database, parse_count_value, parse_speed_value
+from translations import compile_translations, read_translation_file
+
+RESULTS_DIRECTORY = "benchmark_results"
+
+# Stage -> scraper methods timed for it, per engine. Times are exclusive:
+# a stage nested in another (e.g. parse inside extract) is not counted twice.
+BROWSER_STAGES = {
+    'navigate': ['navigate_to_page'],
+    'form_setup': ['configure_form_via_script', 'select_measurement_occasion',
+                   'check_all_checkboxes', 'select_table_format'],
+    'popup': ['click_start_button'],
+    'extract': ['extract_popup_table_data'],
+    'db_insert': ['insert_rows_to_database'],
+}
+HTTP_STAGES = {
+    'navigate': ['open_http_form'],
+    'popup': ['fetch_http_table'],
+    'extract': ['store_table'],
+    'db_insert': ['insert_rows_to_database'],
+}
+
+
+class StageTimer:
+    """Collects exclusive wall-clock samples per stage"""
+
+    def __init__(self):
+        self.samples = {}
+        self._nested = []  # Time spent in nested stages, one slot per open stage
+
+    def wrap(self, stage, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            self._nested.append(0.0)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                self.samples.setdefault(stage, []).append(elapsed - self._nested.pop())
+                if self._nested:
+                    self._nested[-1] += elapsed
+        return timed
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(1, int(round(fraction * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(samples):
+    """count/total/mean/p50/p95 (seconds) of one stage's samples"""
+    return {
+        'count': len(samples),
+        'total': sum(samples),
+        'mean': sum(samples) / len(samples),
+        'p50': percentile(samples, 0.50),
+        'p95': percentile(samples, 0.95),
+    }
+
+
+def instrument(scraper, timer, engine):
+    """Wrap the stage methods of one scraper instance with the timer"""
+    stages = HTTP_STAGES if engine == 'http' else BROWSER_STAGES
+    if engine == 'hybrid':
+        stages = dict(stages, popup=stages['popup'] + HTTP_STAGES['popup'])
+    for stage, methods in stages.items():
+        for name in methods:
+            setattr(scraper, name, timer.wrap(stage, getattr(scraper, name)))
+
+
+def delete_benchmark_rows(connection):
+    """Remove the mock point's rows so every iteration really inserts.
+
+    Its long rows and rollup rows (keyed by punkt nummer, so they hold only
+    benchmark data) go in the same transaction.
+    """
+    if connection is None:
+        return
+    cursor = connection.cursor()
+    for table in ['traffic_data', LONG_TABLE] + [table for table, _, _, _ in ROLLUPS.values()]:
+        cursor.execute("SELECT to_regclass(%s)", (f"public.{table}",))
+        if cursor.fetchone()[0] is not None:
+            cursor.execute(sql.SQL("DELETE FROM public.{} WHERE punkt_nummer = %s").format(sql.Identifier(table)),
+                           (BENCHMARK_PUNKT,))
+    connection.commit()
+    cursor.close()
+
+
+def run_end_to_end(args):
+    """Scrape the mock site `iterations` times; returns the end-to-end results"""
+    timer = StageTimer()
+    counters = {'rows_parsed': 0}
+    original_parse = scraper_module.parse_table_batch
+
+    def counted_parse(table, metadata):
+        batch, stats = original_parse(table, metadata)
+        counters['rows_parsed'] += stats['rows']
+        return batch, stats
+
+    runs = []
+    database = True
+    browser = BrowserSession(headless=args.headless) if args.engine != 'http' else None
+    http_session = create_session() if args.engine != 'selenium' else None
+    server = MockTrafikverketServer(args.occasions, args.rows, args.latency / 1000, args.viewstate_kb * 1024)
+    scraper_module.parse_table_batch = timer.wrap('parse', counted_parse)
+    try:
+        server.start()
+        if browser:
+            browser.start()  # Chrome start-up is not part of any stage
+        for iteration in range(1, args.iterations + 1):
+            log = io.StringIO()
+            with contextlib.redirect_stdout(log if not args.verbose else sys.stdout):
+                scraper = TrafikverketScraper(server.url, headless=args.headless, browser=browser,
+                                              engine=args.engine, http_session=http_session,
+                                              incremental=False, archive=False,
+                                              instrumentation=Instrumentation(log_file=''))
+                database = scraper.db_connection is not None
+                delete_benchmark_rows(scraper.db_connection)
+                instrument(scraper, timer, args.engine)
+                rows_before = counters['rows_parsed']
+                started = time.perf_counter()
+                summary = scraper.run()
+                elapsed = time.perf_counter() - started
+            rows = counters['rows_parsed'] - rows_before
+            runs.append({'elapsed': elapsed, 'rows_parsed': rows, 'rows_inserted': summary['rows_inserted'],
+                         'status': summary['status'], 'retries': sum(summary['retry_counts'].values())})
+            print(f"  Iteration {iteration}/{args.iterations}: {rows} rows in {elapsed:.2f}s "
+                  f"({rows / elapsed if elapsed else 0:.0f} rows/s, {summary['status']})")
+    finally:
+        scraper_module.parse_table_batch = original_parse
+        server.stop()
+        if browser:
+            browser.quit()
+        if http_session:
+            http_session.close()
+
+    if database:
+        connection = connect_database()
+        try:
+            delete_benchmark_rows(connection)
+        finally:
+            connection.close()
+    else:
+        print("  Warning: PostgreSQL not reachable, DB insert stage was not measured")
+
+    total_time = sum(run['elapsed'] for run in runs)
+    total_rows = sum(run['rows_parsed'] for run in runs)
+    return {
+        'database': database,
+        'runs': runs,
+        'rows_per_sec': total_rows / total_time if total_time else 0.0,
+        'stages': {stage: summarize(samples) for stage, samples in timer.samples.items()},
+    }
+
+
+def time_call(func, min_time=0.2):
+    """Seconds per call of `func`, timed over at least `min_time` seconds"""
+    timer = timeit.Timer(func)
+    loops, _ = timer.autorange()
+    loops = max(loops, int(loops * min_time / 0.2))
+    best = min(timer.repeat(repeat=3, number=loops))
+    return {'loops': loops, 'per_call': best / loops}
+
+
+def run_micro(args):
+    """Micro-benchmarks of parse_speed_value, parse_count_value and apply_translations"""
+    speeds = ['78,5', '0,0', '', '112,25', '  45,0 ', 'n/a']
+    counts = ['123', '0', '', '1500', ' 42 ', 'x']
+    translations = read_translation_file()
+    columns = ['Tidpunkt'] + [f'{name} {suffix}' for name in VEHICLE_TYPE_HEADERS for suffix in ('Antal', 'Medelhast')]
+    frame = pd.DataFrame({
+        column: [VEHICLE_TYPE_HEADERS[i % len(VEHICLE_TYPE_HEADERS)] if n % 2 else str(i)
+                 for i in range(args.micro_rows)]
+        for n, column in enumerate(columns)
+    })
+
+    results = {
+        'parse_speed_value': time_call(lambda: [parse_speed_value(value) for value in speeds]),
+        'parse_count_value': time_call(lambda: [parse_count_value(value) for value in counts]),
+        'apply_translations': time_call(lambda: compile_translations(translations).apply(frame.copy()), 1.0),
+    }
+    # Per value for the parsers, per row for the DataFrame translation
+    results['parse_speed_value']['per_item'] = results['parse_speed_value']['per_call'] / len(speeds)
+    results['parse_count_value']['per_item'] = results['parse_count_value']['per_call'] / len(counts)
+    results['apply_translations']['per_item'] = results['apply_translations']['per_call'] / args.micro_rows
+    results['apply_translations']['rows'] = args.micro_rows
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def print_results(results):
+    end_to_end = results.get('end_to_end')
+    if end_to_end:
+        print(f"\nEnd to end ({results['parameters']['engine']} engine): "
+              f"{end_to_end['rows_per_sec']:.0f} rows/s")
+        print(f"  {'stage':<12} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'total s':>9}")
+        for stage, stats in sorted(end_to_end['stages'].items(), key=lambda item: -item[1]['total']):
+            print(f"  {stage:<12} {stats['count']:>6} {stats['p50'] * 1000:>9.2f} "
+                  f"{stats['p95'] * 1000:>9.2f} {stats['total']:>9.2f}")
+    micro = results.get('micro')
+    if micro:
+        print("\nMicro-benchmarks:")
+        for name, stats in micro.items():
+            unit = 'row' if name == 'apply_translations' else 'value'
+            print(f"  {name:<20} {stats['per_item'] * 1e6:>9.3f} µs/{unit}")
+
+
+def compare(results, baseline_file):
+    """Print the change of the headline numbers against an earlier results file"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_file} (revision {baseline.get('revision')}):")
+
+    def line(name, old, new, higher_is_better=False):
+        if not old:
+            return
+        change = (new - old) / old * 100
+        better = change > 0 if higher_is_better else change < 0
+        print(f"  {name:<28} {old:>12.4g} -> {new:<12.4g} {change:+6.1f}% {'better' if better else 'worse'}")
+
+    old_e2e, new_e2e = baseline.get('end_to_end'), results.get('end_to_end')
+    if old_e2e and new_e2e:
+        line('rows/s', old_e2e['rows_per_sec'], new_e2e['rows_per_sec'], higher_is_better=True)
+        for stage, stats in new_e2e['stages'].items():
+            if stage in old_e2e['stages']:
+                line(f'{stage} p50 (s)', old_e2e['stages'][stage]['p50'], stats['p50'])
+                line(f'{stage} p95 (s)', old_e2e['stages'][stage]['p95'], stats['p95'])
+    for name, stats in (results.get('micro') or {}).items():
+        if name in (baseline.get('micro') or {}):
+            line(f'{name} (s/item)', baseline['micro'][name]['per_item'], stats['per_item'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the scraper against a local mock Trafikverket site')
+    parser.add_argument('--engine', choices=ENGINES, default='http',
+                        help='Scraping engine to benchmark (default: http, needs no Chrome)')
+    parser.add_argument('--iterations', type=int, default=3, help='End-to-end runs (default: 3)')
+    parser.add_argument('--occasions', type=int, default=10, help='Measurement occasions per run (default: 10)')
+    parser.add_argument('--rows', type=int, default=168, help='Rows per result table (default: 168, one week)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Mock server delay per response in ms (default: 0)')
+    parser.add_argument('--viewstate-kb', type=int, default=20, help='__VIEWSTATE size in KB (default: 20)')
+    parser.add_argument('--micro-rows', type=int, default=5000,
+                        help='DataFrame rows for the apply_translations benchmark (default: 5000)')
+    parser.add_argument('--skip-e2e', action='store_true', help='Only run the micro-benchmarks')
+    parser.add_argument('--skip-micro', action='store_true', help='Only run the end-to-end benchmark')
+    parser.add_argument('--headless', action=argparse.BooleanOptionalAction, default=True,
+                        help='Run Chrome headless for the selenium and hybrid engines (default: yes)')
+    parser.add_argument('-o', '--output', default=None,
+                        help=f'Results file (default: {RESULTS_DIRECTORY}/benchmark_<timestamp>.json)')
+    parser.add_argument('--compare', default=None, help='Earlier results file to compare against')
+    parser.add_argument('-v', '--verbose', action='store_true', help="Show the scraper's own output")
+    args = parser.parse_args()
+
+    results = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {name: value for name, value in vars(args).items() if name not in ('output', 'compare')},
+    }
+
+    if not args.skip_e2e:
+        print(f"Running {args.iterations} end-to-end iteration(s): {args.occasions} occasion(s) x {args.rows} rows, "
+              f"{args.latency:g} ms latency, {args.engine} engine")
+        results['end_to_end'] = run_end_to_end(args)
+    if not args.skip_micro:
+        print("Running micro-benchmarks...")
+        results['micro'] = run_micro(args)
+
+    print_results(results)
+
+    output = args.output or os.path.join(RESULTS_DIRECTORY, f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Local mock of the Trafikverket tmg104 pages for benchmarks
+Serves a request form (tmg104bestaellinfouttag.aspx) that behaves like the
+ASP.NET original closely enough for every engine, and result popups
+(tmg104visa.aspx) with a generated data table. Response latency, table size,
+number of occasions and __VIEWSTATE size are configurable.
+"""
+
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FORM_PATH = '/tmg101/AGS/tmg104bestaellinfouttag.aspx'
+RESULT_PATH = '/tmg101/AGS/tmg104visa.aspx'
+
+BENCHMARK_PUNKT = 'BENCH-0001'
+BENCHMARK_METADATA = {
+    'lblDLaen': 'Benchmarks län',
+    'lblDVaegnr': '999',
+    'lblDPunktnummer': BENCHMARK_PUNKT,
+    'lblDRiktning': 'Norr',
+}
+
+# Grouped vehicle type headers as Trafikverket renders them (see translation.txt)
+VEHICLE_TYPE_HEADERS = [
+    'Samtliga fordon', 'Tunga fordon', 'Personbil',
+    'Tunga fordon med släp', 'Tunga fordon utan släp',
+    'Treaxlig dragbil med släp', 'Tvåaxlig dragbil med släp',
+    'Treaxlig dragbil utan släp', 'Tvåaxlig dragbil utan släp',
+    'Personbil med släp', 'Personbil utan släp',
+]
+
+FIRST_OCCASION_START = datetime(2020, 1, 6)
+
+
+def occasion_start(value):
+    """First hour of an occasion: occasion N is the Nth week after FIRST_OCCASION_START"""
+    return FIRST_OCCASION_START + timedelta(weeks=int(value) - 1)
+
+
+def occasion_label(value):
+    start = occasion_start(value)
+    return f"{start:%Y-%m-%d} - {start + timedelta(days=6):%Y-%m-%d}"
+
+
+def render_form(occasions, viewstate_size, selected=None, popup_value=None):
+    """The request form, optionally with the script that opens a result popup"""
+    selected = selected or '1'
+    options = ''.join(
+        f'<option value="{value}"{" selected" if str(value) == selected else ""}>{occasion_label(value)}</option>'
+        for value in range(1, occasions + 1)
+    )
+    checkboxes = ''.join(
+        f'<input type="checkbox" name="chkFordon{i}" id="chkFordon{i}" value="on"/>'
+        f'<label for="chkFordon{i}">{escape(name)}</label><br/>'
+        for i, name in enumerate(VEHICLE_TYPE_HEADERS, 1)
+    )
+    spans = ''.join(f'<span id="{span_id}">{escape(text)}</span> ' for span_id, text in BENCHMARK_METADATA.items())
+    popup_script = ''
+    if popup_value is not None:
+        popup_script = (f"<script>window.open('tmg104visa.aspx?mt={popup_value}&punkt={BENCHMARK_PUNKT}',"
+                        f"'_blank');</script>")
+    return f"""<!DOCTYPE html>
+<html><head><title>Beställ information</title></head><body>
+<form method="post" action="tmg104bestaellinfouttag.aspx" id="form1">
+<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{'A' * viewstate_size}"/>
+<input type="hidden" name="__EVENTTARGET" id="__EVENTTARGET" value=""/>
+<input type="hidden" name="__EVENTARGUMENT" id="__EVENTARGUMENT" value=""/>
+<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="{'B' * 256}"/>
+<div>{spans}</div>
+<select name="ddlMatttillfalle" id="ddlMatttillfalle">{options}</select>
+<div>{checkboxes}</div>
+<input type="radio" name="rblPresentation" id="rblDiagram" value="Diagram" checked="checked"/><label for="rblDiagram">Diagram</label>
+<input type="radio" name="rblPresentation" id="rblTabell" value="Tabell"/><label for="rblTabell">Tabell</label>
+<input type="submit" name="cmdStarta" id="cmdStarta" value="Starta"/>
+</form>
+{popup_script}
+</body></html>"""
+
+
+def render_result(value, rows, seed=0):
+    """Result popup: two layout tables, then the data table (index 2)"""
+    rng = random.Random(f"{seed}-{value}")
+    start = occasion_start(value)
+    group_headers = ''.join(f'<th colspan="2">{escape(name)}</th>' for name in VEHICLE_TYPE_HEADERS)
+    sub_headers = '<th>Antal</th><th>Medelhast</th>' * len(VEHICLE_TYPE_HEADERS)
+    body = []
+    for hour in range(rows):
+        cells = []
+        for _ in VEHICLE_TYPE_HEADERS:
+            cells.append(f'<td>{rng.randint(0, 1500)}</td>')
+            cells.append(f'<td>{rng.randint(300, 1200) / 10:.1f}</td>'.replace('.', ','))
+        body.append(f'<tr><td>{start + timedelta(hours=hour):%Y-%m-%d %H:%M}</td>{"".join(cells)}</tr>')
+    return f"""<!DOCTYPE html>
+<html><head><title>Resultat</title></head><body>
+<table id="tblHuvud"><tr><td>Trafikverket</td><td>{BENCHMARK_PUNKT}</td></tr></table>
+<table id="tblUrval"><tr><td>Mättillfälle</td><td>{occasion_label(value)}</td></tr></table>
+<table id="tblData" border="1">
+<tr><th rowspan="2">Tidpunkt</th>{group_headers}</tr>
+<tr>{sub_headers}</tr>
+{''.join(body)}
+</table>
+</body></html>"""
+
+
+class MockTrafikverketHandler(BaseHTTPRequestHandler):
+    """Request handler; settings live on the server object"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+    def send_html(self, html, status=200):
+        time.sleep(self.server.latency)
+        data = html.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        if parsed.path == FORM_PATH:
+            self.send_html(render_form(self.server.occasions, self.server.viewstate_size))
+        elif parsed.path == RESULT_PATH and query.get('mt'):
+            self.send_html(render_result(query['mt'][0], self.server.rows, self.server.seed))
+        else:
+            self.send_html('<html><body>Not found</body></html>', 404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        form = parse_qs(self.rfile.read(length).decode('utf-8'), keep_blank_values=True)
+        if urlparse(self.path).path != FORM_PATH:
+            self.send_html('<html><body>Not found</body></html>', 404)
+            return
+        selected = (form.get('ddlMatttillfalle') or ['1'])[0]
+        # Like the original, "Starta" answers with the form plus a popup script
+        popup_value = selected if 'cmdStarta' in form else None
+        self.send_html(render_form(self.server.occasions, self.server.viewstate_size, selected, popup_value))
+
+
+class MockTrafikverketServer:
+    """Mock site on a free local port, served from a background thread"""
+
+    def __init__(self, occasions=10, rows=168, latency=0.0, viewstate_size=20000, seed=0):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), MockTrafikverketHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.occasions = occasions
+        self.httpd.rows = rows
+        self.httpd.latency = latency
+        self.httpd.viewstate_size = viewstate_size
+        self.httpd.seed = seed
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{FORM_PATH}?punktnrlista={BENCHMARK_PUNKT}&laenkrollista=1"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Serve the mock Trafikverket pages until interrupted')
+    parser.add_argument('--occasions', type=int, default=10, help='Measurement occasions in the form (default: 10)')
+    parser.add_argument('--rows', type=int, default=168, help='Data rows per result table (default: 168)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Delay per response in ms (default: 0)')
+    args = parser.parse_args()
+
+    server = MockTrafikverketServer(args.occasions, args.rows, args.latency / 1000).start()
+    print(f"Mock Trafikverket form: {server.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,124 @@
+"""
+Chrome WebDriver lifecycle for the Trafikverket Scraper
+A BrowserSession owns one Chrome instance that can be reused for many URLs,
+so the driver install and browser startup are paid once per run
+"""
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+
+# ChromeDriverManager().install() resolves (and possibly downloads) the driver;
+# the resulting path is stable for the life of the process
+_chromedriver_path = None
+
+
+def get_chromedriver_path():
+    """Resolve the ChromeDriver binary once per process"""
+    global _chromedriver_path
+    if _chromedriver_path is None:
+        _chromedriver_path = ChromeDriverManager().install()
+    return _chromedriver_path
+
+
+class BrowserSession:
+    """A Chrome browser that can be shared by several scrapers in turn"""
+
+    def __init__(self, headless=False):
+        self.headless = headless
+        self.driver = None
+
+    def build_options(self):
+        """Chrome options used for every session"""
+        options = webdriver.ChromeOptions()
+
+        # Enable headless mode if requested
+        if self.headless:
+            options.add_argument('--headless')
+            print("Running in headless mode (faster)")
+
+        options.add_argument('--start-maximized')
+        options.add_argument('--disable-blink-features=AutomationControlled')
+        options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        options.add_experimental_option('useAutomationExtension', False)
+        return options
+
+    def start(self):
+        """Start Chrome if it is not already running; returns the driver"""
+        if self.driver is not None:
+            return self.driver
+
+        print("Setting up Chrome WebDriver...")
+        options = self.build_options()
+
+        try:
+            print("Attempting to set up ChromeDriver with webdriver-manager...")
+            service = Service(get_chromedriver_path())
+            self.driver = webdriver.Chrome(service=service, options=options)
+            print("WebDriver setup successful!")
+        except Exception as e:
+            print(f"Error with webdriver-manager: {e}")
+            print("Trying to use system ChromeDriver...")
+            try:
+                self.driver = webdriver.Chrome(options=options)
+                print("WebDriver setup successful with system ChromeDriver!")
+            except Exception as e2:
+                print(f"Error starting WebDriver: {e2}")
+                raise
+        return self.driver
+
+    def is_alive(self):
+        """Check whether the browser still responds"""
+        if self.driver is None:
+            return False
+        try:
+            self.driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    def reset(self):
+        """Return the browser to a clean state for the next URL.
+
+        Closes every window but one, clears cookies and blanks the page.
+        A browser that no longer responds is restarted instead.
+        """
+        if self.driver is None:
+            return
+        if not self.is_alive():
+            print("Browser is not responding, restarting it...")
+            self.quit()
+            self.start()
+            return
+
+        try:
+            handles = self.driver.window_handles
+            for handle in handles[1:]:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+            self.driver.switch_to.window(handles[0])
+            self.driver.delete_all_cookies()
+            self.driver.get("about:blank")
+        except Exception as e:
+            print(f"Warning: Could not reset browser ({e}), restarting it...")
+            self.quit()
+            self.start()
+
+    def quit(self):
+        """Shut the browser down"""
+        if self.driver is not None:
+            print("Closing browser...")
+            try:
+                self.driver.quit()
+            except Exception as e:
+                print(f"Warning: Error closing browser: {e}")
+            self.driver = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.quit()
+        return False
@@ -4,12 +4,34 @@ Provides a command-line interface with additional options
 """
 
 import argparse
+import os
 import sys
-from scraper import TrafikverketScraper
+import time
+from scraper import (ENGINES, SCRAPER_ENGINE, TrafikverketScraper, connect_database, output_file_for_url,
+                     print_run_summary, reingest_archive, run_parallel)
+from browser import BrowserSession
+from journal import ScrapeJournal
+from archive import ARCHIVE_DIRECTORY, RawHtmlArchive
+from exporters import PARQUET_DIRECTORY, copy_traffic_data, export_traffic_data
+from partitions import MIGRATED_TABLE, migrate_to_partitioned
+from long_format import LONG_TABLE, rebuild_long_table
+from rollups import ROLLUPS, rebuild_rollups
+from traffic_metrics import GROUPINGS, compute_traffic_metrics
+from translations import load_translation_file, translation_path
+from instrumentation import METRICS_FILE, Instrumentation, is_verbose, set_verbose
 from datetime import datetime
 
 
+DEFAULT_URL = ('https://vtf.trafikverket.se/tmg101/AGS/tmg104bestaellinfouttag.aspx'
+               '?punktnrlista=13520237%2c13520237%2c13520505&laenkrollista=2%2c3%2c1')
+
+
 def main():
+    # Subcommands (e.g. "cli.py reingest"); anything else is a scrape
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        COMMANDS[sys.argv[1]](sys.argv[2:])
+        return
+    
     parser = argparse.ArgumentParser(
         description='Extract data from Trafikverket website',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -24,15 +46,44 @@ Examples:
   # Use custom URL
   python cli.py -u "https://vtf.trafikverket.se/..." -o data.csv
   
+  # Scrape several URLs in parallel, one headless browser per worker
+  python cli.py -u "<url 1>" -u "<url 2>" -u "<url 3>" --workers 3
+  
   # Run in headless mode (background)
   python cli.py --headless
+  
+  # Post the form over HTTP without starting Chrome
+  python cli.py --engine http
+  
+  # Keep the raw result pages, then re-parse them later without scraping
+  python cli.py --archive
+  python cli.py reingest
+  
+  # Export the database to Parquet partitions (only those changed since the last export)
+  python cli.py parquet
+  
+  # Move a traffic_data table created before partitioning into monthly partitions
+  python cli.py migrate-partitions
+  
+  # Refill the long-format table (one row per vehicle type) from traffic_data
+  python cli.py rebuild-long
+  
+  # Recompute the hourly and daily rollup tables from scratch
+  python cli.py rebuild-rollups
+  
+  # Stream 2023 for two roads from the database to a gzip-compressed CSV
+  python cli.py export -o road_25_40.csv.gz --start 2023-01-01 --end 2024-01-01 --road 25 --road 40
+  
+  # V/C ratio, delay index and CO2 emissions per road and vehicle type
+  python cli.py metrics --group road -o road_metrics.csv
         """
     )
     
     parser.add_argument(
         '-u', '--url',
-        default='https://vtf.trafikverket.se/tmg101/AGS/tmg104bestaellinfouttag.aspx?punktnrlista=13520237%2c13520237%2c13520505&laenkrollista=2%2c3%2c1',
-        help='URL of the Trafikverket page to scrape'
+        action='append',
+        default=None,
+        help='URL of the Trafikverket page to scrape (repeat for several)'
     )
     
     parser.add_argument(
@@ -47,6 +98,49 @@ Examples:
         help='Run browser in headless mode (background)'
     )
     
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=1,
+        help='Number of URLs to scrape in parallel, one headless browser per worker (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--engine',
+        choices=ENGINES,
+        default=SCRAPER_ENGINE,
+        help=f"Scraping engine: 'selenium' drives Chrome, 'http' posts the form directly, "
+             f"'hybrid' fetches all but the first occasion over HTTP (default: {SCRAPER_ENGINE})"
+    )
+    
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='Re-scrape every measurement occasion, including those already stored'
+    )
+    
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Skip measurement occasions completed by a previous, interrupted run'
+    )
+    
+    parser.add_argument(
+        '--archive',
+        nargs='?',
+        const=ARCHIVE_DIRECTORY,
+        default=None,
+        help=f'Keep every result page in a compressed raw HTML archive (default directory: {ARCHIVE_DIRECTORY})'
+    )
+    
+    parser.add_argument(
+        '--parquet',
+        nargs='?',
+        const=PARQUET_DIRECTORY,
+        default=None,
+        help=f'Also write stored rows to Parquet partitions by county/road/month (default directory: {PARQUET_DIRECTORY})'
+    )
+    
     parser.add_argument(
         '-t', '--timeout',
         type=int,
@@ -57,23 +151,85 @@ Examples:
     parser.add_argument(
         '-v', '--verbose',
         action='store_true',
-        help='Enable verbose output'
+        help='Print every scraping step and row (default: progress and summaries only)'
+    )
+    
+    parser.add_argument(
+        '--trace-memory',
+        action='store_true',
+        help='Record tracemalloc peaks per span in the metrics log (slower)'
     )
     
     args = parser.parse_args()
+    if args.verbose:
+        set_verbose(True)
+    urls = args.url or [DEFAULT_URL]
     
     print("=" * 60)
     print("Trafikverket Data Extractor")
     print("=" * 60)
-    print(f"URL: {args.url}")
+    print(f"URL: {urls[0]}" if len(urls) == 1 else f"URLs: {len(urls)}")
     print(f"Output: {args.output or 'trafikverket_data_<timestamp>.csv'}")
     print(f"Headless mode: {'Yes' if args.headless else 'No'}")
+    print(f"Engine: {args.engine}")
+    if args.workers > 1:
+        print(f"Workers: {args.workers}")
     print("=" * 60)
     print()
     
+    journal = ScrapeJournal()
+    if args.resume:
+        journal.load()
+    else:
+        rotated = journal.reset()
+        if rotated:
+            print(f"Previous journal kept as {rotated} (rename it back and use --resume to continue it)\n")
+    
+    if args.workers > 1:
+        tasks = [
+            {
+                'url_idx': url_idx,
+                'url': url,
+                'output_file': output_file_for_url(args.output, url_idx, url, len(urls)),
+                'headless': True,
+                'engine': args.engine,
+                'incremental': not args.full,
+                'journal': journal.path,
+                'archive': args.archive,
+                'parquet': args.parquet,
+                'verbose': is_verbose(),
+                'metrics': METRICS_FILE,
+                'trace_memory': args.trace_memory,
+            }
+            for url_idx, url in enumerate(urls, 1)
+            if not journal.is_url_done(url)
+        ]
+        if not tasks:
+            print("Nothing left to do")
+            return
+        try:
+            results = run_parallel(tasks, args.workers)
+        except KeyboardInterrupt:
+            print("\n\nOperation cancelled by user")
+            sys.exit(0)
+        print_run_summary(results)
+        if any(r['status'] == 'failed' for r in results):
+            sys.exit(1)
+        return
+    
+    browser = BrowserSession(headless=args.headless)
     try:
-        scraper = TrafikverketScraper(args.url)
-        scraper.run(output_file=args.output)
+        for url_idx, url in enumerate(urls, 1):
+            if journal.is_url_done(url):
+                print(f"Already completed in journal, skipping {url}")
+                continue
+            output = args.output if len(urls) == 1 else output_file_for_url(args.output, url_idx, url, len(urls))
+            scraper = TrafikverketScraper(url, headless=args.headless, browser=browser, engine=args.engine,
+                                          incremental=not args.full, journal=journal,
+                                          archive=RawHtmlArchive(args.archive) if args.archive else None,
+                                          instrumentation=Instrumentation(trace_memory=args.trace_memory or None),
+                                          parquet=args.parquet)
+            scraper.run(output_file=output)
         print()
         print("=" * 60)
         print("Extraction completed successfully!")
@@ -84,6 +240,389 @@ Examples:
     except Exception as e:
         print(f"\nError: {e}")
         sys.exit(1)
+    finally:
+        browser.quit()
+
+
+def reingest_main(argv):
+    """cli.py reingest: re-parse the raw HTML archive into the database"""
+    parser = argparse.ArgumentParser(
+        prog='cli.py reingest',
+        description='Re-parse archived result pages into the database without scraping'
+    )
+    
+    parser.add_argument(
+        '-a', '--archive',
+        default=ARCHIVE_DIRECTORY,
+        help=f'Archive directory (default: {ARCHIVE_DIRECTORY})'
+    )
+    
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=None,
+        help='Number of parser processes (default: one per CPU core)'
+    )
+    
+    args = parser.parse_args(argv)
+    
+    try:
+        totals = reingest_archive(args.archive, args.workers)
+    except KeyboardInterrupt:
+        print("\n\nOperation cancelled by user")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\nError: {e}")
+        sys.exit(1)
+    if totals['failed']:
+        sys.exit(1)
+
+
+def export_parquet(directory=None, full=False):
+    """Write public.traffic_data partitions changed since the last export to Parquet"""
+    directory = directory or PARQUET_DIRECTORY
+    connection = connect_database()
+    try:
+        started = time.time()
+        print(f"Exporting public.traffic_data to {os.path.abspath(directory)}"
+              f"{' (full)' if full else ' (changed partitions only)'}\n")
+        with connection.cursor() as cursor:
+            partitions, rows = export_traffic_data(cursor, directory, full=full)
+        connection.rollback()  # Read-only transaction
+        print(f"\n{'='*70}")
+        print(f"Exported {rows} rows in {partitions} partition(s) in {time.time() - started:.1f}s")
+        print(f"{'='*70}")
+        return partitions, rows
+    finally:
+        connection.close()
+
+
+def parquet_main(argv):
+    """cli.py parquet: export public.traffic_data to partitioned Parquet files"""
+    parser = argparse.ArgumentParser(
+        prog='cli.py parquet',
+        description='Write traffic_data partitions (county/road/month) changed since the last export to Parquet'
+    )
+    
+    parser.add_argument(
+        '-d', '--directory',
+        default=PARQUET_DIRECTORY,
+        help=f'Export directory (default: {PARQUET_DIRECTORY})'
+    )
+    
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='Rewrite every partition, not only those with new rows'
+    )
+    
+    args = parser.parse_args(argv)
+    
+    try:
+        export_parquet(args.directory, full=args.full)
+    except KeyboardInterrupt:
+        print("\n\nOperation cancelled by user")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\nError: {e}")
+        sys.exit(1)
+
+
+def migrate_traffic_data(drop_old=False):
+    """Move an unpartitioned public.traffic_data into monthly partitions"""
+    connection = connect_database()
+    try:
+        started = time.time()
+        print("Migrating public.traffic_data to monthly partitions (the table is locked meanwhile)...")
+        copied = migrate_to_partitioned(connection, drop_old=drop_old)
+        print(f"\n{'='*70}")
+        print(f"Copied {copied} rows into the partitioned table in {time.time() - started:.1f}s")
+        if copied and not drop_old:
+            print(f"The old table was kept as public.{MIGRATED_TABLE}; drop it once you have checked the data")
+        print(f"{'='*70}")
+        return copied
+    finally:
+        connection.close()
+
+
+def migrate_partitions_main(argv):
+    """cli.py migrate-partitions: move an unpartitioned traffic_data into monthly partitions"""
+    parser = argparse.ArgumentParser(
+        prog='cli.py migrate-partitions',
+        description='Copy an existing unpartitioned public.traffic_data into a table partitioned by month'
+    )
+    
+    parser.add_argument(
+        '--drop-old',
+        action='store_true',
+        help='Drop the old table after copying (default: keep it as traffic_data_unpartitioned)'
+    )
+    
+    args = parser.parse_args(argv)
+    
+    try:
+        migrate_traffic_data(drop_old=args.drop_old)
+    except KeyboardInterrupt:
+        print("\n\nOperation cancelled by user")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\nError: {e}")
+        sys.exit(1)
+
+
+def rebuild_long_format():
+    """Refill traffic_measurements_long from everything in traffic_data"""
+    connection = connect_database()
+    try:
+        started = time.time()
+        print(f"Rebuilding public.{LONG_TABLE} from public.traffic_data...\n")
+        total = rebuild_long_table(connection)
+        print(f"\n{'='*70}")
+        print(f"Wrote {total} long rows in {time.time() - started:.1f}s")
+        print(f"{'='*70}")
+        return total
+    finally:
+        connection.close()
+
+
+def rebuild_long_main(argv):
+    """cli.py rebuild-long: refill traffic_measurements_long from traffic_data"""
+    parser = argparse.ArgumentParser(
+        prog='cli.py rebuild-long',
+        description='Rebuild traffic_measurements_long (one row per measurement and vehicle type) from traffic_data'
+    )
+    parser.parse_args(argv)
+    
+    try:
+        rebuild_long_format()
+    except KeyboardInterrupt:
+        print("\n\nOperation cancelled by user")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\nError: {e}")
+        sys.exit(1)
+
+
+def rebuild_rollup_tables():
+    """Recompute the hourly and daily rollup tables from traffic_data"""
+    connection = connect_database()
+    try:
+        started = time.time()
+        tables = ', '.join(f"public.{table}" for table, _, _, _ in ROLLUPS.values())
+        print(f"Rebuilding {tables} from public.traffic_data...\n")
+        sizes = rebuild_rollups(connection)
+        print(f"\n{'='*70}")
+        print(f"Rebuilt rollups in {time.time() - started:.1f}s: "
+              f"{', '.join(f'{name}: {count} rows' for name, count in sizes.items())}")
+        print(f"{'='*70}")
+        return sizes
+    finally:
+        connection.close()
+
+
+def rebuild_rollups_main(argv):
+    """cli.py rebuild-rollups: recompute the hourly and daily rollups from traffic_data"""
+    parser = argparse.ArgumentParser(
+        prog='cli.py rebuild-rollups',
+        description='Recompute traffic_rollup_hourly and traffic_rollup_daily from traffic_data'
+    )
+    parser.parse_args(argv)
+    
+    try:
+        rebuild_rollup_tables()
+    except KeyboardInterrupt:
+        print("\n\nOperation cancelled by user")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\nError: {e}")
+        sys.exit(1)
+
+
+def export_csv(path, start=None, end=None, counties=None, roads=None, points=None, compress=None,
+               translate=False):
+    """Stream a filtered slice of public.traffic_data to a CSV (or .gz) file with COPY"""
+    translations = None
+    if translate:
+        translations = load_translation_file()
+        if not translations:
+            print(f"Warning: {translation_path()} not found, keeping the column names")
+    connection = connect_database()
+    try:
+        started = time.time()
+        last_report = [0.0]
+        
+        def progress(rows, size):
+            now = time.time()
+            if now - last_report[0] >= 0.5:
+                last_report[0] = now
+                print(f"\r  {rows} rows, {size / 1e6:.1f} MB", end='', flush=True)
+        
+        print(f"Exporting public.traffic_data to {os.path.abspath(path)}")
+        with connection.cursor() as cursor:
+            rows = copy_traffic_data(cursor, path, start, end, counties, roads, points,
+                                     compress=compress, translations=translations, progress=progress)
+        connection.rollback()  # Read-only transaction
+        elapsed = time.time() - started
+        print(f"\nExported {rows} rows in {elapsed:.1f}s ({rows / max(elapsed, 0.001):.0f} rows/s)")
+        return rows
+    finally:
+        connection.close()
+
+
+def export_main(argv):
+    """cli.py export: stream traffic_data rows to CSV with COPY"""
+    parser = argparse.ArgumentParser(
+        prog='cli.py export',
+        description='Stream rows of public.traffic_data to a CSV or gzip file with COPY ... TO STDOUT'
+    )
+    
+    parser.add_argument(
+        '-o', '--output',
+        required=True,
+        help='Output file; compressed with gzip if it ends in .gz'
+    )
+    
+    parser.add_argument(
+        '--start',
+        default=None,
+        help='First measurement time to include, e.g. 2022-01-01'
+    )
+    
+    parser.add_argument(
+        '--end',
+        default=None,
+        help='Measurement time to stop before (exclusive)'
+    )
+    
+    parser.add_argument(
+        '--county',
+        action='append',
+        default=None,
+        help='Only this county (repeat for several)'
+    )
+    
+    parser.add_argument(
+        '--road',
+        action='append',
+        default=None,
+        help='Only this road number (repeat for several)'
+    )
+    
+    parser.add_argument(
+        '--point',
+        action='append',
+        default=None,
+        help='Only this measurement point (punkt nummer, repeat for several)'
+    )
+    
+    parser.add_argument(
+        '--gzip',
+        action='store_true',
+        default=None,
+        help='Compress with gzip whatever the file name'
+    )
+    
+    parser.add_argument(
+        '--translate',
+        action='store_true',
+        help='Use readable English headers from translation.txt instead of column names'
+    )
+    
+    args = parser.parse_args(argv)
+    
+    try:
+        export_csv(args.output, args.start, args.end, args.county, args.road, args.point,
+                   compress=args.gzip, translate=args.translate)
+    except KeyboardInterrupt:
+        print("\n\nOperation cancelled by user")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\nError: {e}")
+        sys.exit(1)
+
+
+def traffic_metrics(grouping='point', by_hour=False, start=None, end=None):
+    """V/C ratio, delay index and emissions per group and vehicle type from traffic_data"""
+    connection = connect_database()
+    try:
+        started = time.time()
+        
+        def progress(rows):
+            print(f"\r  {rows} rows read", end='', flush=True)
+        
+        result = compute_traffic_metrics(connection, grouping, by_hour, start, end, progress=progress)
+        print(f"\nComputed metrics for {len(result)} group(s) in {time.time() - started:.1f}s")
+        return result
+    finally:
+        connection.close()
+
+
+def metrics_main(argv):
+    """cli.py metrics: V/C ratio, delay index and emissions from traffic_data"""
+    parser = argparse.ArgumentParser(
+        prog='cli.py metrics',
+        description='Compute capacity, V/C ratio, delay index and CO2 emissions per vehicle type'
+    )
+    
+    parser.add_argument(
+        '-g', '--group',
+        choices=list(GROUPINGS),
+        default='point',
+        help='Group per measurement point, road, county or all data (default: point)'
+    )
+    
+    parser.add_argument(
+        '--by-hour',
+        action='store_true',
+        help='Also split the metrics by hour of day'
+    )
+    
+    parser.add_argument(
+        '--start',
+        default=None,
+        help='First measurement time to include, e.g. 2024-01-01'
+    )
+    
+    parser.add_argument(
+        '--end',
+        default=None,
+        help='Measurement time to stop before (exclusive)'
+    )
+    
+    parser.add_argument(
+        '-o', '--output',
+        default=None,
+        help='Write the metrics to this CSV file (default: print the top emitters)'
+    )
+    
+    args = parser.parse_args(argv)
+    
+    try:
+        result = traffic_metrics(args.group, args.by_hour, args.start, args.end)
+    except KeyboardInterrupt:
+        print("\n\nOperation cancelled by user")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\nError: {e}")
+        sys.exit(1)
+    
+    if args.output:
+        result.to_csv(args.output, index=False)
+        print(f"Metrics saved to: {args.output}")
+    else:
+        print()
+        print(result.sort_values('emissions_g', ascending=False).head(20).to_string(index=False))
+
+
+COMMANDS = {
+    'reingest': reingest_main,
+    'parquet': parquet_main,
+    'migrate-partitions': migrate_partitions_main,
+    'rebuild-long': rebuild_long_main,
+    'rebuild-rollups': rebuild_rollups_main,
+    'export': export_main,
+    'metrics': metrics_main,
+}
 
 
 if __name__ == "__main__":
@@ -10,6 +10,13 @@ DEFAULT_URL = "https://vtf.trafikverket.se/tmg101/AGS/tmg104bestaellinfouttag.as
 DEFAULT_OUTPUT_FILE = None  # None = auto-generate with timestamp
 OUTPUT_DIRECTORY = "./output"  # Directory to save output files
 
+# Scraping engine
+# 'selenium' drives Chrome through the form; 'http' replays the ASP.NET form
+# postback with a pooled HTTP session and needs no browser; 'hybrid' runs the
+# first occasion in Chrome and fetches the rest over HTTP with its cookies
+SCRAPER_ENGINE = 'selenium'
+HTTP_POOL_SIZE = 10  # Connections kept alive per HTTP session
+
 # Browser settings
 HEADLESS_MODE = False  # Set to True to run browser in background
 BROWSER_WINDOW_SIZE = (1920, 1080)  # Width, Height
@@ -22,6 +29,11 @@ ELEMENT_WAIT_TIMEOUT = 10
 BETWEEN_ACTIONS_DELAY = 0.3
 AFTER_START_BUTTON_DELAY = 3
 
+# Form setup
+# Set occasion, checkboxes and table format with one JavaScript call per
+# occasion; the per-element selectors below are then only used as fallback
+SCRIPT_FORM_SETUP = True
+
 # Element selectors (XPath patterns)
 # These may need to be updated if the website structure changes
 CHECKBOX_SELECTOR = "//input[@type='checkbox']"
@@ -38,16 +50,110 @@ START_BUTTON_SELECTORS = [
     "//input[@name='startButton']"
 ]
 
+# Table extraction settings
+# Bulk mode reads a result table's HTML in one WebDriver call and parses it
+# locally; set to False to read every cell through WebDriver (much slower)
+BULK_TABLE_EXTRACTION = True
+
+# Incremental scraping
+# Skip measurement occasions whose days are already stored for the point
+# (override with --full). A day counts as stored once it has at least
+# INCREMENTAL_MIN_ROWS_PER_DAY rows (24 = hourly data).
+INCREMENTAL_SCRAPING = True
+INCREMENTAL_MIN_ROWS_PER_DAY = 24
+
+# Checkpoint journal
+# Completed URLs and occasions are appended here; --resume skips them
+JOURNAL_FILE = "scrape_journal.jsonl"
+
+# Result table parsing
+# Timestamps in the result table's first column; rows in another format are
+# parsed by inference as a fallback
+MEASUREMENT_TIME_FORMAT = '%Y-%m-%d %H:%M'
+# Swedish=English pairs used for header mapping and export translation
+TRANSLATION_FILE = "translation.txt"
+
+# Raw HTML archive
+# Opt-in (or pass --archive): every result page is stored compressed under
+# ARCHIVE_DIRECTORY so it can be re-parsed later with "cli.py reingest".
+# 'zstd' needs the zstandard package and falls back to 'gzip' without it.
+ARCHIVE_RAW_HTML = False
+ARCHIVE_DIRECTORY = "./archive"
+ARCHIVE_COMPRESSION = 'zstd'
+
+# Coordinate store
+# Measurement point coordinates live in a SQLite file shared by all worker
+# processes (coordinate_cache.txt is imported on first use); the most
+# recently used entries are also kept in memory
+COORDINATE_DB = "coordinates.sqlite3"
+COORDINATE_LRU_SIZE = 4096
+# Points without coordinates on the page are not searched again for this long
+COORDINATE_MISS_TTL_DAYS = 30
+
+# Database settings
+# Rows per multi-row INSERT statement; a whole popup table is still written
+# in a single transaction
+DB_BATCH_SIZE = 1000
+# Also write traffic_measurements_long (one row per measurement and vehicle
+# type) with every batch; "cli.py rebuild-long" fills it from traffic_data
+LONG_FORMAT_TABLE = True
+# Fold every batch into traffic_rollup_hourly (hour of day) and
+# traffic_rollup_daily; "cli.py rebuild-rollups" recomputes them
+ROLLUP_TABLES = True
+
 # Data export settings
 # CSV export is the default format
+CSV_EXPORT = True  # Stream parsed rows to the output CSV (-o) while scraping
+# Parquet export (pip install pyarrow): typed files partitioned by
+# county/road_number/month. Opt-in while scraping (or pass --parquet);
+# "cli.py parquet" exports the database, rewriting only changed partitions
+PARQUET_EXPORT = False
+PARQUET_DIRECTORY = "./parquet"
+PARQUET_COMPRESSION = 'zstd'
+PARQUET_FLUSH_ROWS = 100000  # Merge buffered rows into their partitions at this size
+# "cli.py parquet" re-reads rows created this many seconds before the last
+# export, so rows of transactions still open during that export are not missed
+PARQUET_EXPORT_OVERLAP = 3600
+# "cli.py export": COPY-streamed CSV (gzip for .gz files) read from the
+# database in chunks of COPY_BUFFER_SIZE bytes
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Traffic metrics (traffic_metrics.py, "cli.py metrics")
+# CO2 emission factors in g per vehicle km, by vehicle type; emissions assume
+# EMISSION_DISTANCE_KM driven per counted vehicle
+EMISSION_FACTORS = {
+    'all_vehicles': 120,
+    'passenger_car': 120,
+    'passenger_car_no_trailer': 120,
+    'passenger_car_trailer': 200,
+    'heavy_vehicles': 600,
+    'heavy_vehicles_trailer': 1200,
+    'heavy_vehicles_no_trailer': 800,
+    'three_axle_tractor_trailer': 1500,
+    'three_axle_tractor_no_trailer': 1000,
+    'two_axle_tractor_trailer': 1200,
+    'two_axle_tractor_no_trailer': 800,
+}
+EMISSION_DISTANCE_KM = 1.0
+METRICS_BATCH_SIZE = 50000  # Rows per batch read from the server-side cursor
 
 # Logging
-VERBOSE_OUTPUT = True
+# Step-by-step and per-row console output (also enabled with --verbose);
+# by default only progress, warnings and summaries are printed
+VERBOSE_OUTPUT = False
 LOG_FILE = None  # Set to filename to log to file, None to disable
+# Timing spans (URL > occasion > phase) and row counters as JSON lines;
+# None disables. TRACE_MEMORY adds tracemalloc peaks per span (slower).
+METRICS_FILE = "scrape_metrics.jsonl"
+TRACE_MEMORY = False
 
 # Retry settings
+# Each step (navigate, select occasion, start/popup, extract, HTTP fetch) is
+# retried up to MAX_RETRIES times on transient errors (timeouts, stale
+# elements, dropped connections); the delay doubles after every retry
 MAX_RETRIES = 3
-RETRY_DELAY = 2  # Seconds between retries
+RETRY_DELAY = 2  # Seconds before the first retry
+RETRY_BUDGET_PER_URL = 10  # Total retries allowed for one URL
 
 # Row limit settings
 # If rowCount is set to a positive value, the program will exit after that many rows
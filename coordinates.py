@@ -0,0 +1,225 @@
+"""
+Coordinate store for measurement points
+punkt_id -> (latitude, longitude) in an indexed SQLite table shared by all
+scraper processes, with an in-process LRU in front. Replaces the
+pipe-delimited coordinate_cache.txt, which is imported once on first use.
+Points whose coordinates could not be found are remembered as misses for
+COORDINATE_MISS_TTL_DAYS so they are not looked up again on every run.
+"""
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+try:
+    from config import COORDINATE_DB, COORDINATE_LRU_SIZE
+except ImportError:
+    COORDINATE_DB = "coordinates.sqlite3"
+    COORDINATE_LRU_SIZE = 4096
+
+try:
+    from config import COORDINATE_MISS_TTL_DAYS
+except ImportError:
+    COORDINATE_MISS_TTL_DAYS = 30
+
+# SQLite's default limit on bound parameters is 999
+QUERY_CHUNK_SIZE = 500
+
+LEGACY_CACHE_FILE = "coordinate_cache.txt"
+
+UPSERT_SQL = """
+    INSERT INTO measurement_points (punkt_id, latitude, longitude, updated_at)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (punkt_id) DO UPDATE SET
+        latitude = excluded.latitude,
+        longitude = excluded.longitude,
+        updated_at = excluded.updated_at
+"""
+
+
+def read_legacy_cache(path=LEGACY_CACHE_FILE):
+    """(punkt_id, lat, lon) entries of a pipe-delimited coordinate_cache.txt"""
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = [part.strip() for part in line.split('|')]
+            if len(parts) == 3:
+                entries.append(tuple(parts))
+    return entries
+
+
+class CoordinateStore:
+    """SQLite-backed punkt_id -> (lat, lon) map with an LRU in front.
+
+    Safe to use from several processes: every write is a single upsert
+    transaction and readers never block writers (WAL mode).
+    """
+
+    def __init__(self, path=None, lru_size=None):
+        self.path = path or COORDINATE_DB
+        self.lru_size = COORDINATE_LRU_SIZE if lru_size is None else lru_size
+        self._lru = OrderedDict()
+        self._lock = threading.RLock()
+        self._connection = None
+        self._pid = None
+
+    @property
+    def connection(self):
+        # A connection must not cross a fork, so each process opens its own
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._pid = os.getpid()
+            self._lru.clear()
+            self._setup()
+        return self._connection
+
+    def _setup(self):
+        connection = self._connection
+        connection.execute("PRAGMA journal_mode=WAL")
+        created = connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'measurement_points'"
+        ).fetchone() is None
+        with connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS measurement_points (
+                    punkt_id TEXT PRIMARY KEY,
+                    latitude TEXT NOT NULL,
+                    longitude TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS unresolved_points (
+                    punkt_id TEXT PRIMARY KEY,
+                    checked_at TEXT NOT NULL
+                )
+            """)
+        if created and os.path.exists(LEGACY_CACHE_FILE):
+            try:
+                count = self.bulk_load(read_legacy_cache(LEGACY_CACHE_FILE))
+                print(f"Imported {count} coordinate(s) from {LEGACY_CACHE_FILE} into {self.path}")
+            except Exception as e:
+                print(f"Warning: Could not import {LEGACY_CACHE_FILE}: {e}")
+
+    def _remember(self, punkt_id, value):
+        if not self.lru_size:
+            return
+        self._lru[punkt_id] = value
+        self._lru.move_to_end(punkt_id)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def get(self, punkt_id):
+        """(lat, lon) of a measurement point, or None if unknown"""
+        with self._lock:
+            connection = self.connection
+            if punkt_id in self._lru:
+                self._lru.move_to_end(punkt_id)
+                return self._lru[punkt_id]
+            row = connection.execute(
+                "SELECT latitude, longitude FROM measurement_points WHERE punkt_id = ?", (punkt_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            value = (row[0], row[1])
+            self._remember(punkt_id, value)
+            return value
+
+    def get_many(self, punkt_ids):
+        """{punkt_id: (lat, lon)} for the known points among punkt_ids"""
+        found = {}
+        with self._lock:
+            connection = self.connection
+            pending = []
+            for punkt_id in dict.fromkeys(punkt_ids):
+                if punkt_id in self._lru:
+                    self._lru.move_to_end(punkt_id)
+                    found[punkt_id] = self._lru[punkt_id]
+                else:
+                    pending.append(punkt_id)
+            for start in range(0, len(pending), QUERY_CHUNK_SIZE):
+                chunk = pending[start:start + QUERY_CHUNK_SIZE]
+                rows = connection.execute(
+                    "SELECT punkt_id, latitude, longitude FROM measurement_points "
+                    f"WHERE punkt_id IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for punkt_id, lat, lon in rows:
+                    found[punkt_id] = (lat, lon)
+                    self._remember(punkt_id, (lat, lon))
+        return found
+
+    def recent_misses(self, punkt_ids, ttl_days=None):
+        """The punkt_ids recorded as unresolvable within the last ttl_days"""
+        ttl_days = COORDINATE_MISS_TTL_DAYS if ttl_days is None else ttl_days
+        cutoff = (datetime.now() - timedelta(days=ttl_days)).isoformat(timespec='seconds')
+        pending = list(dict.fromkeys(punkt_ids))
+        misses = set()
+        with self._lock:
+            connection = self.connection
+            for start in range(0, len(pending), QUERY_CHUNK_SIZE):
+                chunk = pending[start:start + QUERY_CHUNK_SIZE]
+                rows = connection.execute(
+                    "SELECT punkt_id FROM unresolved_points "
+                    f"WHERE checked_at >= ? AND punkt_id IN ({', '.join('?' * len(chunk))})", [cutoff] + chunk
+                ).fetchall()
+                misses.update(punkt_id for punkt_id, in rows)
+        return misses
+
+    def mark_missing(self, punkt_ids):
+        """Record points whose coordinates could not be found (negative cache)"""
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._lock:
+            connection = self.connection
+            with connection:
+                connection.executemany(
+                    "INSERT INTO unresolved_points (punkt_id, checked_at) VALUES (?, ?) "
+                    "ON CONFLICT (punkt_id) DO UPDATE SET checked_at = excluded.checked_at",
+                    [(str(punkt_id), now) for punkt_id in punkt_ids]
+                )
+
+    def put(self, punkt_id, lat, lon):
+        """Insert or update one measurement point"""
+        self.bulk_load([(punkt_id, lat, lon)])
+
+    def bulk_load(self, entries):
+        """Upsert many (punkt_id, lat, lon) entries in one transaction; returns the count"""
+        now = datetime.now().isoformat(timespec='seconds')
+        rows = [(str(punkt_id), str(lat), str(lon), now) for punkt_id, lat, lon in entries]
+        with self._lock:
+            connection = self.connection
+            with connection:
+                connection.executemany(UPSERT_SQL, rows)
+                connection.executemany("DELETE FROM unresolved_points WHERE punkt_id = ?",
+                                       [(row[0],) for row in rows])
+            for punkt_id, lat, lon, _ in rows:
+                if punkt_id in self._lru:
+                    self._remember(punkt_id, (lat, lon))
+        return len(rows)
+
+    def __len__(self):
+        with self._lock:
+            return self.connection.execute("SELECT COUNT(*) FROM measurement_points").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+            self._lru.clear()
+
+
+# One store (and LRU) per process and database file
+_stores = {}
+
+
+def get_coordinate_store(path=None):
+    """The shared CoordinateStore of this process"""
+    path = path or COORDINATE_DB
+    if path not in _stores:
+        _stores[path] = CoordinateStore(path)
+    return _stores[path]
@@ -0,0 +1,463 @@
+"""
+Export writers for the Trafikverket Scraper
+StreamingCsvWriter appends every parsed table batch to the output CSV as
+soon as it is produced, so memory stays at one table however long the run
+is. The file is written under a temporary name and renamed into place when
+the run completes.
+
+The Parquet export keeps traffic_data typed (timestamps, integer counts,
+float speeds, dictionary-encoded strings) in hive-style partitions
+county=<county>/road_number=<road>/month=<YYYY-MM>/data.parquet, so readers
+load only the partitions and columns they need. Only partitions that
+received rows are rewritten: by the scraper for the tables it stored, and by
+export_traffic_data for rows created in the database since the last export.
+
+copy_traffic_data streams a filtered slice of traffic_data straight from
+PostgreSQL's COPY ... TO STDOUT into a CSV or gzip file, without building
+Python rows.
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+import pandas as pd
+
+from psycopg2 import sql
+
+from table_parser import TRAFFIC_DATA_COLUMNS, VEHICLE_TYPE_COLUMNS
+from translations import compile_translations
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+try:
+    from config import PARQUET_DIRECTORY, PARQUET_COMPRESSION
+except ImportError:
+    PARQUET_DIRECTORY = "./parquet"
+    PARQUET_COMPRESSION = 'zstd'
+
+try:
+    from config import PARQUET_FLUSH_ROWS, PARQUET_EXPORT_OVERLAP
+except ImportError:
+    PARQUET_FLUSH_ROWS = 100000
+    PARQUET_EXPORT_OVERLAP = 3600
+
+try:
+    from config import COPY_BUFFER_SIZE
+except ImportError:
+    COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class StreamingCsvWriter:
+    """Append DataFrame batches to a CSV file, published atomically on close()"""
+
+    def __init__(self, path, translations=None, header=True):
+        self.path = path
+        self.tmp_path = f"{path}.part"
+        self.translations = compile_translations(translations) if translations else None
+        self.header = header
+        self.rows = 0
+        self._file = None
+
+    def write(self, df):
+        """Translate one batch and append it; returns the rows written"""
+        if df is None or df.empty:
+            return 0
+        if self.translations:
+            df = self.translations.apply(df.copy())
+
+        write_header = False
+        if self._file is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self._file = open(self.tmp_path, 'w', encoding='utf-8', newline='')
+            write_header = self.header
+        df.to_csv(self._file, sep=',', index=False, header=write_header)
+        # Whatever was scraped so far is on disk if the run dies
+        self._file.flush()
+        self.rows += len(df)
+        return len(df)
+
+    def close(self):
+        """Finish the file and rename it into place; returns False if nothing was written"""
+        if self._file is None:
+            return False
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        os.replace(self.tmp_path, self.path)
+        return True
+
+    def abort(self):
+        """Stop writing; the partial output is left as <path>.part"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+# Partition columns, in directory order; they live in the path, not the files
+PARTITION_COLUMNS = ['county', 'road_number', 'month']
+# Rows are unique per point and hour within a partition
+PARTITION_KEY = ['measurement_time', 'punkt_nummer']
+PARTITION_FILE = "data.parquet"
+# Same null marker as pyarrow's hive partitioning
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+EXPORT_STATE_FILE = "_export_state.json"  # '_' files are skipped by readers
+LOCK_TIMEOUT = 60
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet export needs pyarrow; install it with: pip install pyarrow")
+
+
+def parquet_schema():
+    """Arrow schema of a partition file (TRAFFIC_DATA_COLUMNS without county and road number)"""
+    require_pyarrow()
+    fields = [pa.field('measurement_time', pa.timestamp('us')),
+              pa.field('punkt_nummer', pa.dictionary(pa.int32(), pa.string()))]
+    for column in TRAFFIC_DATA_COLUMNS[4:]:
+        fields.append(pa.field(column, pa.int32() if column.endswith('_count') else pa.float64()))
+    return pa.schema(fields)
+
+
+def partition_schema():
+    """Arrow schema of the partition directories; keeps road numbers as strings"""
+    require_pyarrow()
+    return pa.schema([pa.field(column, pa.string()) for column in PARTITION_COLUMNS])
+
+
+def _partition_segment(column, value):
+    if value is None or pd.isna(value):
+        return f"{column}={NULL_PARTITION}"
+    return f"{column}={quote(str(value), safe='')}"
+
+
+def partition_path(directory, county, road_number, month):
+    """Path of the file holding one county/road/month partition"""
+    return os.path.join(directory, _partition_segment('county', county),
+                        _partition_segment('road_number', road_number),
+                        _partition_segment('month', month), PARTITION_FILE)
+
+
+def partition_frames(df):
+    """Yield ((county, road_number, month), rows) for every partition in df"""
+    df = df.copy()
+    df['measurement_time'] = pd.to_datetime(df['measurement_time'])
+    df['month'] = df['measurement_time'].dt.strftime('%Y-%m')
+    keys = df[PARTITION_COLUMNS].astype(object).where(df[PARTITION_COLUMNS].notna(), None)
+    for key, index in keys.groupby(PARTITION_COLUMNS, dropna=False).groups.items():
+        key = tuple(None if pd.isna(value) else value for value in key)
+        yield key, df.loc[index].drop(columns=PARTITION_COLUMNS)
+
+
+def to_arrow_table(df):
+    """Typed Arrow table for a partition's rows"""
+    schema = parquet_schema()
+    punkt = df['punkt_nummer'].astype(object).where(df['punkt_nummer'].notna(), None)
+    arrays = [pa.array(pd.to_datetime(df['measurement_time']).dt.to_pydatetime(), type=pa.timestamp('us')),
+              pa.array(list(punkt), type=pa.string()).dictionary_encode()]
+    for column in TRAFFIC_DATA_COLUMNS[4:]:
+        values = pd.to_numeric(df[column], errors='coerce')
+        if column.endswith('_count'):
+            arrays.append(pa.array(values.astype('Int32'), type=pa.int32()))
+        else:
+            arrays.append(pa.array(values.astype('float64'), type=pa.float64(), from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def write_partition(path, df, compression=None):
+    """Replace one partition file atomically with df's rows, sorted by time and point"""
+    df = df.sort_values(PARTITION_KEY, kind='mergesort')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = os.path.join(os.path.dirname(path), f".{PARTITION_FILE}.{os.getpid()}.tmp")
+    pq.write_table(to_arrow_table(df), tmp_path, compression=compression or PARQUET_COMPRESSION,
+                   use_dictionary=['punkt_nummer'])
+    os.replace(tmp_path, path)
+
+
+class _PartitionLock:
+    """Lock file next to a partition so parallel workers do not lose each other's rows"""
+
+    def __init__(self, path):
+        self.path = os.path.join(os.path.dirname(path), '.lock')
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        deadline = time.time() + LOCK_TIMEOUT
+        while True:
+            try:
+                os.close(os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return self
+            except FileExistsError:
+                if time.time() > deadline:
+                    # Left behind by a killed process
+                    print(f"Warning: Removing stale lock {self.path}")
+                    os.remove(self.path)
+                    deadline = time.time() + LOCK_TIMEOUT
+                time.sleep(0.05)
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+        return False
+
+
+def merge_partition(path, df, compression=None):
+    """Add rows to a partition file; stored rows with the same time and point are replaced"""
+    with _PartitionLock(path):
+        if os.path.exists(path):
+            stored = pq.read_table(path).to_pandas()
+            stored['punkt_nummer'] = stored['punkt_nummer'].astype(object)
+            df = pd.concat([stored, df], ignore_index=True)
+        df = df.drop_duplicates(PARTITION_KEY, keep='last')
+        write_partition(path, df, compression)
+    return len(df)
+
+
+class ParquetPartitionWriter:
+    """Buffer parsed table batches and merge them into their partitions.
+
+    Buffered rows are flushed whenever flush_rows of them have collected and
+    on close(), so memory stays bounded however long the run is.
+    """
+
+    def __init__(self, directory=None, compression=None, flush_rows=None):
+        require_pyarrow()
+        self.directory = directory or PARQUET_DIRECTORY
+        self.compression = compression
+        self.flush_rows = flush_rows or PARQUET_FLUSH_ROWS
+        self.rows = 0
+        self.partitions = set()  # Paths of the partitions written so far
+        self._batches = []
+        self._buffered = 0
+
+    def write(self, df):
+        """Queue one batch (TRAFFIC_DATA_COLUMNS), flushing if the buffer is full; returns the rows queued"""
+        if df is None or df.empty:
+            return 0
+        self._batches.append(df)
+        self.rows += len(df)
+        self._buffered += len(df)
+        if self._buffered >= self.flush_rows:
+            self.flush()
+        return len(df)
+
+    def flush(self):
+        """Merge the buffered rows into their partitions; returns the partitions written"""
+        if not self._batches:
+            return 0
+        batches, self._batches, self._buffered = self._batches, [], 0
+        written = 0
+        for (county, road_number, month), rows in partition_frames(pd.concat(batches, ignore_index=True)):
+            path = partition_path(self.directory, county, road_number, month)
+            merge_partition(path, rows, self.compression)
+            self.partitions.add(path)
+            written += 1
+        return written
+
+    def close(self):
+        """Flush what is left; returns the number of distinct partitions written"""
+        self.flush()
+        return len(self.partitions)
+
+
+def read_export_state(directory):
+    path = os.path.join(directory, EXPORT_STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_export_state(directory, state):
+    path = os.path.join(directory, EXPORT_STATE_FILE)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def export_traffic_data(cursor, directory=None, full=False, compression=None, overlap=None):
+    """Export public.traffic_data to Parquet partitions; returns (partitions, rows) written.
+
+    Only partitions with rows created since the previous export (recorded in
+    _export_state.json) are rewritten from the database, unless `full`.
+    created_at is the start of the inserting transaction, so a transaction
+    still open during the previous export can commit rows older than its
+    watermark; rows created up to `overlap` seconds (PARQUET_EXPORT_OVERLAP)
+    before it are therefore looked at again.
+    """
+    require_pyarrow()
+    directory = directory or PARQUET_DIRECTORY
+    os.makedirs(directory, exist_ok=True)
+    since = None if full else read_export_state(directory).get('last_created_at')
+
+    # Taken first, so rows committed while exporting are picked up next time
+    cursor.execute("SELECT max(created_at) FROM public.traffic_data")
+    watermark = cursor.fetchone()[0]
+    if watermark is None:
+        return 0, 0
+
+    partitions_sql = """
+        SELECT DISTINCT county, road_number, date_trunc('month', measurement_time)
+        FROM public.traffic_data
+    """
+    if since:
+        overlap = PARQUET_EXPORT_OVERLAP if overlap is None else overlap
+        cursor.execute(partitions_sql + " WHERE created_at > %s::timestamp - %s * interval '1 second'",
+                       (since, overlap))
+    else:
+        cursor.execute(partitions_sql)
+    partitions = cursor.fetchall()
+
+    columns = ', '.join(TRAFFIC_DATA_COLUMNS)
+    total_rows = 0
+    for idx, (county, road_number, month_start) in enumerate(partitions, 1):
+        cursor.execute(f"""
+            SELECT {columns} FROM public.traffic_data
+            WHERE county IS NOT DISTINCT FROM %s AND road_number IS NOT DISTINCT FROM %s
+            AND measurement_time >= %s AND measurement_time < %s + interval '1 month'
+        """, (county, road_number, month_start, month_start))
+        df = pd.DataFrame(cursor.fetchall(), columns=TRAFFIC_DATA_COLUMNS)
+        month = month_start.strftime('%Y-%m')
+        path = partition_path(directory, county, road_number, month)
+        with _PartitionLock(path):
+            write_partition(path, df.drop(columns=['county', 'road_number']), compression)
+        total_rows += len(df)
+        print(f"[{idx}/{len(partitions)}] {county} / {road_number} / {month}: {len(df)} rows")
+
+    write_export_state(directory, {'last_created_at': watermark.isoformat(),
+                                   'exported_at': datetime.now().isoformat(timespec='seconds')})
+    return len(partitions), total_rows
+
+
+def read_parquet_export(directory=None, columns=None, filters=None):
+    """Load an export as a DataFrame, reading only the partitions and columns asked for.
+
+    filters use the pyarrow syntax, e.g. [('road_number', '=', '25'), ('month', '>=', '2024-01')].
+    """
+    require_pyarrow()
+    import pyarrow.dataset as ds
+    partitioning = ds.partitioning(partition_schema(), flavor='hive')
+    table = pq.read_table(directory or PARQUET_DIRECTORY, columns=columns, filters=filters,
+                          partitioning=partitioning)
+    return table.to_pandas()
+
+
+# Export filters -> traffic_data column
+COPY_FILTERS = {'counties': 'county', 'roads': 'road_number', 'points': 'punkt_nummer'}
+
+
+def copy_query(cursor, start=None, end=None, counties=None, roads=None, points=None):
+    """SELECT of the traffic_data rows to export, with the filter values bound in"""
+    conditions, params = [], []
+    if start:
+        conditions.append(sql.SQL("measurement_time >= %s"))
+        params.append(start)
+    if end:
+        conditions.append(sql.SQL("measurement_time < %s"))
+        params.append(end)
+    for values, column in zip([counties, roads, points], COPY_FILTERS.values()):
+        if values:
+            conditions.append(sql.SQL("{} = ANY(%s)").format(sql.Identifier(column)))
+            params.append(list(values))
+    query = sql.SQL("SELECT {} FROM public.traffic_data").format(
+        sql.SQL(', ').join(map(sql.Identifier, TRAFFIC_DATA_COLUMNS)))
+    if conditions:
+        query += sql.SQL(" WHERE ") + sql.SQL(" AND ").join(conditions)
+    # COPY takes no parameters, so they are bound client-side
+    return cursor.mogrify(query, params)
+
+
+def export_headers(translations=None):
+    """CSV header for TRAFFIC_DATA_COLUMNS; readable English names if translations are given.
+
+    The names come from translation.txt (Tidpunkt, Medelhast and the vehicle types).
+    """
+    if not translations:
+        return list(TRAFFIC_DATA_COLUMNS)
+    compiled = compile_translations(translations)
+    vehicle_names = {prefix: name for name, prefix in VEHICLE_TYPE_COLUMNS.items()}
+    speed = compiled.translate_header('Medelhast')
+    headers = [compiled.translate_header('Tidpunkt'), 'County', 'Road number', 'Punkt nummer']
+    for column in TRAFFIC_DATA_COLUMNS[4:]:
+        if column.endswith('_count'):
+            headers.append(vehicle_names[column[:-len('_count')]])
+        else:
+            headers.append(f"{vehicle_names[column[:-len('_avg_speed')]]} - {speed}")
+    return headers
+
+
+class _CountingFile:
+    """File wrapper counting the CSV lines COPY writes through it"""
+
+    def __init__(self, file, progress=None):
+        self.file = file
+        self.progress = progress
+        self.rows = 0
+        self.bytes = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.file.write(data)
+        self.rows += data.count(b'\n')
+        self.bytes += len(data)
+        if self.progress:
+            self.progress(self.rows, self.bytes)
+        return len(data)
+
+
+def copy_traffic_data(cursor, path, start=None, end=None, counties=None, roads=None, points=None,
+                      compress=None, translations=None, progress=None):
+    """Stream traffic_data rows to a CSV file with COPY ... TO STDOUT; returns the rows written.
+
+    start/end limit measurement_time (end exclusive); counties, roads and
+    points are lists of accepted values. The file is gzip-compressed if
+    `compress` (default: path ends in .gz) and renamed into place when
+    complete. progress, if given, is called with (rows, bytes) per chunk.
+    """
+    if compress is None:
+        compress = path.endswith('.gz')
+    query = copy_query(cursor, start, end, counties, roads, points)
+    header = io.StringIO()
+    csv.writer(header, lineterminator='\n').writerow(export_headers(translations))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.part"
+    opener = gzip.open if compress else open
+    try:
+        with opener(tmp_path, 'wb') as f:
+            f.write(header.getvalue().encode('utf-8'))
+            output = _CountingFile(f, progress)
+            cursor.copy_expert(b"COPY (" + query + b") TO STDOUT WITH (FORMAT csv)", output, size=COPY_BUFFER_SIZE)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return output.rows
@@ -0,0 +1,133 @@
+"""
+HTML table parsing for Trafikverket result pages
+Parses table markup in-process so a whole popup table can be read with a
+single WebDriver call instead of one call per cell
+"""
+
+from html.parser import HTMLParser
+
+
+# Tags that implicitly close an open <td>/<th> or <tr> in sloppy markup
+_CELL_TAGS = ('td', 'th')
+_ROW_CLOSERS = ('tr', 'tbody', 'thead', 'tfoot')
+
+
+def normalize_cell_text(text):
+    """Collapse whitespace the way WebElement.text presents cell contents"""
+    return ' '.join(text.split())
+
+
+class TableHTMLParser(HTMLParser):
+    """Collect every <table> in a document, in document order.
+
+    Each table is a dict with:
+      'headers': text of every <th> in the table (like .//th)
+      'header_rows': the <th> cells grouped per <tr>, as (text, colspan) pairs
+      'rows':    one list per <tr> holding the text of its direct <td> cells
+                 (like ./td); rows without <td> cells are omitted
+    Nested tables are collected separately and do not leak cells into
+    their parent.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tables = []
+        self._stack = []  # Open tables, innermost last
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'table':
+            table = {'headers': [], 'header_rows': [], 'rows': [],
+                     '_row': None, '_header_row': None, '_cell': None}
+            self.tables.append(table)
+            self._stack.append(table)
+            return
+
+        if not self._stack:
+            return
+        table = self._stack[-1]
+
+        if tag == 'tr':
+            self._close_row(table)
+            table['_row'] = []
+            table['_header_row'] = []
+        elif tag in _CELL_TAGS:
+            self._close_cell(table)
+            table['_cell'] = (tag, [], _colspan(attrs))
+        elif tag == 'br' and table['_cell'] is not None:
+            table['_cell'][1].append(' ')
+
+    def handle_endtag(self, tag):
+        if not self._stack:
+            return
+        table = self._stack[-1]
+
+        if tag == 'table':
+            self._close_row(table)
+            self._stack.pop()
+            del table['_row']
+            del table['_header_row']
+            del table['_cell']
+        elif tag in _CELL_TAGS:
+            self._close_cell(table)
+        elif tag in _ROW_CLOSERS:
+            self._close_row(table)
+
+    def handle_data(self, data):
+        if self._stack and self._stack[-1]['_cell'] is not None:
+            self._stack[-1]['_cell'][1].append(data)
+
+    def close(self):
+        super().close()
+        while self._stack:
+            self.handle_endtag('table')
+
+    def _close_cell(self, table):
+        cell = table['_cell']
+        if cell is None:
+            return
+        tag, parts, colspan = cell
+        text = normalize_cell_text(''.join(parts))
+        if tag == 'th':
+            table['headers'].append(text)
+            if table['_header_row'] is not None:
+                table['_header_row'].append((text, colspan))
+        elif table['_row'] is not None:
+            table['_row'].append(text)
+        table['_cell'] = None
+
+    def _close_row(self, table):
+        self._close_cell(table)
+        row = table['_row']
+        if row:
+            table['rows'].append(row)
+        if table['_header_row']:
+            table['header_rows'].append(table['_header_row'])
+        table['_row'] = None
+        table['_header_row'] = None
+
+
+def _colspan(attrs):
+    """colspan attribute of a cell as an int (1 if missing or invalid)"""
+    for name, value in attrs:
+        if name == 'colspan':
+            try:
+                return max(1, int(value))
+            except (TypeError, ValueError):
+                return 1
+    return 1
+
+
+def parse_tables(html):
+    """Parse all tables in an HTML string; returns a list of table dicts"""
+    parser = TableHTMLParser()
+    parser.feed(html or '')
+    parser.close()
+    return parser.tables
+
+
+def parse_table(html, table_index=0):
+    """Parse a single table by document-order index, or None if missing"""
+    tables = parse_tables(html)
+    if table_index < len(tables):
+        return tables[table_index]
+    return None
@@ -0,0 +1,356 @@
+"""
+Browserless engine for the Trafikverket Scraper
+Replays the tmg104 ASP.NET WebForms postback with a pooled HTTP session
+instead of driving Chrome: the occasion is set in the form data, every
+checkbox is ticked, "Tabell" is chosen and cmdStarta is posted directly.
+The same client can also take over a session started in Selenium (hybrid).
+"""
+
+import re
+from html.parser import HTMLParser
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    requests = None
+
+from html_tables import normalize_cell_text, parse_table
+from instrumentation import detail
+
+try:
+    from config import PAGE_LOAD_TIMEOUT
+except ImportError:
+    PAGE_LOAD_TIMEOUT = 10
+
+try:
+    from config import HTTP_POOL_SIZE
+except ImportError:
+    HTTP_POOL_SIZE = 10
+
+
+# Span ids holding the page metadata, same as the Selenium engine reads
+METADATA_IDS = {
+    'lblDLaen': 'county',
+    'lblDVaegnr': 'road number',
+    'lblDPunktnummer': 'punkt nummer',
+    'lblDRiktning': 'riktning',
+}
+
+START_BUTTON_NAME = 'cmdStarta'
+TABLE_FORMAT_VALUES = ('Tabell', 'Table')
+
+# The result popup is opened from script, e.g. window.open('tmg104visa.aspx?...')
+WINDOW_OPEN_PATTERN = re.compile(r"""window\.open\(\s*['"]([^'"]+)['"]""")
+AUTO_POSTBACK_PATTERN = re.compile(r"""__doPostBack\(\s*['"]([^'"]*)['"]""")
+
+
+class FormHTMLParser(HTMLParser):
+    """Collect the first <form>'s controls plus the metadata spans of a page"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.action = None
+        self.inputs = []    # dicts: name, type, value, checked, disabled
+        self.selects = []   # dicts: name, id, onchange, options [(value, text, selected)]
+        self.metadata = {}
+        self._in_form = False
+        self._form_done = False
+        self._select = None
+        self._option = None
+        self._metadata_key = None
+        self._metadata_text = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+
+        if attrs.get('id') in METADATA_IDS:
+            self._metadata_key = METADATA_IDS[attrs['id']]
+            self._metadata_text = []
+
+        if tag == 'form' and not self._form_done:
+            self._in_form = True
+            self.action = attrs.get('action') or ''
+            return
+        if not self._in_form:
+            return
+
+        if tag == 'input' and attrs.get('name'):
+            self.inputs.append({
+                'name': attrs['name'],
+                'type': (attrs.get('type') or 'text').lower(),
+                'value': attrs.get('value'),
+                'checked': 'checked' in attrs,
+                'disabled': 'disabled' in attrs,
+            })
+        elif tag == 'select' and attrs.get('name'):
+            self._select = {
+                'name': attrs['name'],
+                'id': attrs.get('id') or '',
+                'onchange': attrs.get('onchange') or '',
+                'disabled': 'disabled' in attrs,
+                'options': [],
+            }
+            self.selects.append(self._select)
+        elif tag == 'option' and self._select is not None:
+            self._close_option()
+            self._option = [attrs.get('value'), [], 'selected' in attrs]
+
+    def handle_endtag(self, tag):
+        if tag == 'span' and self._metadata_key:
+            value = normalize_cell_text(''.join(self._metadata_text))
+            if value:
+                self.metadata[self._metadata_key] = value
+            self._metadata_key = None
+        elif tag == 'form' and self._in_form:
+            self._in_form = False
+            self._form_done = True
+        elif tag == 'option':
+            self._close_option()
+        elif tag == 'select':
+            self._close_option()
+            self._select = None
+
+    def handle_data(self, data):
+        if self._metadata_key:
+            self._metadata_text.append(data)
+        if self._option is not None:
+            self._option[1].append(data)
+
+    def _close_option(self):
+        if self._option is None:
+            return
+        value, text_parts, selected = self._option
+        text = normalize_cell_text(''.join(text_parts))
+        # Without a value attribute the option's text is submitted
+        self._select['options'].append((text if value is None else value, text, selected))
+        self._option = None
+
+
+class WebForm:
+    """The parsed state of the tmg104 form, ready to be posted back"""
+
+    def __init__(self, html, page_url):
+        parser = FormHTMLParser()
+        parser.feed(html)
+        parser.close()
+        self.page_url = page_url
+        self.action_url = urljoin(page_url, parser.action or page_url)
+        self.inputs = parser.inputs
+        self.selects = parser.selects
+        self.metadata = parser.metadata
+
+    @property
+    def is_form(self):
+        return bool(self.inputs or self.selects)
+
+    def occasion_select(self):
+        """Find the measurement occasion dropdown (same preference as the Selenium engine)"""
+        for select in self.selects:
+            if 'Matt' in select['id'] or 'Matt' in select['name']:
+                return select
+        return self.selects[0] if self.selects else None
+
+    def occasions(self):
+        """Measurement occasions as (value, text) pairs"""
+        select = self.occasion_select()
+        if select is None:
+            return []
+        return [(value, text) for value, text, _ in select['options'] if value]
+
+    def build_payload(self, occasion_value=None, event_target=None, submit=False):
+        """Form data as a browser would post it, with the request form fully configured"""
+        occasion = self.occasion_select()
+        payload = []
+
+        for field in self.inputs:
+            if field['disabled']:
+                continue
+            name, field_type, value = field['name'], field['type'], field['value']
+
+            if field_type == 'checkbox':
+                # Tick every checkbox
+                payload.append((name, value if value is not None else 'on'))
+            elif field_type == 'radio':
+                if value in TABLE_FORMAT_VALUES:
+                    payload.append((name, value))
+                elif field['checked'] and not self._has_table_radio(name):
+                    payload.append((name, value if value is not None else 'on'))
+            elif field_type in ('submit', 'button', 'image', 'reset', 'file'):
+                if submit and name == START_BUTTON_NAME:
+                    payload.append((name, value or ''))
+            elif name == '__EVENTTARGET':
+                payload.append((name, event_target or ''))
+            elif name == '__EVENTARGUMENT':
+                payload.append((name, ''))
+            else:
+                payload.append((name, value or ''))
+
+        for select in self.selects:
+            if select['disabled']:
+                continue
+            if select is occasion and occasion_value is not None:
+                payload.append((select['name'], occasion_value))
+                continue
+            # A presentation-format dropdown gets its "Tabell" option
+            table_options = [value for value, text, _ in select['options']
+                             if value in TABLE_FORMAT_VALUES or text in TABLE_FORMAT_VALUES]
+            if table_options:
+                payload.append((select['name'], table_options[0]))
+                continue
+            selected = [value for value, _, is_selected in select['options'] if is_selected]
+            if not selected and select['options']:
+                selected = [select['options'][0][0]]
+            for value in selected[:1]:
+                payload.append((select['name'], value))
+
+        if event_target and not any(name == '__EVENTTARGET' for name, _ in payload):
+            payload.append(('__EVENTTARGET', event_target))
+            payload.append(('__EVENTARGUMENT', ''))
+        return payload
+
+    def _has_table_radio(self, name):
+        return any(f['type'] == 'radio' and f['name'] == name and f['value'] in TABLE_FORMAT_VALUES
+                   for f in self.inputs)
+
+    def occasion_auto_postback_target(self):
+        """Event target posted when the occasion dropdown changes, or None"""
+        select = self.occasion_select()
+        if select is None:
+            return None
+        match = AUTO_POSTBACK_PATTERN.search(select['onchange'])
+        if match:
+            return match.group(1) or select['name']
+        return None
+
+
+def create_session(pool_size=None):
+    """HTTP session with a connection pool sized for one worker's requests"""
+    if requests is None:
+        raise ImportError("The http engine requires the 'requests' package: pip install requests")
+    pool_size = pool_size or HTTP_POOL_SIZE
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = (
+        'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) '
+        'Chrome/120.0 Safari/537.36'
+    )
+    return session
+
+
+class TrafikverketHttpClient:
+    """Drives the tmg104 request form over plain HTTP"""
+
+    def __init__(self, url, session=None, timeout=None):
+        self.url = url
+        self.session = session or create_session()
+        self.timeout = timeout or PAGE_LOAD_TIMEOUT
+        self.form = None
+        self.last_result_url = None
+        # Set by adopt_browser when the popup URL can be rewritten per occasion
+        self.result_url = None
+        self.result_url_param = None
+
+    def get(self, url):
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    def post(self, url, payload, referer):
+        response = self.session.post(url, data=payload, timeout=self.timeout,
+                                     headers={'Referer': referer})
+        response.raise_for_status()
+        return response
+
+    def adopt_browser(self, driver, popup_url, occasion_value):
+        """Continue a session started in Selenium (hybrid engine).
+        
+        Copies the browser's cookies and user agent, takes the form state from
+        the main window and remembers the result popup's URL. If that URL
+        carries the occasion as a query parameter, later occasions are fetched
+        by swapping the parameter instead of posting the form.
+        """
+        self.session.cookies.clear()
+        for cookie in driver.get_cookies():
+            self.session.cookies.set(cookie['name'], cookie['value'],
+                                     domain=cookie.get('domain'), path=cookie.get('path', '/'))
+        self.session.headers['User-Agent'] = driver.execute_script("return navigator.userAgent;")
+        
+        self.form = WebForm(driver.page_source, driver.current_url)
+        if not self.form.is_form:
+            raise ValueError("Request form not found in browser page")
+        
+        self.last_result_url = popup_url
+        self.result_url = popup_url
+        self.result_url_param = None
+        query = parse_qsl(urlparse(popup_url).query, keep_blank_values=True)
+        matches = [name for name, value in query if value == occasion_value]
+        if len(matches) == 1:
+            self.result_url_param = matches[0]
+    
+    def result_url_for(self, value):
+        """Popup URL for another occasion, derived from the captured one"""
+        parsed = urlparse(self.result_url)
+        query = [(name, value if name == self.result_url_param else current)
+                 for name, current in parse_qsl(parsed.query, keep_blank_values=True)]
+        return urlunparse(parsed._replace(query=urlencode(query)))
+    
+    def open(self):
+        """Load the request form; returns the page metadata"""
+        detail(f"Fetching {self.url} over HTTP...")
+        self.session.cookies.clear()
+        response = self.get(self.url)
+        self.form = WebForm(response.text, response.url)
+        if not self.form.is_form:
+            raise ValueError("Request form not found on page")
+        detail(f"  Form has {len(self.form.inputs)} input(s) and {len(self.form.selects)} select(s)")
+        return self.form.metadata
+
+    def get_occasions(self):
+        return self.form.occasions()
+
+    def select_occasion(self, value):
+        """Replay the dropdown's auto-postback, if it has one, to refresh the form state"""
+        target = self.form.occasion_auto_postback_target()
+        if not target:
+            return
+        response = self.post(self.form.action_url, self.form.build_payload(value, event_target=target),
+                             self.form.page_url)
+        form = WebForm(response.text, response.url)
+        if form.is_form:
+            self.form = form
+
+    def fetch_result(self, value):
+        """Post the form for one occasion and return the result page HTML"""
+        if self.result_url_param:
+            self.last_result_url = self.result_url_for(value)
+            return self.get(self.last_result_url).text
+        
+        self.select_occasion(value)
+        payload = self.form.build_payload(value, submit=True)
+        response = self.post(self.form.action_url, payload, self.form.page_url)
+        html = response.text
+
+        # The postback normally returns the form again with a script that opens the popup
+        popup_match = WINDOW_OPEN_PATTERN.search(html)
+        form = WebForm(html, response.url)
+        if form.is_form:
+            self.form = form
+
+        if popup_match:
+            self.last_result_url = urljoin(response.url, popup_match.group(1))
+            return self.get(self.last_result_url).text
+
+        # Otherwise the result was rendered inline
+        self.last_result_url = response.url
+        return html
+
+    def fetch_table(self, value, table_index=2):
+        """Result table for one occasion (same dict shape as html_tables.parse_table)"""
+        return parse_table(self.fetch_result(value), table_index)
+
+    def close(self):
+        self.session.close()
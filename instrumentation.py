@@ -0,0 +1,125 @@
+"""
+Instrumentation for the Trafikverket Scraper
+Timing spans (URL > occasion > phase), row counters and optional tracemalloc
+peaks, written as JSON lines to METRICS_FILE. Also holds the verbose switch:
+step-by-step and per-row messages go through detail() and are only printed
+with --verbose (config.VERBOSE_OUTPUT).
+"""
+
+import contextlib
+import json
+import os
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+try:
+    from config import VERBOSE_OUTPUT
+except ImportError:
+    VERBOSE_OUTPUT = False
+
+try:
+    from config import METRICS_FILE, TRACE_MEMORY
+except ImportError:
+    METRICS_FILE = "scrape_metrics.jsonl"
+    TRACE_MEMORY = False
+
+
+_verbose = VERBOSE_OUTPUT
+
+
+def set_verbose(verbose):
+    """Turn the step-by-step console output on or off (per process)"""
+    global _verbose
+    _verbose = bool(verbose)
+
+
+def is_verbose():
+    return _verbose
+
+
+def detail(*args, **kwargs):
+    """print() for step-by-step and per-row messages, shown only in verbose mode"""
+    if _verbose:
+        print(*args, **kwargs)
+
+
+class Instrumentation:
+    """Spans and counters of one scraper, appended to a JSON-lines file.
+
+    Every finished span writes one record (name, parent, duration, fields
+    and, with trace_memory, the tracemalloc peak inside the span); close()
+    writes a summary record with the counters and per-phase totals.
+    """
+
+    def __init__(self, log_file=None, trace_memory=None, run_id=None):
+        self.log_file = METRICS_FILE if log_file is None else log_file
+        self.trace_memory = TRACE_MEMORY if trace_memory is None else trace_memory
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.counters = {}
+        self.phase_totals = {}  # span name -> seconds
+        self._stack = []
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextlib.contextmanager
+    def span(self, name, **fields):
+        """Time a block; nested spans record their parent's name"""
+        if self.trace_memory:
+            # Hand the peak so far to the enclosing span before measuring our own
+            _, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1]['peak'] = max(self._stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+        frame = {'name': name, 'peak': 0, 'fields': fields}
+        parent = self._stack[-1]['name'] if self._stack else None
+        self._stack.append(frame)
+        started = time.perf_counter()
+        status = 'ok'
+        try:
+            yield frame['fields']
+        except BaseException:
+            status = 'error'
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            self._stack.pop()
+            self.phase_totals[name] = self.phase_totals.get(name, 0.0) + duration
+            record = {'type': 'span', 'name': name, 'parent': parent, 'duration': round(duration, 6),
+                      'status': status}
+            if self.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                frame['peak'] = max(frame['peak'], peak)
+                if self._stack:
+                    self._stack[-1]['peak'] = max(self._stack[-1]['peak'], frame['peak'])
+                record['memory_peak_kb'] = round(frame['peak'] / 1024, 1)
+            record.update(frame['fields'])
+            self.write(record)
+
+    def write(self, record):
+        """Append one record to the JSON-lines log (no-op without a log file)"""
+        if not self.log_file:
+            return
+        record = dict(record, run=self.run_id, pid=os.getpid(),
+                      time=datetime.now().isoformat(timespec='milliseconds'))
+        line = (json.dumps(record, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+        try:
+            # One O_APPEND write per record keeps lines intact across worker processes
+            fd = os.open(self.log_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            print(f"Warning: Could not write metrics to {self.log_file}: {e}")
+            self.log_file = None
+
+    def close(self, **fields):
+        """Write the summary record with counters and per-phase totals"""
+        self.write(dict({'type': 'summary', 'counters': self.counters,
+                         'phase_totals': {name: round(seconds, 6) for name, seconds in self.phase_totals.items()}},
+                        **fields))
@@ -0,0 +1,89 @@
+"""
+Checkpoint journal for the Trafikverket Scraper
+Records every completed measurement occasion (and URL) in an append-only
+JSON-lines file so an interrupted run can be resumed with --resume
+"""
+
+import json
+import os
+from datetime import datetime
+
+try:
+    from config import JOURNAL_FILE
+except ImportError:
+    JOURNAL_FILE = "scrape_journal.jsonl"
+
+
+class ScrapeJournal:
+    """Append-only record of completed work units, keyed by URL and occasion value"""
+
+    def __init__(self, path=None):
+        self.path = path or JOURNAL_FILE
+        self.completed_occasions = set()  # (url, occasion value)
+        self.completed_urls = set()
+
+    def load(self):
+        """Read completed work units from disk; tolerates a truncated last line"""
+        self.completed_occasions.clear()
+        self.completed_urls.clear()
+        if not os.path.exists(self.path):
+            return self
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Partially written line from a crash
+                if entry.get('occasion') is None:
+                    self.completed_urls.add(entry['url'])
+                else:
+                    self.completed_occasions.add((entry['url'], entry['occasion']))
+        return self
+
+    def reset(self):
+        """Start a fresh journal (used when a run does not resume).
+
+        The previous journal is kept as <path>.<timestamp> so a rerun without
+        --resume does not throw away the resume state; returns that path or None.
+        """
+        rotated = None
+        if os.path.exists(self.path):
+            rotated = f"{self.path}.{datetime.now():%Y%m%d-%H%M%S}"
+            os.replace(self.path, rotated)
+        self.completed_occasions.clear()
+        self.completed_urls.clear()
+        return rotated
+
+    def is_url_done(self, url):
+        return url in self.completed_urls
+
+    def is_occasion_done(self, url, occasion):
+        return (url, occasion) in self.completed_occasions
+
+    def _append(self, entry):
+        entry['completed_at'] = datetime.now().isoformat(timespec='seconds')
+        line = (json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8')
+        # One O_APPEND write per entry keeps lines intact when several worker
+        # processes share the journal; fsync makes it survive a crash
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def record_occasion(self, url, occasion, text, rows_inserted, rows_skipped):
+        """Mark one measurement occasion of a URL as completed"""
+        self._append({
+            'url': url,
+            'occasion': occasion,
+            'text': text,
+            'rows_inserted': rows_inserted,
+            'rows_skipped': rows_skipped,
+        })
+        self.completed_occasions.add((url, occasion))
+
+    def record_url(self, url, rows_inserted):
+        """Mark a whole URL as completed"""
+        self._append({'url': url, 'occasion': None, 'rows_inserted': rows_inserted})
+        self.completed_urls.add(url)
@@ -0,0 +1,141 @@
+"""
+Long-format traffic measurements
+public.traffic_measurements_long has one row per measurement and vehicle
+type (time, point, vehicle_type, count, avg_speed) instead of the 11
+count/speed column pairs of traffic_data. The scraper writes it in the same
+transaction as the wide rows, so analyses by vehicle type are indexed reads
+instead of pivoting traffic_data in memory. Like traffic_data it is
+partitioned by month. rebuild_long_table() refills it from traffic_data.
+"""
+
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+from partitions import ensure_partitions, forget_partitions, is_partitioned, next_month, stored_months
+from table_parser import TRAFFIC_DATA_COLUMNS
+
+try:
+    from config import DB_BATCH_SIZE
+except ImportError:
+    DB_BATCH_SIZE = 1000
+
+LONG_TABLE = 'traffic_measurements_long'
+LONG_COLUMNS = ['measurement_time', 'county', 'road_number', 'punkt_nummer', 'vehicle_type', 'count', 'avg_speed']
+
+# Vehicle type codes (the traffic_data column prefixes, e.g. 'heavy_vehicles_trailer')
+# with the positions of their count and speed in a traffic_data row
+VEHICLE_TYPES = [column[:-len('_count')] for column in TRAFFIC_DATA_COLUMNS if column.endswith('_count')]
+VEHICLE_TYPE_POSITIONS = [
+    (code, TRAFFIC_DATA_COLUMNS.index(f'{code}_count'), TRAFFIC_DATA_COLUMNS.index(f'{code}_avg_speed'))
+    for code in VEHICLE_TYPES
+]
+
+CREATE_LONG_TABLE_SQL = """
+    CREATE TABLE public.traffic_measurements_long (
+        measurement_time TIMESTAMP NOT NULL,
+        county VARCHAR(100),
+        road_number VARCHAR(10),
+        punkt_nummer VARCHAR(20),
+        vehicle_type VARCHAR(40) NOT NULL,
+        count INTEGER,
+        avg_speed DECIMAL(5, 2)
+    ) PARTITION BY RANGE (measurement_time)
+"""
+
+LONG_INDEX_SQL = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_traffic_measurements_long ON public.traffic_measurements_long "
+    "(measurement_time, county, road_number, punkt_nummer, vehicle_type)",
+    "CREATE INDEX IF NOT EXISTS idx_traffic_long_type_time ON public.traffic_measurements_long "
+    "(vehicle_type, measurement_time)",
+    "CREATE INDEX IF NOT EXISTS idx_traffic_long_punkt_type_time ON public.traffic_measurements_long "
+    "(punkt_nummer, vehicle_type, measurement_time)",
+    "CREATE INDEX IF NOT EXISTS idx_traffic_long_time_brin ON public.traffic_measurements_long "
+    "USING brin (measurement_time) WITH (pages_per_range = 32)",
+]
+
+
+def create_long_table(cursor):
+    """Create traffic_measurements_long and its indexes if missing; returns True if created"""
+    if is_partitioned(cursor, LONG_TABLE) is not None:
+        return False
+    cursor.execute(CREATE_LONG_TABLE_SQL)
+    for statement in LONG_INDEX_SQL:
+        cursor.execute(statement)
+    return True
+
+
+def long_rows(rows):
+    """Unpivot traffic_data rows (TRAFFIC_DATA_COLUMNS order) into LONG_COLUMNS tuples.
+
+    Vehicle types without a count and a speed are left out.
+    """
+    result = []
+    for row in rows:
+        key = tuple(row[:4])
+        for code, count_position, speed_position in VEHICLE_TYPE_POSITIONS:
+            count, speed = row[count_position], row[speed_position]
+            if count is not None or speed is not None:
+                result.append(key + (code, count, speed))
+    return result
+
+
+def insert_long_rows(cursor, rows):
+    """Write the long rows of inserted traffic_data rows in the caller's transaction; returns the count.
+
+    The monthly partitions must exist (ensure_partitions(..., LONG_TABLE)).
+    """
+    values = long_rows(rows)
+    if not values:
+        return 0
+    insert_sql = sql.SQL(
+        "INSERT INTO public.traffic_measurements_long ({}) VALUES %s ON CONFLICT DO NOTHING"
+    ).format(sql.SQL(', ').join(map(sql.Identifier, LONG_COLUMNS)))
+    execute_values(cursor, insert_sql.as_string(cursor), values, page_size=DB_BATCH_SIZE)
+    return len(values)
+
+
+def unpivot_select():
+    """SELECT producing LONG_COLUMNS from traffic_data t for one month (two %s bounds)"""
+    pairs = sql.SQL(', ').join(
+        sql.SQL("({}, t.{}, t.{})").format(sql.Literal(code), sql.Identifier(f'{code}_count'),
+                                          sql.Identifier(f'{code}_avg_speed'))
+        for code in VEHICLE_TYPES
+    )
+    return sql.SQL("""
+        SELECT t.measurement_time, t.county, t.road_number, t.punkt_nummer, v.vehicle_type, v.count, v.avg_speed
+        FROM public.traffic_data t
+        CROSS JOIN LATERAL (VALUES {}) AS v(vehicle_type, count, avg_speed)
+        WHERE t.measurement_time >= %s AND t.measurement_time < %s
+        AND (v.count IS NOT NULL OR v.avg_speed IS NOT NULL)
+    """).format(pairs)
+
+
+def rebuild_long_table(connection):
+    """Refill traffic_measurements_long from traffic_data, one committed month at a time.
+
+    Returns the number of long rows written.
+    """
+    cursor = connection.cursor()
+    try:
+        create_long_table(cursor)
+        cursor.execute("TRUNCATE public.traffic_measurements_long")
+        connection.commit()
+
+        months = stored_months(cursor)
+        insert_sql = sql.SQL("INSERT INTO public.traffic_measurements_long ({}) {} ON CONFLICT DO NOTHING").format(
+            sql.SQL(', ').join(map(sql.Identifier, LONG_COLUMNS)), unpivot_select())
+        total = 0
+        for idx, month in enumerate(months, 1):
+            ensure_partitions(cursor, [month], LONG_TABLE)
+            cursor.execute(insert_sql, (month.isoformat(), next_month(month).isoformat()))
+            written = cursor.rowcount
+            connection.commit()
+            total += written
+            print(f"[{idx}/{len(months)}] {month:%Y-%m}: {written} long rows")
+        return total
+    except BaseException:
+        connection.rollback()
+        forget_partitions()
+        raise
+    finally:
+        cursor.close()
@@ -0,0 +1,238 @@
+"""
+Monthly partitioning of public.traffic_data
+The table is declaratively partitioned by RANGE (measurement_time), one
+partition per month (traffic_data_yYYYYmMM). Partitions are created on demand
+before a batch is inserted, and the indexes are defined on the parent so
+every partition gets them: BRIN on measurement_time (tiny, and rows arrive
+roughly in time order), B-tree on punkt_nummer and (road_number, county).
+migrate_to_partitioned() moves an existing unpartitioned table over.
+The partition helpers take a `table` so derived tables
+(traffic_measurements_long) are partitioned the same way.
+"""
+
+from datetime import date
+
+from psycopg2 import sql
+
+from table_parser import TRAFFIC_DATA_COLUMNS
+
+PARENT_TABLE = 'traffic_data'
+MIGRATED_TABLE = 'traffic_data_unpartitioned'
+# Serializes partition creation across scraper processes
+PARTITION_LOCK_KEY = 'public.traffic_data partitions'
+
+TRAFFIC_DATA_COLUMNS_SQL = """
+    measurement_time TIMESTAMP NOT NULL,
+    county VARCHAR(100),
+    road_number VARCHAR(10),
+    punkt_nummer VARCHAR(20),
+
+    all_vehicles_count INTEGER,
+    all_vehicles_avg_speed DECIMAL(5, 2),
+
+    passenger_car_count INTEGER,
+    passenger_car_avg_speed DECIMAL(5, 2),
+
+    heavy_vehicles_count INTEGER,
+    heavy_vehicles_avg_speed DECIMAL(5, 2),
+
+    heavy_vehicles_trailer_count INTEGER,
+    heavy_vehicles_trailer_avg_speed DECIMAL(5, 2),
+
+    heavy_vehicles_no_trailer_count INTEGER,
+    heavy_vehicles_no_trailer_avg_speed DECIMAL(5, 2),
+
+    three_axle_tractor_trailer_count INTEGER,
+    three_axle_tractor_trailer_avg_speed DECIMAL(5, 2),
+
+    two_axle_tractor_trailer_count INTEGER,
+    two_axle_tractor_trailer_avg_speed DECIMAL(5, 2),
+
+    three_axle_tractor_no_trailer_count INTEGER,
+    three_axle_tractor_no_trailer_avg_speed DECIMAL(5, 2),
+
+    two_axle_tractor_no_trailer_count INTEGER,
+    two_axle_tractor_no_trailer_avg_speed DECIMAL(5, 2),
+
+    passenger_car_trailer_count INTEGER,
+    passenger_car_trailer_avg_speed DECIMAL(5, 2),
+
+    passenger_car_no_trailer_count INTEGER,
+    passenger_car_no_trailer_avg_speed DECIMAL(5, 2),
+
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+"""
+
+# The primary key and unique index of a partitioned table must contain the
+# partition key, so the key is (id, measurement_time). The constraint is
+# named so it does not clash with traffic_data_pkey of a migrated table.
+CREATE_PARTITIONED_TABLE_SQL = f"""
+    CREATE TABLE public.traffic_data (
+        id SERIAL,
+        {TRAFFIC_DATA_COLUMNS_SQL},
+        CONSTRAINT traffic_data_partitioned_pkey PRIMARY KEY (id, measurement_time)
+    ) PARTITION BY RANGE (measurement_time)
+"""
+
+# Rows are appended in insertion order, so a BRIN index keeps the
+# incremental Parquet export's created_at filter cheap on any table layout
+CREATED_AT_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS idx_traffic_data_created_brin ON public.traffic_data "
+    "USING brin (created_at) WITH (pages_per_range = 32)"
+)
+
+PARTITIONED_INDEX_SQL = [
+    "CREATE INDEX IF NOT EXISTS idx_traffic_data_time_brin ON public.traffic_data "
+    "USING brin (measurement_time) WITH (pages_per_range = 32)",
+    CREATED_AT_INDEX_SQL,
+    "CREATE INDEX IF NOT EXISTS idx_traffic_data_punkt ON public.traffic_data (punkt_nummer)",
+    "CREATE INDEX IF NOT EXISTS idx_traffic_data_road_county ON public.traffic_data (road_number, county)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_traffic_data_measurement "
+    "ON public.traffic_data (measurement_time, county, road_number, punkt_nummer)",
+]
+
+# table -> months known to have a partition, per process (filled from the catalog on first use)
+_known_months = {}
+
+
+def month_start(value):
+    """First day of the month of a date, datetime or pandas Timestamp"""
+    return date(value.year, value.month, 1)
+
+
+def next_month(value):
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def partition_name(month, table=PARENT_TABLE):
+    """traffic_data_y2024m01 for January 2024"""
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def is_partitioned(cursor, table=PARENT_TABLE):
+    """True/False for an existing public.<table>, None if there is no table"""
+    cursor.execute("""
+        SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'public' AND c.relname = %s
+    """, (table,))
+    row = cursor.fetchone()
+    return None if row is None else row[0] == 'p'
+
+
+def create_partitioned_table(cursor):
+    """Create the partitioned parent table and its indexes (no partitions yet)"""
+    cursor.execute(CREATE_PARTITIONED_TABLE_SQL)
+    for statement in PARTITIONED_INDEX_SQL:
+        cursor.execute(statement)
+
+
+def existing_months(cursor, table=PARENT_TABLE):
+    """Months that already have a partition, from the partition names"""
+    cursor.execute("""
+        SELECT child.relname FROM pg_inherits i
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_class child ON child.oid = i.inhrelid
+        JOIN pg_namespace n ON n.oid = parent.relnamespace
+        WHERE n.nspname = 'public' AND parent.relname = %s
+    """, (table,))
+    months = set()
+    prefix = f"{table}_y"
+    for name, in cursor.fetchall():
+        if name.startswith(prefix) and len(name) == len(prefix) + 7:
+            months.add(date(int(name[len(prefix):len(prefix) + 4]), int(name[-2:]), 1))
+    return months
+
+
+def stored_months(cursor):
+    """First days of the months that may hold traffic_data rows, in order"""
+    if is_partitioned(cursor):
+        return sorted(existing_months(cursor))
+    cursor.execute("SELECT DISTINCT date_trunc('month', measurement_time)::date FROM public.traffic_data")
+    return sorted(row[0] for row in cursor.fetchall())
+
+
+def ensure_partitions(cursor, times, table=PARENT_TABLE):
+    """Create the monthly partitions of public.<table> for the given timestamps that do not exist yet.
+
+    Runs in the caller's transaction; returns the names of created partitions.
+    """
+    months = {month_start(value) for value in times if value is not None}
+    if table in _known_months and months <= _known_months[table]:
+        return []
+
+    # Another process may be creating the same month right now
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (PARTITION_LOCK_KEY,))
+    known = _known_months[table] = existing_months(cursor, table)
+    created = []
+    for month in sorted(months - known):
+        name = partition_name(month, table)
+        cursor.execute(sql.SQL(
+            "CREATE TABLE IF NOT EXISTS public.{} PARTITION OF public.{} FOR VALUES FROM (%s) TO (%s)"
+        ).format(sql.Identifier(name), sql.Identifier(table)), (month.isoformat(), next_month(month).isoformat()))
+        known.add(month)
+        created.append(name)
+    return created
+
+
+def forget_partitions():
+    """Drop the cached partition lists (e.g. after a migration or rollback)"""
+    _known_months.clear()
+
+
+def migrate_to_partitioned(connection, drop_old=False):
+    """Move an unpartitioned public.traffic_data into a new partitioned table.
+
+    Runs as one transaction: the old table is renamed to
+    traffic_data_unpartitioned, the partitioned table and the partitions for
+    every stored month are created, and all rows (ids and created_at kept)
+    are copied over. The old table is dropped only with drop_old.
+    Returns the number of rows copied.
+    """
+    cursor = connection.cursor()
+    try:
+        state = is_partitioned(cursor)
+        if state is None:
+            raise RuntimeError("public.traffic_data does not exist")
+        if state:
+            print("public.traffic_data is already partitioned")
+            return 0
+
+        cursor.execute("LOCK TABLE public.traffic_data IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(sql.SQL("ALTER TABLE public.traffic_data RENAME TO {}").format(
+            sql.Identifier(MIGRATED_TABLE)))
+        # Free the index names used by the new parent table
+        cursor.execute(sql.SQL("ALTER INDEX IF EXISTS public.uq_traffic_data_measurement RENAME TO {}").format(
+            sql.Identifier(f"uq_{MIGRATED_TABLE}_measurement")))
+        cursor.execute(sql.SQL("ALTER INDEX IF EXISTS public.idx_traffic_data_created_brin RENAME TO {}").format(
+            sql.Identifier(f"idx_{MIGRATED_TABLE}_created_brin")))
+        create_partitioned_table(cursor)
+
+        cursor.execute(sql.SQL(
+            "SELECT DISTINCT date_trunc('month', measurement_time) FROM public.{}"
+        ).format(sql.Identifier(MIGRATED_TABLE)))
+        forget_partitions()
+        created = ensure_partitions(cursor, [row[0] for row in cursor.fetchall()])
+        print(f"Created {len(created)} monthly partition(s)")
+
+        columns = sql.SQL(', ').join(map(sql.Identifier, ['id'] + TRAFFIC_DATA_COLUMNS + ['created_at']))
+        cursor.execute(sql.SQL(
+            "INSERT INTO public.traffic_data ({columns}) SELECT {columns} FROM public.{old} "
+            "ON CONFLICT DO NOTHING"
+        ).format(columns=columns, old=sql.Identifier(MIGRATED_TABLE)))
+        copied = cursor.rowcount
+
+        # New ids continue after the copied ones
+        cursor.execute("""
+            SELECT setval(pg_get_serial_sequence('public.traffic_data', 'id'),
+                          COALESCE((SELECT max(id) FROM public.traffic_data), 0) + 1, false)
+        """)
+        if drop_old:
+            cursor.execute(sql.SQL("DROP TABLE public.{}").format(sql.Identifier(MIGRATED_TABLE)))
+        connection.commit()
+        return copied
+    except BaseException:
+        connection.rollback()
+        forget_partitions()
+        raise
+    finally:
+        cursor.close()
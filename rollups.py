@@ -0,0 +1,182 @@
+"""
+Rollup tables for traffic_data
+traffic_rollup_hourly (by hour of day) and traffic_rollup_daily (by date)
+aggregate the measurements per point, road, county and vehicle type: number
+of measurements, summed counts, count-weighted speed sums and min/max of
+counts and speeds. The scraper folds every inserted batch into them in the
+same transaction, so dashboards read a few thousand rollup rows instead of
+the full history. rebuild_rollups() recomputes them from traffic_data.
+
+Average speed of a rollup row: speed_weighted_sum / speed_weight.
+"""
+
+import pandas as pd
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+from long_format import LONG_COLUMNS, long_rows, unpivot_select
+from partitions import next_month, stored_months
+
+try:
+    from config import DB_BATCH_SIZE
+except ImportError:
+    DB_BATCH_SIZE = 1000
+
+# name -> (table, bucket column, bucket type, SQL expression for the bucket)
+ROLLUPS = {
+    'hourly': ('traffic_rollup_hourly', 'hour', 'SMALLINT', "extract(hour from u.measurement_time)::smallint"),
+    'daily': ('traffic_rollup_daily', 'day', 'DATE', "u.measurement_time::date"),
+}
+
+# Missing county/road/punkt are stored as '' so they take part in the primary key
+KEY_COLUMNS = ['punkt_nummer', 'road_number', 'county']
+VALUE_COLUMNS = ['measurements', 'count_sum', 'speed_weighted_sum', 'speed_weight',
+                 'count_min', 'count_max', 'speed_min', 'speed_max']
+
+CREATE_ROLLUP_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS public.{table} (
+        punkt_nummer VARCHAR(20) NOT NULL DEFAULT '',
+        road_number VARCHAR(10) NOT NULL DEFAULT '',
+        county VARCHAR(100) NOT NULL DEFAULT '',
+        {bucket} {bucket_type} NOT NULL,
+        vehicle_type VARCHAR(40) NOT NULL,
+        measurements INTEGER NOT NULL DEFAULT 0,
+        count_sum BIGINT NOT NULL DEFAULT 0,
+        speed_weighted_sum NUMERIC NOT NULL DEFAULT 0,
+        speed_weight BIGINT NOT NULL DEFAULT 0,
+        count_min INTEGER,
+        count_max INTEGER,
+        speed_min DECIMAL(5, 2),
+        speed_max DECIMAL(5, 2),
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (punkt_nummer, road_number, county, {bucket}, vehicle_type)
+    )
+"""
+
+# Folds incoming aggregates (EXCLUDED) into the stored row r
+MERGE_SQL = """
+    ON CONFLICT (punkt_nummer, road_number, county, {bucket}, vehicle_type) DO UPDATE SET
+        measurements = r.measurements + EXCLUDED.measurements,
+        count_sum = r.count_sum + EXCLUDED.count_sum,
+        speed_weighted_sum = r.speed_weighted_sum + EXCLUDED.speed_weighted_sum,
+        speed_weight = r.speed_weight + EXCLUDED.speed_weight,
+        count_min = LEAST(r.count_min, EXCLUDED.count_min),
+        count_max = GREATEST(r.count_max, EXCLUDED.count_max),
+        speed_min = LEAST(r.speed_min, EXCLUDED.speed_min),
+        speed_max = GREATEST(r.speed_max, EXCLUDED.speed_max),
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+
+def _columns(bucket):
+    return KEY_COLUMNS + [bucket, 'vehicle_type'] + VALUE_COLUMNS
+
+
+def create_rollup_tables(cursor):
+    """Create the rollup tables and their bucket indexes if missing"""
+    for table, bucket, bucket_type, _ in ROLLUPS.values():
+        cursor.execute(CREATE_ROLLUP_TABLE_SQL.format(table=table, bucket=bucket, bucket_type=bucket_type))
+        cursor.execute(sql.SQL("CREATE INDEX IF NOT EXISTS {} ON public.{} ({}, vehicle_type)").format(
+            sql.Identifier(f"idx_{table}_{bucket}"), sql.Identifier(table), sql.Identifier(bucket)))
+
+
+def aggregate_batch(rows):
+    """{rollup name: [row tuples]} for traffic_data rows (TRAFFIC_DATA_COLUMNS order)"""
+    values = long_rows(rows)
+    if not values:
+        return {}
+    df = pd.DataFrame(values, columns=LONG_COLUMNS)
+    df[KEY_COLUMNS] = df[KEY_COLUMNS].fillna('')
+    df['measurement_time'] = pd.to_datetime(df['measurement_time'])
+    df['count'] = pd.to_numeric(df['count'], errors='coerce')
+    df['avg_speed'] = pd.to_numeric(df['avg_speed'], errors='coerce').astype('float64')
+    has_speed = df['avg_speed'].notna() & df['count'].notna()
+    df['speed_weighted_sum'] = (df['count'] * df['avg_speed']).where(has_speed, 0.0)
+    df['speed_weight'] = df['count'].where(has_speed, 0)
+
+    result = {}
+    for name, (_, bucket, _, _) in ROLLUPS.items():
+        if bucket == 'hour':
+            df[bucket] = df['measurement_time'].dt.hour
+        else:
+            df[bucket] = df['measurement_time'].dt.date
+        grouped = df.groupby(KEY_COLUMNS + [bucket, 'vehicle_type'], sort=True).agg(
+            measurements=('count', 'size'),
+            count_sum=('count', 'sum'),
+            speed_weighted_sum=('speed_weighted_sum', 'sum'),
+            speed_weight=('speed_weight', 'sum'),
+            count_min=('count', 'min'),
+            count_max=('count', 'max'),
+            speed_min=('avg_speed', 'min'),
+            speed_max=('avg_speed', 'max'),
+        ).reset_index()
+        for column in ['count_sum', 'speed_weight']:
+            grouped[column] = grouped[column].astype('int64')
+        for column in ['count_min', 'count_max']:
+            grouped[column] = grouped[column].astype('Int64')
+        grouped = grouped[_columns(bucket)].astype(object)
+        result[name] = list(grouped.where(grouped.notna(), None).itertuples(index=False, name=None))
+    return result
+
+
+def update_rollups(cursor, rows):
+    """Fold inserted traffic_data rows into the rollups in the caller's transaction.
+
+    Rows are upserted in key order so concurrent writers lock them in the same order.
+    """
+    for name, values in aggregate_batch(rows).items():
+        table, bucket, _, _ = ROLLUPS[name]
+        upsert_sql = sql.SQL("INSERT INTO public.{} AS r ({}) VALUES %s").format(
+            sql.Identifier(table), sql.SQL(', ').join(map(sql.Identifier, _columns(bucket)))
+        ) + sql.SQL(MERGE_SQL.format(bucket=bucket))
+        execute_values(cursor, upsert_sql.as_string(cursor), values, page_size=DB_BATCH_SIZE)
+
+
+def _rebuild_sql(table, bucket, bucket_expr):
+    """INSERT ... SELECT aggregating one month of traffic_data (two %s bounds) into a rollup"""
+    return sql.SQL("""
+        INSERT INTO public.{table} AS r ({columns})
+        SELECT COALESCE(u.punkt_nummer, ''), COALESCE(u.road_number, ''), COALESCE(u.county, ''),
+               {bucket_expr}, u.vehicle_type,
+               count(*), COALESCE(sum(u.count), 0),
+               COALESCE(sum(u.count * u.avg_speed), 0),
+               COALESCE(sum(u.count) FILTER (WHERE u.avg_speed IS NOT NULL), 0),
+               min(u.count), max(u.count), min(u.avg_speed), max(u.avg_speed)
+        FROM ({unpivot}) u
+        GROUP BY 1, 2, 3, 4, 5
+    """).format(table=sql.Identifier(table), columns=sql.SQL(', ').join(map(sql.Identifier, _columns(bucket))),
+                bucket_expr=sql.SQL(bucket_expr), unpivot=unpivot_select()) + sql.SQL(MERGE_SQL.format(bucket=bucket))
+
+
+def rebuild_rollups(connection):
+    """Recompute the rollup tables from traffic_data, one committed month at a time.
+
+    Returns {rollup name: rows in the table}.
+    """
+    cursor = connection.cursor()
+    try:
+        create_rollup_tables(cursor)
+        for table, _, _, _ in ROLLUPS.values():
+            cursor.execute(sql.SQL("TRUNCATE public.{}").format(sql.Identifier(table)))
+        connection.commit()
+
+        months = stored_months(cursor)
+        statements = [_rebuild_sql(table, bucket, expr) for table, bucket, _, expr in ROLLUPS.values()]
+        for idx, month in enumerate(months, 1):
+            bounds = (month.isoformat(), next_month(month).isoformat())
+            for statement in statements:
+                cursor.execute(statement, bounds)
+            connection.commit()
+            print(f"[{idx}/{len(months)}] {month:%Y-%m} aggregated")
+
+        sizes = {}
+        for name, (table, _, _, _) in ROLLUPS.items():
+            cursor.execute(sql.SQL("SELECT count(*) FROM public.{}").format(sql.Identifier(table)))
+            sizes[name] = cursor.fetchone()[0]
+        connection.commit()
+        return sizes
+    except BaseException:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
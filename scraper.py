@@ -6,20 +6,35 @@ Compatible with Python 3.9.6+
 
 import time
 import pandas as pd
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import Select
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
 import os
-from datetime import datetime
+import hashlib
+import multiprocessing
+import multiprocessing.util
+from datetime import datetime, date, timedelta
 from urllib.parse import urlparse, parse_qs
 import re
 import psycopg2
 from psycopg2 import sql
+from psycopg2.extras import execute_values
+from browser import BrowserSession
+from html_tables import parse_table
+from table_parser import TRAFFIC_DATA_COLUMNS, HeaderMappingError, batch_to_rows, parse_table_batch
+from translations import compile_translations, load_translation_file, translation_path
+from http_engine import TrafikverketHttpClient, create_session
+from journal import JOURNAL_FILE, ScrapeJournal
+from archive import ARCHIVE_DIRECTORY, RawHtmlArchive
+from coordinates import get_coordinate_store
+from partitions import (CREATED_AT_INDEX_SQL, create_partitioned_table, ensure_partitions, forget_partitions,
+                        is_partitioned)
+from long_format import LONG_TABLE, create_long_table, insert_long_rows
+from rollups import ROLLUPS, create_rollup_tables, update_rollups
+from exporters import PARQUET_DIRECTORY, ParquetPartitionWriter, StreamingCsvWriter
+from instrumentation import METRICS_FILE, Instrumentation, detail, is_verbose, set_verbose
 
 # Import config
 try:
@@ -28,6 +43,96 @@ except ImportError:
     OUTPUT_DIRECTORY = "./output"
     rowCount = 0
 
+try:
+    from config import ELEMENT_WAIT_TIMEOUT, PAGE_LOAD_TIMEOUT
+except ImportError:
+    ELEMENT_WAIT_TIMEOUT = 10
+    PAGE_LOAD_TIMEOUT = 10
+
+try:
+    from config import BULK_TABLE_EXTRACTION
+except ImportError:
+    BULK_TABLE_EXTRACTION = True
+
+try:
+    from config import SCRIPT_FORM_SETUP
+except ImportError:
+    SCRIPT_FORM_SETUP = True
+
+try:
+    from config import INCREMENTAL_SCRAPING, INCREMENTAL_MIN_ROWS_PER_DAY
+except ImportError:
+    INCREMENTAL_SCRAPING = True
+    INCREMENTAL_MIN_ROWS_PER_DAY = 24
+
+try:
+    from config import DB_BATCH_SIZE
+except ImportError:
+    DB_BATCH_SIZE = 1000
+
+try:
+    from config import MAX_RETRIES, RETRY_DELAY, RETRY_BUDGET_PER_URL
+except ImportError:
+    MAX_RETRIES = 3
+    RETRY_DELAY = 2
+    RETRY_BUDGET_PER_URL = 10
+
+try:
+    from config import ARCHIVE_RAW_HTML
+except ImportError:
+    ARCHIVE_RAW_HTML = False
+
+try:
+    from config import CSV_EXPORT
+except ImportError:
+    CSV_EXPORT = True
+
+try:
+    from config import PARQUET_EXPORT
+except ImportError:
+    PARQUET_EXPORT = False
+
+try:
+    from config import LONG_FORMAT_TABLE
+except ImportError:
+    LONG_FORMAT_TABLE = True
+
+try:
+    from config import ROLLUP_TABLES
+except ImportError:
+    ROLLUP_TABLES = True
+
+try:
+    from config import SCRAPER_ENGINE
+except ImportError:
+    SCRAPER_ENGINE = 'selenium'
+
+ENGINES = ('selenium', 'http', 'hybrid')
+
+
+class TransientStepError(Exception):
+    """A scraping step found the page not ready yet (e.g. no popup); worth a retry"""
+
+
+# Step failures retry_step retries: slow or re-rendered pages and dropped
+# connections. Anything else (e.g. unmappable table headers) fails at once.
+TRANSIENT_ERRORS = (TransientStepError, TimeoutException, StaleElementReferenceException,
+                    NoSuchElementException, ConnectionError, TimeoutError, psycopg2.OperationalError)
+try:
+    import requests
+    TRANSIENT_ERRORS += (requests.ConnectionError, requests.Timeout)
+except ImportError:
+    requests = None
+
+
+def is_transient_error(error):
+    """True for errors a retry can fix, including HTTP 5xx responses"""
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    response = getattr(error, 'response', None)
+    return requests is not None and isinstance(error, requests.HTTPError) and \
+        response is not None and response.status_code >= 500
+
 # Import compatibility module
 try:
     from compatibility import check_dependencies, print_system_info
@@ -39,73 +144,355 @@ except ImportError:
         pass
 
 
+# True once the document has loaded and no ASP.NET AJAX postback is in flight
+POSTBACK_IDLE_SCRIPT = """
+return document.readyState === 'complete' &&
+    !(window.Sys && Sys.WebForms && Sys.WebForms.PageRequestManager &&
+      Sys.WebForms.PageRequestManager.getInstance().get_isInAsyncPostBack());
+"""
+
+# True if the page has ASP.NET AJAX, whose postbacks update the document in place
+ASYNC_POSTBACK_SCRIPT = """
+return !!(window.Sys && Sys.WebForms && Sys.WebForms.PageRequestManager);
+"""
+
+# Configures the whole request form in one round trip: selects the occasion
+# (arguments[0]), ticks every checkbox and picks the "Tabell" format. Returns a
+# report of what was found and changed. If the occasion dropdown posts back on
+# change, the change event is fired and the script stops, returning the
+# dropdown (report.select) so the caller can wait for the postback and re-run
+# it on the re-rendered form.
+CONFIGURE_FORM_SCRIPT = """
+var occasion = arguments[0];
+var report = {occasion_found: false, occasion_selected: false, occasion_changed: false,
+              postback: false, checkboxes_total: 0, checkboxes_checked: 0,
+              table_format_found: false, table_format_changed: false};
+
+var selects = document.getElementsByTagName('select');
+var select = null;
+for (var i = 0; i < selects.length; i++) {
+    var key = (selects[i].id || '') + ' ' + (selects[i].name || '');
+    if (key.indexOf('Matt') !== -1) { select = selects[i]; break; }
+}
+if (!select && selects.length) { select = selects[0]; }
+if (select) {
+    report.occasion_found = true;
+    if (select.value !== occasion) {
+        select.value = occasion;
+        report.occasion_changed = true;
+        var onchange = select.getAttribute('onchange') || '';
+        if (select.value === occasion && onchange.indexOf('__doPostBack') !== -1) {
+            report.occasion_selected = true;
+            report.postback = true;
+            report.select = select;
+            select.dispatchEvent(new Event('change', {bubbles: true}));
+            return report;
+        }
+    }
+    report.occasion_selected = select.value === occasion;
+}
+
+var boxes = document.querySelectorAll("input[type='checkbox']");
+report.checkboxes_total = boxes.length;
+for (var j = 0; j < boxes.length; j++) {
+    if (!boxes[j].checked && !boxes[j].disabled) {
+        boxes[j].checked = true;
+        report.checkboxes_checked++;
+    }
+}
+
+var inputs = document.getElementsByTagName('input');
+for (var k = 0; k < inputs.length; k++) {
+    var input = inputs[k];
+    if ((input.value === 'Tabell' || input.value === 'Table') &&
+            (input.type === 'radio' || input.type === 'checkbox')) {
+        report.table_format_found = true;
+        if (!input.checked) { input.checked = true; report.table_format_changed = true; }
+        break;
+    }
+}
+if (!report.table_format_found) {
+    for (var m = 0; m < selects.length && !report.table_format_found; m++) {
+        var options = selects[m].options;
+        for (var n = 0; n < options.length; n++) {
+            if (options[n].value === 'Tabell' || options[n].text === 'Tabell') {
+                report.table_format_found = true;
+                if (!options[n].selected) { selects[m].selectedIndex = n; report.table_format_changed = true; }
+                break;
+            }
+        }
+    }
+}
+return report;
+"""
+
+# All script texts of the current page in one WebDriver call
+SCRIPT_TEXTS_SCRIPT = """
+return Array.prototype.map.call(document.getElementsByTagName('script'),
+                                function (script) { return script.innerHTML; });
+"""
+
+# Coordinates in page scripts, e.g. "lat": 59.xxx or latitude: 59.xxx
+LATITUDE_PATTERN = re.compile(r'["\']?(?:lat|latitude)["\']?\s*:\s*([0-9.]+)')
+LONGITUDE_PATTERN = re.compile(r'["\']?(?:lon|longitude)["\']?\s*:\s*([0-9.]+)')
+
+# Dates in occasion labels, e.g. "2023-05-01 - 2023-05-14"
+OCCASION_DATE_PATTERN = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+
+# PostgreSQL connection settings
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'postgres',
+    'password': 'postgres',
+    'database': 'traffic_data',
+    'port': 5432
+}
+
+
+def connect_database(db_config=None):
+    """Open a PostgreSQL connection without touching the schema; raises RuntimeError if it fails"""
+    try:
+        return psycopg2.connect(**(db_config or DB_CONFIG))
+    except Exception as e:
+        raise RuntimeError(f"No database connection: {e}") from e
+
+
+def ensure_tables(connection):
+    """Create the schema, traffic_data (partitioned by month), its unique and created_at
+    indexes and the enabled long-format and rollup tables if they don't exist"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("CREATE SCHEMA IF NOT EXISTS public")
+        connection.commit()
+        
+        partitioned = is_partitioned(cursor)
+        if partitioned is None:
+            print("Creating traffic_data table (partitioned by month)...")
+            create_partitioned_table(cursor)
+            connection.commit()
+            print("✓ Table created successfully with indexes")
+        elif partitioned:
+            detail("✓ Table 'traffic_data' already exists (partitioned by month)")
+        else:
+            detail("✓ Table 'traffic_data' already exists")
+            detail("  Not partitioned; move it over with: python cli.py migrate-partitions")
+        
+        create_unique_index(connection, cursor)
+        # Older tables get it here; the Parquet export selects new rows by created_at
+        cursor.execute(CREATED_AT_INDEX_SQL)
+        connection.commit()
+        
+        if LONG_FORMAT_TABLE:
+            if create_long_table(cursor):
+                print(f"✓ Created {LONG_TABLE} (one row per measurement and vehicle type)")
+                print("  Fill it from rows stored earlier with: python cli.py rebuild-long")
+            connection.commit()
+        
+        if ROLLUP_TABLES:
+            create_rollup_tables(cursor)
+            connection.commit()
+    except Exception as e:
+        print(f"Error creating table: {e}")
+        connection.rollback()
+    finally:
+        cursor.close()
+
+
+def create_unique_index(connection, cursor):
+    """Ensure the uniqueness constraint used by ON CONFLICT DO NOTHING exists"""
+    try:
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_traffic_data_measurement
+            ON public.traffic_data (measurement_time, county, road_number, punkt_nummer)
+        """)
+        connection.commit()
+    except Exception as e:
+        # Fails on older tables that already contain duplicate measurements
+        connection.rollback()
+        print(f"Warning: Could not create unique index on traffic_data: {e}")
+        print("  Remove duplicate rows so repeated scrapes are skipped instead of re-inserted")
+
+
+def table_features(connection):
+    """(traffic_data partitioned, long table in use, rollups in use, unique index present)
+    for the existing tables"""
+    cursor = connection.cursor()
+    try:
+        partitioned = bool(is_partitioned(cursor))
+        cursor.execute("SELECT to_regclass('public.uq_traffic_data_measurement')")
+        unique_index = cursor.fetchone()[0] is not None
+        long_table = LONG_FORMAT_TABLE and is_partitioned(cursor, LONG_TABLE) is not None
+        rollups = ROLLUP_TABLES
+        for table, _, _, _ in ROLLUPS.values():
+            cursor.execute("SELECT to_regclass(%s)", (f"public.{table}",))
+            rollups = rollups and cursor.fetchone()[0] is not None
+        connection.commit()
+        return partitioned, long_table, rollups, unique_index
+    finally:
+        cursor.close()
+
+
+def unstored_rows(cursor, rows):
+    """Rows whose (measurement_time, county, road_number, punkt_nummer) is not in traffic_data yet.
+    
+    Used instead of ON CONFLICT while uq_traffic_data_measurement is missing;
+    duplicates within the batch are dropped too.
+    """
+    check_sql = """
+    SELECT COUNT(*) FROM public.traffic_data
+    WHERE measurement_time = %s
+      AND county = %s
+      AND road_number = %s
+      AND punkt_nummer = %s
+    """
+    fresh = []
+    seen = set()
+    for row in rows:
+        key = tuple(row[:4])
+        if key in seen:
+            continue
+        seen.add(key)
+        cursor.execute(check_sql, key)
+        if cursor.fetchone()[0] == 0:
+            fresh.append(row)
+    return fresh
+
+
+def insert_traffic_rows(connection, cursor, rows, features):
+    """Insert a batch of traffic_data rows in one transaction, skipping duplicates.
+    
+    features is table_features(connection). Returns (inserted, skipped), or
+    None if the transaction was rolled back; duplicates are detected by the
+    unique index on (measurement_time, county, road_number, punkt_nummer), or
+    by looking each row up if that index could not be created. The inserted
+    rows are also written to traffic_measurements_long and folded into the
+    hourly/daily rollups in the same transaction.
+    """
+    partitioned, long_table, rollups, unique_index = features
+    columns = sql.SQL(', ').join(map(sql.Identifier, TRAFFIC_DATA_COLUMNS))
+    insert_sql = sql.SQL(
+        "INSERT INTO public.traffic_data ({}) VALUES %s "
+        + ("ON CONFLICT DO NOTHING " if unique_index else "")
+        + "RETURNING {}"
+    ).format(columns, columns)
+    
+    try:
+        # Committed on its own so the parent tables are locked only briefly
+        times = [row[0] for row in rows]
+        created = ensure_partitions(cursor, times) if partitioned else []
+        if long_table:
+            created += ensure_partitions(cursor, times, LONG_TABLE)
+        if created:
+            connection.commit()
+        
+        # ON CONFLICT needs the unique index; without it plain inserts would duplicate rows
+        new_rows = rows if unique_index else unstored_rows(cursor, rows)
+        inserted_rows = execute_values(
+            cursor, insert_sql.as_string(connection), new_rows,
+            page_size=DB_BATCH_SIZE, fetch=True
+        ) if new_rows else []
+        if long_table:
+            insert_long_rows(cursor, inserted_rows)
+        if rollups and inserted_rows:
+            update_rollups(cursor, inserted_rows)
+        connection.commit()
+        inserted = len(inserted_rows)
+        return inserted, len(rows) - inserted
+    except Exception as e:
+        print(f"Error inserting batch of {len(rows)} rows: {e}")
+        connection.rollback()
+        forget_partitions()
+        return None
+
+
+def parse_speed_value(value):
+    """Convert Swedish decimal format (comma) to float"""
+    if pd.isna(value) or value == '':
+        return None
+    try:
+        value_str = str(value).strip()
+        if value_str == '0,0' or value_str == '0.0':
+            return 0.0
+        return float(value_str.replace(',', '.'))
+    except (ValueError, AttributeError):
+        return None
+
+
+def parse_count_value(value):
+    """Convert count to integer"""
+    if pd.isna(value) or value == '':
+        return 0
+    try:
+        return int(float(str(value).strip()))
+    except (ValueError, AttributeError):
+        return 0
+
+
 class TrafikverketScraper:
-    def __init__(self, url, headless=False):
-        """Initialize the scraper with the given URL"""
+    def __init__(self, url, headless=False, browser=None, engine=None, http_session=None, incremental=None,
+                 journal=None, archive=None, instrumentation=None, parquet=None):
+        """Initialize the scraper with the given URL.
+        
+        Pass a started or unstarted BrowserSession as `browser` to reuse one
+        Chrome across several scrapers; it is reset, not closed, after run().
+        `engine` is 'selenium' (drive Chrome), 'http' (post the form directly,
+        optionally over a shared `http_session`) or 'hybrid' (first occasion in
+        Chrome, the rest over HTTP with the browser's cookies).
+        With `incremental` (default: config.INCREMENTAL_SCRAPING) occasions
+        whose days are already fully stored are skipped. A loaded ScrapeJournal
+        as `journal` records completed occasions and skips those already in it.
+        Every result page is stored in `archive` (a RawHtmlArchive; default:
+        one in ARCHIVE_DIRECTORY if config.ARCHIVE_RAW_HTML, False disables it).
+        Spans and row counters go to `instrumentation` (default: a new
+        Instrumentation logging to config.METRICS_FILE).
+        Stored tables are also merged into the Parquet partitions under the
+        `parquet` directory (default: PARQUET_DIRECTORY if
+        config.PARQUET_EXPORT, False disables it).
+        """
         self.url = url
+        self.incremental = INCREMENTAL_SCRAPING if incremental is None else incremental
+        self.journal = journal
+        if archive is None:
+            archive = RawHtmlArchive() if ARCHIVE_RAW_HTML else False
+        self.archive = archive or None
+        if parquet is None:
+            parquet = PARQUET_DIRECTORY if PARQUET_EXPORT else False
+        self.parquet_directory = parquet or None
+        self.parquet_writer = None  # ParquetPartitionWriter for run()
+        self.current_occasion = (None, None)  # (value, text) being processed
+        self.instrumentation = instrumentation or Instrumentation()
+        self.last_table_result = None  # (inserted, skipped) of the last stored table
+        self.engine = engine or SCRAPER_ENGINE
+        if self.engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{self.engine}', expected one of {ENGINES}")
+        self.browser = browser
+        self.owns_browser = False
         self.driver = None
-        self.data = []
+        self.http_session = http_session
+        self.http_client = None
+        self.popup_url = None
+        self.window_handles_before_start = None
+        self.wait_times = {}  # step -> seconds spent in explicit waits
+        self.retry_counts = {}  # step -> retries performed
+        self.retries_left = RETRY_BUDGET_PER_URL
+        self.csv_writer = None  # StreamingCsvWriter for run()'s output file
         self.headless = headless
-        self.coordinate_cache = {}  # Cache for punkt_id -> (lat, lon)
+        self.coordinate_store = get_coordinate_store()  # punkt_id -> (lat, lon), shared by all workers
         self.page_metadata = {}  # Metadata extracted from page (Punktnummer, Vägnr, Län)
         self.total_rows_extracted = 0  # Track total rows extracted
         self.db_connection = None
         self.db_cursor = None
-        self.db_config = {
-            'host': 'localhost',
-            'user': 'postgres',
-            'password': 'postgres',
-            'database': 'traffic_data',
-            'port': 5432
-        }
-        self.load_coordinate_cache()  # Load cache from file
+        self.features = (False, False, False, False)  # table_features(), set by create_table_if_not_exists()
+        self.db_config = dict(DB_CONFIG)
         self.connect_to_database()  # Connect to PostgreSQL
         
-    def load_coordinate_cache(self):
-        """Load coordinate cache from file if it exists"""
-        cache_file = "coordinate_cache.txt"
-        if os.path.exists(cache_file):
-            try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        line = line.strip()
-                        if not line or line.startswith('#'):
-                            continue
-                        parts = line.split('|')
-                        if len(parts) == 3:
-                            punkt_id = parts[0].strip()
-                            lat = parts[1].strip()
-                            lon = parts[2].strip()
-                            self.coordinate_cache[punkt_id] = (lat, lon)
-                print(f"Loaded {len(self.coordinate_cache)} cached coordinates")
-            except Exception as e:
-                print(f"Warning: Could not load coordinate cache: {e}")
-    
-    def save_coordinate_cache(self):
-        """Save coordinate cache to file"""
-        cache_file = "coordinate_cache.txt"
-        try:
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                f.write("# Coordinate Cache (punkt_id|latitude|longitude)\n")
-                f.write("# Auto-generated - do not edit manually\n\n")
-                for punkt_id, (lat, lon) in self.coordinate_cache.items():
-                    f.write(f"{punkt_id}|{lat}|{lon}\n")
-            print(f"Saved {len(self.coordinate_cache)} coordinates to cache")
-        except Exception as e:
-            print(f"Warning: Could not save coordinate cache: {e}")
-    
     def connect_to_database(self):
         """Connect to PostgreSQL database"""
         try:
-            print("Connecting to PostgreSQL database...")
-            self.db_connection = psycopg2.connect(**self.db_config)
+            detail("Connecting to PostgreSQL database...")
+            self.db_connection = connect_database(self.db_config)
             self.db_cursor = self.db_connection.cursor()
-            
-            # Create public schema if it doesn't exist
-            self.db_cursor.execute("CREATE SCHEMA IF NOT EXISTS public")
-            self.db_connection.commit()
-            
-            print("✓ Connected to PostgreSQL")
+            detail("✓ Connected to PostgreSQL")
             
             # Check if table exists and create if needed
             self.create_table_if_not_exists()
@@ -114,153 +501,119 @@ class TrafikverketScraper:
             self.db_connection = None
             self.db_cursor = None
     
+    def close_database(self):
+        """Close the database cursor and connection"""
+        if self.db_cursor:
+            self.db_cursor.close()
+            self.db_cursor = None
+        if self.db_connection:
+            self.db_connection.close()
+            self.db_connection = None
+    
     def create_table_if_not_exists(self):
-        """Create the traffic_data table if it doesn't exist"""
+        """Create the tables if needed (see ensure_tables) and note which ones batches are written to"""
         try:
-            # Check if table exists
-            self.db_cursor.execute("""
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables 
-                    WHERE table_schema = 'public'
-                    AND table_name = 'traffic_data'
-                )
-            """)
-            table_exists = self.db_cursor.fetchone()[0]
-            
-            if not table_exists:
-                print("Creating traffic_data table...")
-                create_table_sql = """
-                CREATE TABLE public.traffic_data (
-                    id SERIAL PRIMARY KEY,
-                    measurement_time TIMESTAMP NOT NULL,
-                    county VARCHAR(100),
-                    road_number VARCHAR(10),
-                    punkt_nummer VARCHAR(20),
-                    
-                    all_vehicles_count INTEGER,
-                    all_vehicles_avg_speed DECIMAL(5, 2),
-                    
-                    passenger_car_count INTEGER,
-                    passenger_car_avg_speed DECIMAL(5, 2),
-                    
-                    heavy_vehicles_count INTEGER,
-                    heavy_vehicles_avg_speed DECIMAL(5, 2),
-                    
-                    heavy_vehicles_trailer_count INTEGER,
-                    heavy_vehicles_trailer_avg_speed DECIMAL(5, 2),
-                    
-                    heavy_vehicles_no_trailer_count INTEGER,
-                    heavy_vehicles_no_trailer_avg_speed DECIMAL(5, 2),
-                    
-                    three_axle_tractor_trailer_count INTEGER,
-                    three_axle_tractor_trailer_avg_speed DECIMAL(5, 2),
-                    
-                    two_axle_tractor_trailer_count INTEGER,
-                    two_axle_tractor_trailer_avg_speed DECIMAL(5, 2),
-                    
-                    three_axle_tractor_no_trailer_count INTEGER,
-                    three_axle_tractor_no_trailer_avg_speed DECIMAL(5, 2),
-                    
-                    two_axle_tractor_no_trailer_count INTEGER,
-                    two_axle_tractor_no_trailer_avg_speed DECIMAL(5, 2),
-                    
-                    passenger_car_trailer_count INTEGER,
-                    passenger_car_trailer_avg_speed DECIMAL(5, 2),
-                    
-                    passenger_car_no_trailer_count INTEGER,
-                    passenger_car_no_trailer_avg_speed DECIMAL(5, 2),
-                    
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-                """
-                self.db_cursor.execute(create_table_sql)
-                
-                # Create indexes
-                self.db_cursor.execute("CREATE INDEX idx_measurement_time ON public.traffic_data(measurement_time)")
-                self.db_cursor.execute("CREATE INDEX idx_punkt_nummer ON public.traffic_data(punkt_nummer)")
-                self.db_cursor.execute("CREATE INDEX idx_road_county ON public.traffic_data(road_number, county)")
-                
-                self.db_connection.commit()
-                print("✓ Table created successfully with indexes")
-            else:
-                print("✓ Table 'traffic_data' already exists")
+            ensure_tables(self.db_connection)
+            self.features = table_features(self.db_connection)
+            if not self.features[3]:
+                print("Warning: uq_traffic_data_measurement is missing; checking for stored rows one by one")
         except Exception as e:
-            print(f"Error creating table: {e}")
+            print(f"Error checking tables: {e}")
             self.db_connection.rollback()
     
     def parse_speed_value(self, value):
         """Convert Swedish decimal format (comma) to float"""
-        if pd.isna(value) or value == '':
-            return None
-        try:
-            value_str = str(value).strip()
-            if value_str == '0,0' or value_str == '0.0':
-                return 0.0
-            return float(value_str.replace(',', '.'))
-        except (ValueError, AttributeError):
-            return None
+        return parse_speed_value(value)
     
     def parse_count_value(self, value):
         """Convert count to integer"""
-        if pd.isna(value) or value == '':
-            return 0
-        try:
-            return int(float(str(value).strip()))
-        except (ValueError, AttributeError):
-            return 0
+        return parse_count_value(value)
+    
+    def insert_rows_to_database(self, rows):
+        """Insert a batch of rows in one transaction (see insert_traffic_rows).
+        
+        Returns (inserted, skipped), or None if the batch could not be written
+        (no connection, or the transaction was rolled back).
+        """
+        if not rows:
+            return 0, 0
+        if not self.db_connection or not self.db_cursor:
+            return None
+        return insert_traffic_rows(self.db_connection, self.db_cursor, rows, self.features)
     
     def insert_row_to_database(self, row_data):
         """Insert a single row into the traffic_data table, skip if duplicate exists"""
+        result = self.insert_rows_to_database([row_data])
+        if result is None:
+            return False
+        inserted, skipped = result
+        if skipped:
+            detail(f"    Row already exists: {row_data[0]} | {row_data[1]} | {row_data[2]} | {row_data[3]}")
+        return inserted > 0
+    
+    
+    def get_stored_days(self, punkt_nummer):
+        """Rows already stored per day for one measurement point: {date: count}"""
+        if not self.db_connection or not self.db_cursor or not punkt_nummer:
+            return {}
         try:
-            if not self.db_connection or not self.db_cursor:
-                return False
-            
-            # Extract key fields for duplicate check
-            measurement_time = row_data[0]
-            county = row_data[1]
-            road_number = row_data[2]
-            punkt_nummer = row_data[3]
-            
-            # Check if row with same measurement_time, county, road_number, punkt_nummer already exists
-            check_sql = """
-            SELECT COUNT(*) FROM public.traffic_data
-            WHERE measurement_time = %s 
-              AND county = %s 
-              AND road_number = %s 
-              AND punkt_nummer = %s
-            """
-            
-            self.db_cursor.execute(check_sql, (measurement_time, county, road_number, punkt_nummer))
-            existing_count = self.db_cursor.fetchone()[0]
-            
-            if existing_count > 0:
-                print(f"    Row already exists: {measurement_time} | {county} | {road_number} | {punkt_nummer}")
-                return False
-            
-            insert_sql = """
-            INSERT INTO public.traffic_data (
-                measurement_time, county, road_number, punkt_nummer,
-                all_vehicles_count, all_vehicles_avg_speed,
-                passenger_car_count, passenger_car_avg_speed,
-                heavy_vehicles_count, heavy_vehicles_avg_speed,
-                heavy_vehicles_trailer_count, heavy_vehicles_trailer_avg_speed,
-                heavy_vehicles_no_trailer_count, heavy_vehicles_no_trailer_avg_speed,
-                three_axle_tractor_trailer_count, three_axle_tractor_trailer_avg_speed,
-                two_axle_tractor_trailer_count, two_axle_tractor_trailer_avg_speed,
-                three_axle_tractor_no_trailer_count, three_axle_tractor_no_trailer_avg_speed,
-                two_axle_tractor_no_trailer_count, two_axle_tractor_no_trailer_avg_speed,
-                passenger_car_trailer_count, passenger_car_trailer_avg_speed,
-                passenger_car_no_trailer_count, passenger_car_no_trailer_avg_speed
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            self.db_cursor.execute(insert_sql, row_data)
+            self.db_cursor.execute("""
+                SELECT measurement_time::date AS day, COUNT(*)
+                FROM public.traffic_data
+                WHERE punkt_nummer = %s
+                GROUP BY 1
+            """, (punkt_nummer,))
+            stored = dict(self.db_cursor.fetchall())
             self.db_connection.commit()
-            return True
+            return stored
         except Exception as e:
-            print(f"Error inserting row: {e}")
-            return False
+            print(f"Warning: Could not look up stored data for {punkt_nummer}: {e}")
+            self.db_connection.rollback()
+            return {}
     
+    def occasion_date_range(self, text):
+        """(first_day, last_day) of an occasion label, or None if it has no dates"""
+        days = []
+        for year, month, day in OCCASION_DATE_PATTERN.findall(text or ''):
+            try:
+                days.append(date(int(year), int(month), int(day)))
+            except ValueError:
+                continue
+        if not days:
+            return None
+        return min(days), max(days)
+    
+    def filter_new_occasions(self, occasions):
+        """Drop occasions whose every day is already fully stored for this point.
+        
+        Occasions without a recognisable date range, reaching today or later,
+        or with any day below INCREMENTAL_MIN_ROWS_PER_DAY rows are kept.
+        """
+        punkt_nummer = self.page_metadata.get('punkt nummer')
+        if not punkt_nummer:
+            print("Incremental: punkt nummer unknown, scraping all occasions")
+            return occasions
+        
+        stored = self.get_stored_days(punkt_nummer)
+        if not stored:
+            return occasions
+        
+        today = date.today()
+        remaining = []
+        for value, text in occasions:
+            day_range = self.occasion_date_range(text)
+            if day_range is None or day_range[1] >= today:
+                remaining.append((value, text))
+                continue
+            first_day, last_day = day_range
+            days = [first_day + timedelta(days=n) for n in range((last_day - first_day).days + 1)]
+            if all(stored.get(day, 0) >= INCREMENTAL_MIN_ROWS_PER_DAY for day in days):
+                print(f"  Already stored, skipping: {text}")
+            else:
+                remaining.append((value, text))
+        
+        print(f"Incremental: {len(occasions) - len(remaining)} of {len(occasions)} occasion(s) already stored for {punkt_nummer}")
+        return remaining
     
     def extract_punkt_ids_from_url(self):
         """Extract punkt IDs from the URL parameter"""
@@ -275,37 +628,62 @@ class TrafikverketScraper:
             print(f"Warning: Could not extract punkt IDs from URL: {e}")
         return []
     
+    def resolve_coordinates(self, punkt_ids):
+        """Coordinates for several punkt IDs: {punkt_id: (lat, lon)}, (None, None) if unknown.
+        
+        Known points come from the coordinate store. The others are looked up
+        in the page's scripts, all fetched with one execute_script call and
+        scanned once; points still not found are recorded as misses so they
+        are not searched again until COORDINATE_MISS_TTL_DAYS have passed.
+        """
+        punkt_ids = list(dict.fromkeys(punkt_ids))
+        coordinates = self.coordinate_store.get_many(punkt_ids)
+        pending = [pid for pid in punkt_ids if pid not in coordinates]
+        if pending:
+            misses = self.coordinate_store.recent_misses(pending)
+            pending = [pid for pid in pending if pid not in misses]
+        
+        if pending and self.driver is not None:
+            try:
+                found = self.find_coordinates_in_scripts(self.driver.execute_script(SCRIPT_TEXTS_SCRIPT), pending)
+                if found:
+                    self.coordinate_store.bulk_load((pid, lat, lon) for pid, (lat, lon) in found.items())
+                    coordinates.update(found)
+                missing = [pid for pid in pending if pid not in found]
+                if missing:
+                    self.coordinate_store.mark_missing(missing)
+                    detail(f"  No coordinates found for: {', '.join(missing)}")
+            except Exception as e:
+                print(f"Warning: Could not look up coordinates: {e}")
+        
+        return {pid: coordinates.get(pid, (None, None)) for pid in punkt_ids}
+    
+    def find_coordinates_in_scripts(self, scripts, punkt_ids):
+        """One pass over the script texts; a point gets the first lat/lon of the first script naming it"""
+        found = {}
+        id_pattern = re.compile('|'.join(re.escape(pid) for pid in sorted(punkt_ids, key=len, reverse=True)))
+        for script_text in scripts or []:
+            if not script_text:
+                continue
+            named = {pid for pid in id_pattern.findall(script_text) if pid not in found}
+            if not named:
+                continue
+            lat_match = LATITUDE_PATTERN.search(script_text)
+            lon_match = LONGITUDE_PATTERN.search(script_text)
+            if lat_match and lon_match:
+                for pid in named:
+                    found[pid] = (lat_match.group(1), lon_match.group(1))
+            if len(found) == len(punkt_ids):
+                break
+        return found
+    
     def fetch_coordinate_from_trafikverket(self, punkt_id):
         """Fetch coordinates for a punkt ID from Trafikverket (if available)"""
-        # Try to find coordinates from the page
-        try:
-            # Search for punkt ID in page and extract nearby coordinate info
-            scripts = self.driver.find_elements(By.TAG_NAME, "script")
-            for script in scripts:
-                script_text = script.get_attribute("innerHTML")
-                if punkt_id in script_text:
-                    # Try to extract lat/lon if present in script
-                    # Look for patterns like "lat": 59.xxx or latitude: 59.xxx
-                    lat_match = re.search(r'["\']?(?:lat|latitude)["\']?\s*:\s*([0-9.]+)', script_text)
-                    lon_match = re.search(r'["\']?(?:lon|longitude)["\']?\s*:\s*([0-9.]+)', script_text)
-                    if lat_match and lon_match:
-                        return lat_match.group(1), lon_match.group(1)
-        except:
-            pass
-        return None, None
+        return self.resolve_coordinates([punkt_id])[punkt_id]
     
     def get_coordinates(self, punkt_id):
-        """Get coordinates for a punkt ID (from cache or fetch)"""
-        if punkt_id in self.coordinate_cache:
-            return self.coordinate_cache[punkt_id]
-        
-        # Try to fetch from website
-        lat, lon = self.fetch_coordinate_from_trafikverket(punkt_id)
-        if lat and lon:
-            self.coordinate_cache[punkt_id] = (lat, lon)
-            return lat, lon
-        
-        return None, None
+        """Get coordinates for a punkt ID (from the coordinate store or fetch)"""
+        return self.resolve_coordinates([punkt_id])[punkt_id]
     
     def extract_metadata_from_page(self):
         """Extract metadata from the rendered page (county, road number, punkt nummer, riktning)"""
@@ -317,7 +695,7 @@ class TrafikverketScraper:
                 county_value = county_element.text.strip()
                 if county_value:
                     metadata['county'] = county_value
-                    print(f"  Found county: {metadata['county']}")
+                    detail(f"  Found county: {metadata['county']}")
             except NoSuchElementException:
                 print("  Warning: Could not find county element (lblDLaen)")
             
@@ -327,7 +705,7 @@ class TrafikverketScraper:
                 road_value = road_element.text.strip()
                 if road_value:
                     metadata['road number'] = road_value
-                    print(f"  Found road number: {metadata['road number']}")
+                    detail(f"  Found road number: {metadata['road number']}")
             except NoSuchElementException:
                 print("  Warning: Could not find road number element (lblDVaegnr)")
             
@@ -337,7 +715,7 @@ class TrafikverketScraper:
                 punkt_value = punkt_element.text.strip()
                 if punkt_value:
                     metadata['punkt nummer'] = punkt_value
-                    print(f"  Found punkt nummer: {metadata['punkt nummer']}")
+                    detail(f"  Found punkt nummer: {metadata['punkt nummer']}")
             except NoSuchElementException:
                 print("  Warning: Could not find punkt nummer element (lblDPunktnummer)")
             
@@ -347,7 +725,7 @@ class TrafikverketScraper:
                 riktning_value = riktning_element.text.strip()
                 if riktning_value:
                     metadata['riktning'] = riktning_value
-                    print(f"  Found riktning: {metadata['riktning']}")
+                    detail(f"  Found riktning: {metadata['riktning']}")
             except NoSuchElementException:
                 print("  Warning: Could not find riktning element (lblDRiktning)")
             
@@ -358,59 +736,94 @@ class TrafikverketScraper:
 
         
     def setup_driver(self):
-        """Set up the Chrome WebDriver"""
-        print("Setting up Chrome WebDriver...")
-        options = webdriver.ChromeOptions()
-        
-        # Enable headless mode if requested
-        if self.headless:
-            options.add_argument('--headless')
-            print("Running in headless mode (faster)")
+        """Set up the Chrome WebDriver, reusing the injected browser session if any"""
+        if self.browser is None:
+            self.browser = BrowserSession(headless=self.headless)
+            self.owns_browser = True
+        self.driver = self.browser.start()
+    
+    def wait_for(self, step, condition, timeout=None):
+        """Wait until `condition` holds, adding the time spent to wait_times[step]"""
+        started = time.time()
+        try:
+            return WebDriverWait(
+                self.driver, timeout or ELEMENT_WAIT_TIMEOUT,
+                ignored_exceptions=(NoSuchElementException, StaleElementReferenceException)
+            ).until(condition)
+        finally:
+            self.wait_times[step] = self.wait_times.get(step, 0.0) + time.time() - started
+    
+    def retry_step(self, step, func, *args):
+        """Run one scraping step, retrying it with exponential backoff on transient errors.
         
-        options.add_argument('--start-maximized')
-        options.add_argument('--disable-blink-features=AutomationControlled')
-        options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        options.add_experimental_option('useAutomationExtension', False)
+        Only errors is_transient_error() accepts (timeouts, stale or missing
+        elements, dropped connections, HTTP 5xx) are retried; other exceptions
+        are raised at once, and whatever the step returns, False included, is
+        returned as is. Retries are taken from this URL's budget
+        (RETRY_BUDGET_PER_URL) and counted in retry_counts[step]. When the
+        retries run out, the last error is re-raised.
+        """
+        error = None
+        for attempt in range(MAX_RETRIES + 1):
+            if attempt:
+                if self.retries_left <= 0:
+                    print(f"  Retry budget for this URL used up, not retrying {step}")
+                    break
+                self.retries_left -= 1
+                self.retry_counts[step] = self.retry_counts.get(step, 0) + 1
+                self.instrumentation.count('retries')
+                delay = RETRY_DELAY * 2 ** (attempt - 1)
+                print(f"  Retrying {step} in {delay:g}s (retry {attempt}/{MAX_RETRIES})")
+                time.sleep(delay)
+            
+            try:
+                with self.instrumentation.span(step, attempt=attempt + 1):
+                    return func(*args)
+            except Exception as e:
+                if not is_transient_error(e):
+                    raise
+                print(f"  Step {step} failed: {e}")
+                error = e
+        raise error
+    
+    def postback_finished(self, driver):
+        """Wait condition: page loaded and no postback in progress"""
+        return driver.execute_script(POSTBACK_IDLE_SCRIPT)
+    
+    def wait_for_postback(self, step, element):
+        """Wait until a postback fired by a change on `element` finished.
         
-        try:
-            print("Attempting to set up ChromeDriver with webdriver-manager...")
-            service = Service(ChromeDriverManager().install())
-            self.driver = webdriver.Chrome(service=service, options=options)
-            print("WebDriver setup successful!")
-        except Exception as e:
-            print(f"Error with webdriver-manager: {e}")
-            print("Trying to use system ChromeDriver...")
+        A full __doPostBack replaces the document, and the outgoing one still
+        reports readyState 'complete', so without ASP.NET AJAX the old element
+        has to go stale before the new page is checked.
+        """
+        if not self.driver.execute_script(ASYNC_POSTBACK_SCRIPT):
+            self.wait_for(step, EC.staleness_of(element))
+        self.wait_for(step, self.postback_finished)
+    
+    def find_occasion_select(self):
+        """Find the measurement occasion dropdown, or None"""
+        select_selectors = [
+            "//select[@id*='Matt']",
+            "//select[contains(@name, 'Matt')]",
+            "//select[@name*='Mattle']",
+            "//select",
+        ]
+        for selector in select_selectors:
             try:
-                self.driver = webdriver.Chrome(options=options)
-                print("WebDriver setup successful with system ChromeDriver!")
-            except Exception as e2:
-                print(f"Error starting WebDriver: {e2}")
-                raise
+                elements = self.driver.find_elements(By.XPATH, selector)
+                if elements:
+                    return elements[0]
+            except:
+                continue
+        return None
     
     def get_measurement_occasions(self):
         """Get all available measurement occasions"""
         try:
-            print("Getting all measurement occasions...")
-            # Find the measurement occasion dropdown/select element
-            # Common selectors for select elements
-            select_selectors = [
-                "//select[@id*='Matt']",
-                "//select[contains(@name, 'Matt')]",
-                "//select[@name*='Mattle']",
-                "//select",  # Generic select as fallback
-            ]
-            
+            detail("Getting all measurement occasions...")
             occasions = []
-            select_element = None
-            
-            for selector in select_selectors:
-                try:
-                    elements = self.driver.find_elements(By.XPATH, selector)
-                    if elements:
-                        select_element = elements[0]
-                        break
-                except:
-                    continue
+            select_element = self.find_occasion_select()
             
             if select_element:
                 # Get all option elements
@@ -418,7 +831,7 @@ class TrafikverketScraper:
                 occasions = [(opt.get_attribute("value"), opt.text) for opt in options if opt.get_attribute("value")]
                 print(f"Found {len(occasions)} measurement occasion(s):")
                 for value, text in occasions:
-                    print(f"  - {text}")
+                    detail(f"  - {text}")
                 return occasions
             else:
                 print("Warning: Could not find measurement occasions dropdown")
@@ -430,108 +843,111 @@ class TrafikverketScraper:
     def select_measurement_occasion(self, value):
         """Select a specific measurement occasion"""
         try:
-            print(f"Selecting measurement occasion: {value}...")
-            
-            # Find and select the option
-            select_selectors = [
-                "//select[@id*='Matt']",
-                "//select[contains(@name, 'Matt')]",
-                "//select[@name*='Mattle']",
-                "//select",
-            ]
-            
-            select_element = None
-            for selector in select_selectors:
-                try:
-                    elements = self.driver.find_elements(By.XPATH, selector)
-                    if elements:
-                        select_element = elements[0]
-                        break
-                except:
-                    continue
+            detail(f"Selecting measurement occasion: {value}...")
             
+            select_element = self.find_occasion_select()
             if select_element:
-                # Use Select class to select the option
-                from selenium.webdriver.support.ui import Select
-                select = Select(select_element)
-                select.select_by_value(value)
-                time.sleep(1)
-                print(f"Selected: {value}")
+                dropdown = Select(select_element)
+                changed = dropdown.first_selected_option.get_attribute("value") != value
+                posts_back = '__doPostBack' in (select_element.get_attribute("onchange") or '')
+                dropdown.select_by_value(value)
+                if changed and posts_back:
+                    self.wait_for_postback('select_occasion', select_element)
+                
+                # Wait until the (possibly re-rendered) dropdown shows our occasion
+                def occasion_selected(driver):
+                    if not self.postback_finished(driver):
+                        return False
+                    current = self.find_occasion_select()
+                    return current is not None and Select(current).first_selected_option.get_attribute("value") == value
+                
+                self.wait_for('select_occasion', occasion_selected)
+                detail(f"Selected: {value}")
                 return True
             else:
-                print("Error: Could not find measurement occasions dropdown")
-                return False
+                raise TransientStepError("Could not find measurement occasions dropdown")
         except Exception as e:
+            if is_transient_error(e):
+                raise
             print(f"Error selecting measurement occasion {value}: {e}")
             return False
     
     def navigate_to_page(self):
-        """Navigate to the target page and extract metadata"""
+        """Navigate to the target page and extract metadata; raises TimeoutException if it does not load"""
         print(f"Navigating to {self.url}...")
         self.driver.get(self.url)
         # Wait for the measurement occasion dropdown to be clickable (indicates page is loaded)
         try:
-            WebDriverWait(self.driver, 10).until(
-                EC.presence_of_all_elements_located((By.XPATH, "//select[@id] | //option"))
+            self.wait_for(
+                'navigate',
+                EC.presence_of_all_elements_located((By.XPATH, "//select[@id] | //option")),
+                PAGE_LOAD_TIMEOUT
             )
-            print("Page loaded successfully")
+            detail("Page loaded successfully")
             
             # Extract and cache metadata once at the beginning
-            print("Extracting page metadata...")
+            detail("Extracting page metadata...")
             self.page_metadata = self.extract_metadata_from_page()
             if self.page_metadata:
-                print(f"  Cached metadata: {self.page_metadata}")
+                detail(f"  Cached metadata: {self.page_metadata}")
+            return True
         except TimeoutException:
-            print("Warning: Page load timeout, continuing anyway...")
+            print("Warning: Page load timeout")
+            raise
     
     def check_all_checkboxes(self):
         """Check all checkboxes on the page"""
-        print("Checking all checkboxes...")
+        detail("Checking all checkboxes...")
         try:
             # Find all checkboxes
             checkboxes = self.driver.find_elements(By.XPATH, "//input[@type='checkbox']")
-            print(f"Found {len(checkboxes)} checkboxes")
+            detail(f"Found {len(checkboxes)} checkboxes")
             
             for i, checkbox in enumerate(checkboxes):
-                # Scroll to checkbox if needed
-                self.driver.execute_script("arguments[0].scrollIntoView(true);", checkbox)
-                time.sleep(0.3)
-                
                 # Click if not already checked
                 if not checkbox.is_selected():
+                    # Scroll to checkbox if needed
+                    self.driver.execute_script("arguments[0].scrollIntoView(true);", checkbox)
+                    self.wait_for('check_checkboxes', EC.element_to_be_clickable(checkbox))
                     checkbox.click()
-                    print(f"  Checked checkbox {i+1}/{len(checkboxes)}")
-                time.sleep(0.2)
+                    self.wait_for('check_checkboxes', EC.element_to_be_selected(checkbox))
+                    detail(f"  Checked checkbox {i+1}/{len(checkboxes)}")
+            
+            # A checkbox with AutoPostBack re-renders the form
+            self.wait_for('check_checkboxes', self.postback_finished)
         except Exception as e:
             print(f"Error checking checkboxes: {e}")
     
     def select_table_format(self):
         """Select table as the presentation format"""
-        print("Selecting table format...")
+        detail("Selecting table format...")
         try:
             # Look for the presentation format dropdown/radio button
             # Common selectors for "table" option
             table_options = self.driver.find_elements(By.XPATH, "//input[@value='Tabell' or @value='Table' or contains(., 'Tabell')]")
             
             if table_options:
-                self.driver.execute_script("arguments[0].scrollIntoView(true);", table_options[0])
-                table_options[0].click()
-                print("Table format selected")
-                time.sleep(1)
+                table_option = table_options[0]
+                self.driver.execute_script("arguments[0].scrollIntoView(true);", table_option)
+                table_option.click()
+                if table_option.get_attribute("type") in ('radio', 'checkbox'):
+                    self.wait_for('select_table_format', EC.element_to_be_selected(table_option))
+                self.wait_for('select_table_format', self.postback_finished)
+                detail("Table format selected")
             else:
                 print("Warning: Could not find table format option, trying alternative selectors...")
                 # Try finding by label
                 labels = self.driver.find_elements(By.XPATH, "//label[contains(text(), 'Tabell')]")
                 if labels:
                     labels[0].click()
-                    print("Table format selected via label")
-                    time.sleep(1)
+                    self.wait_for('select_table_format', self.postback_finished)
+                    detail("Table format selected via label")
         except Exception as e:
             print(f"Warning: Could not select table format: {e}")
     
     def click_start_button(self):
-        """Click the start button to generate the table"""
-        print("Clicking the start button...")
+        """Click the start button to generate the table; returns True once the popup was handled"""
+        detail("Clicking the start button...")
         try:
             # Look for start button - common identifiers
             start_button = None
@@ -553,146 +969,267 @@ class TrafikverketScraper:
                     elements = self.driver.find_elements(By.XPATH, selector)
                     if elements:
                         start_button = elements[0]
-                        print(f"  Found button using selector: {selector}")
+                        detail(f"  Found button using selector: {selector}")
                         break
                 except:
                     continue
             
+            # Remember the open windows so the popup can be recognised as new
+            self.window_handles_before_start = self.driver.window_handles
+            
             if start_button:
                 self.driver.execute_script("arguments[0].scrollIntoView(true);", start_button)
-                time.sleep(0.5)
+                self.wait_for('click_start', EC.element_to_be_clickable(start_button))
                 start_button.click()
-                print("Start button clicked successfully")
+                detail("Start button clicked successfully")
                 # Wait for popup to open (handle_popup_window will wait for it)
-                self.handle_popup_window()
+                return self.handle_popup_window()
             else:
                 print("Warning: Could not find start button - trying JavaScript click")
                 # Try clicking via JavaScript as fallback
                 try:
                     self.driver.execute_script("document.getElementById('cmdStarta').click();")
-                    print("Started via JavaScript")
-                    self.handle_popup_window()
-                except:
+                    detail("Started via JavaScript")
+                    return self.handle_popup_window()
+                except Exception as e:
+                    if is_transient_error(e):
+                        raise
                     print("Error: Could not click start button")
+                    return False
         except Exception as e:
+            if is_transient_error(e):
+                raise
             print(f"Error clicking start button: {e}")
+            return False
     
     def handle_popup_window(self):
-        """Handle popup window and extract data"""
+        """Handle popup window and extract data; returns True once a popup was handled.
+        
+        Raises TransientStepError if no popup opened, so the start step is retried.
+        """
         try:
-            print("Checking for popup window...")
+            detail("Checking for popup window...")
             
-            # Get all window handles
             main_window = self.driver.current_window_handle
-            time.sleep(2)
+            known_windows = self.window_handles_before_start or [main_window]
+            self.window_handles_before_start = None
+            
+            # Wait for the popup's window handle to appear
+            try:
+                self.wait_for('popup_open', EC.new_window_is_opened(known_windows), PAGE_LOAD_TIMEOUT)
+            except TimeoutException:
+                pass
             
             # Get all open windows
             all_windows = self.driver.window_handles
-            print(f"  Found {len(all_windows)} window(s)")
+            new_windows = [handle for handle in all_windows if handle not in known_windows]
+            detail(f"  Found {len(all_windows)} window(s)")
             
             # Switch to popup if exists
-            if len(all_windows) > 1:
-                popup_window = all_windows[-1]  # Usually the last opened window
+            if new_windows:
+                popup_window = new_windows[-1]
                 self.driver.switch_to.window(popup_window)
-                print(f"  Switched to popup window")
-                # Wait for tables to appear in popup
+                detail(f"  Switched to popup window")
+                # Remembered so the hybrid engine can fetch later results directly
+                self.popup_url = self.driver.current_url
+                # Wait for the data table (table 3) to be rendered in the popup
                 try:
-                    WebDriverWait(self.driver, 5).until(
-                        EC.presence_of_all_elements_located((By.TAG_NAME, "table"))
+                    self.wait_for(
+                        'popup_table',
+                        lambda driver: len(driver.find_elements(By.TAG_NAME, "table")) > 2
+                        and driver.execute_script("return document.readyState") == 'complete'
                     )
                 except TimeoutException:
                     print("  Warning: Tables did not appear quickly, continuing...")
                 
-                # Extract table data from popup using cached metadata
-                self.extract_popup_table_data()
+                # Extract table data from popup using cached metadata; a failed
+                # read is retried on the open popup instead of restarting
+                try:
+                    if not self.retry_step('extract', self.extract_popup_table_data):
+                        print("  Could not extract the popup table")
+                except Exception as e:
+                    print(f"  Could not extract the popup table: {e}")
                 
                 # Close popup and switch back
                 self.driver.close()
                 self.driver.switch_to.window(main_window)
-                print("  Popup closed, switched back to main window")
+                detail("  Popup closed, switched back to main window")
+                return True
             else:
-                print("  No popup window found, data might be in main window")
+                raise TransientStepError("No popup window found")
+        except TransientStepError:
+            raise
         except Exception as e:
             print(f"Error handling popup: {e}")
+            return False
+    
+    def read_popup_table_bulk(self, table_index=2):
+        """Read one popup table with a single WebDriver call and parse it in-process"""
+        table_html = self.driver.execute_script(
+            "var tables = document.getElementsByTagName('table');"
+            "return tables.length > arguments[0] ? tables[arguments[0]].outerHTML : null;",
+            table_index
+        )
+        if table_html is None:
+            return None
+        # The outerHTML starts with the requested table; nested tables follow it
+        return parse_table(table_html, 0)
+    
+    def read_popup_table_per_cell(self, table_index=2):
+        """Read one popup table element by element (slow fallback)"""
+        tables = self.driver.find_elements(By.TAG_NAME, "table")
+        if len(tables) <= table_index:
+            return None
+        table = tables[table_index]
+        
+        headers = []
+        header_rows = []
+        rows = []
+        for row in table.find_elements(By.XPATH, ".//tr"):
+            header_cells = row.find_elements(By.XPATH, "./th")
+            if header_cells:
+                header_row = [(cell.text.strip(), int(cell.get_attribute("colspan") or 1)) for cell in header_cells]
+                header_rows.append(header_row)
+                headers.extend(text for text, _ in header_row)
+            cells = row.find_elements(By.XPATH, "./td")
+            if cells:
+                rows.append([cell.text.strip() for cell in cells])
+        return {'headers': headers, 'header_rows': header_rows, 'rows': rows}
+    
+    def read_popup_table(self, table_index=2):
+        """Read the popup result table, preferring bulk HTML extraction"""
+        if BULK_TABLE_EXTRACTION:
+            try:
+                return self.read_popup_table_bulk(table_index)
+            except Exception as e:
+                print(f"  Warning: Bulk table extraction failed ({e}), falling back to per-cell reads")
+        return self.read_popup_table_per_cell(table_index)
+    
+    def archive_page(self, html, page_url):
+        """Store a fetched result page in the raw HTML archive (if enabled)"""
+        if not self.archive or not html:
+            return
+        value, text = self.current_occasion
+        try:
+            digest = self.archive.store(html, self.url, occasion=value, text=text,
+                                        metadata=self.page_metadata, page_url=page_url)
+            detail(f"  Archived result page {digest[:12]}")
+        except Exception as e:
+            print(f"  Warning: Could not archive result page: {e}")
     
     def extract_popup_table_data(self):
-        """Extract data from popup table and insert into database"""
+        """Extract data from popup table and insert into database; returns success"""
         try:
-            print("Extracting data from popup...")
-            
-            # Find all tables in popup
-            tables = self.driver.find_elements(By.TAG_NAME, "table")
-            print(f"  Found {len(tables)} table(s) in popup")
-            
-            if len(tables) == 0:
-                print("  No tables found in popup, trying to find any data elements...")
-                return
-            
-            for table_idx, table in enumerate(tables):
-                # Only process table 3 (index 2)
-                if table_idx != 2:
-                    print(f"  Skipping popup table {table_idx + 1}...")
-                    continue
-                
-                print(f"  Processing popup table {table_idx + 1}...")
-                
-                # Extract headers
-                headers = []
-                header_cells = table.find_elements(By.XPATH, ".//th")
-                for cell in header_cells:
-                    headers.append(cell.text.strip())
-                
-                if headers:
-                    print(f"    Headers: {headers}")
-                
-                # Extract rows
-                rows = table.find_elements(By.XPATH, ".//tr")
-                print(f"    Found {len(rows)} rows")
-                
-                rows_inserted = 0
-                
-                for i, row in enumerate(rows):
-                    cells = row.find_elements(By.XPATH, "./td")
-                    if cells:
-                        row_data = [cell.text.strip() for cell in cells]
-                        
-                        # Skip header row (contains "Tidpunkt" or similar)
-                        if row_data and row_data[0].lower() in ['tidpunkt', 'time', 'tid']:
-                            print(f"    Row {i}: Skipping header row: {row_data[0]}")
-                            continue
-                        
-                        # Check if row limit is set
-                        if rowCount > 0 and self.total_rows_extracted >= rowCount:
-                            print(f"    Row {i}: Row limit of {rowCount} reached (current total: {self.total_rows_extracted}).")
-                            return
-                        
-                        # Parse and insert the row
-                        print(f"    Row {i}: Attempting to insert data from {row_data[0]}")
-                        if self.parse_and_insert_row(row_data):
-                            rows_inserted += 1
-                            self.total_rows_extracted += 1
-                            print(f"    Row {i}: Successfully inserted (total: {self.total_rows_extracted})")
-                        else:
-                            print(f"    Row {i}: Failed to insert row starting with: {row_data[0] if row_data else 'empty'}")
-                
-                if rows_inserted > 0:
-                    print(f"    Inserted {rows_inserted} data rows from popup table {table_idx + 1}")
-                    print(f"    Total rows inserted so far: {self.total_rows_extracted}")
-                
+            detail("Extracting data from popup...")
+            
+            # Only table 3 (index 2) holds the measurement data. When archiving,
+            # the table is parsed from the archived page so a re-ingest matches
+            table = None
+            if self.archive:
+                html = self.driver.page_source
+                self.archive_page(html, self.driver.current_url)
+                table = parse_table(html, 2)
+            if table is None:
+                table = self.read_popup_table(2)
+            if table is None:
+                # Not rendered yet
+                raise TransientStepError("Data table (table 3) not found in popup")
+            
+            return self.store_table(table)
         except Exception as e:
+            if is_transient_error(e):
+                raise
             print(f"Error extracting popup table data: {e}")
+            return False
     
-    def parse_and_insert_row(self, row_data):
-        """Parse row data and insert into database"""
+    def store_table(self, table):
+        """Parse a result table (html_tables dict) and insert its rows in one batch; returns success"""
         try:
-            if not self.db_connection or not self.db_cursor:
-                print(f"    Debug: Database connection issue")
-                return False
+            detail("  Processing popup table 3...")
+            
+            headers = table['headers']
+            if headers:
+                detail(f"    Headers: {headers}")
+            
+            rows = table['rows']
+            detail(f"    Found {len(rows)} rows")
+            
+            # Parse the whole table at once (columns mapped from the headers),
+            # then write it in one transaction
+            with self.instrumentation.span('parse', rows=len(rows)):
+                parsed, stats = parse_table_batch(table, self.page_metadata)
+            self.instrumentation.count('rows_parsed', stats['rows'])
+            self.instrumentation.count('rows_dropped', stats['dropped'])
+            if stats['dropped']:
+                print(f"    Dropped {stats['dropped']} row(s) that could not be parsed")
+            batch = batch_to_rows(parsed)
+            
+            # Check if row limit is set
+            if rowCount > 0:
+                remaining = rowCount - self.total_rows_extracted
+                if remaining <= 0:
+                    print(f"    Row limit of {rowCount} reached (current total: {self.total_rows_extracted}).")
+                    return True
+                if len(batch) > remaining:
+                    batch = batch[:remaining]
+                    parsed = parsed.iloc[:remaining]
+                    print(f"    Row limit reached. Trimmed batch to {remaining} rows")
+            
+            if self.db_connection is None:
+                # Without a database the output files are the only storage
+                self.write_outputs(parsed)
+                print(f"    No database connection, {len(batch)} data rows written to the output file(s) only")
+                return True
             
+            with self.instrumentation.span('db_insert', rows=len(batch)) as fields:
+                result = self.insert_rows_to_database(batch)
+                fields['inserted'] = result[0] if result else 0
+            if result is None:
+                self.instrumentation.count('rows_failed', len(batch))
+                print(f"    Failed to store {len(batch)} data rows from popup table 3")
+                return False
+            rows_inserted, rows_skipped = result
+            # Written after the insert so a retried table does not end up in the files twice
+            self.write_outputs(parsed)
+            self.instrumentation.count('rows_inserted', rows_inserted)
+            self.instrumentation.count('rows_skipped', rows_skipped)
+            self.total_rows_extracted += rows_inserted
+            self.last_table_result = (rows_inserted, rows_skipped)
+            
+            print(f"    Inserted {rows_inserted} data rows from popup table 3 ({rows_skipped} already stored)")
+            detail(f"    Total rows inserted so far: {self.total_rows_extracted}")
+            return True
+        
+        except HeaderMappingError as e:
+            # Same page, same headers: not worth a retry
+            self.instrumentation.count('tables_unmapped')
+            print(f"    Table not stored: {e}")
+            return False
+        except Exception as e:
+            print(f"Error storing table data: {e}")
+            return False
+    
+    def write_outputs(self, parsed):
+        """Stream a parsed batch to the output CSV and Parquet writers right away"""
+        if self.csv_writer:
+            self.csv_writer.write(parsed)
+        if self.parquet_writer:
+            try:
+                self.parquet_writer.write(parsed)
+            except Exception as e:
+                # The rows are stored; "cli.py parquet" can export them later
+                print(f"    Error writing Parquet partitions: {e}")
+    
+    def parse_row(self, row_data):
+        """Parse one table row with the default column layout into an insert tuple, or None.
+        
+        store_table uses the header-driven batch parser in table_parser instead.
+        """
+        try:
             # Need at least 23 columns (0-22 for the actual data)
             if len(row_data) < 23:
-                print(f"    Debug: Row has {len(row_data)} columns, expected at least 23")
-                return False
+                detail(f"    Debug: Row has {len(row_data)} columns, expected at least 23")
+                return None
             
             # Parse the measurement time
             measurement_time = pd.to_datetime(row_data[0])
@@ -752,110 +1289,140 @@ class TrafikverketScraper:
                 passenger_car_no_trailer_count, passenger_car_no_trailer_avg_speed
             )
             
-            return self.insert_row_to_database(insert_data)
+            return insert_data
         except Exception as e:
             print(f"    Error parsing row: {e}")
             import traceback
             traceback.print_exc()
+            return None
+    
+    def parse_and_insert_row(self, row_data):
+        """Parse row data and insert into database"""
+        if not self.db_connection or not self.db_cursor:
+            detail(f"    Debug: Database connection issue")
             return False
-            
+        
+        insert_data = self.parse_row(row_data)
+        if insert_data is None:
+            return False
+        return self.insert_row_to_database(insert_data)
     
-    def extract_table_data(self):
-        """Extract data from the generated table"""
-        print("Extracting table data...")
+    def configure_form_via_script(self, value):
+        """Set occasion, checkboxes and table format in one execute_script call.
+        
+        Returns the script's report, or None if the script could not run.
+        When the occasion dropdown posts back, waits for it and runs once more
+        on the re-rendered form.
+        """
         try:
-            # Wait for table to appear
-            WebDriverWait(self.driver, 5).until(
-                EC.presence_of_all_elements_located((By.TAG_NAME, "table"))
-            )
-            
-            # Find all tables
-            tables = self.driver.find_elements(By.TAG_NAME, "table")
-            print(f"Found {len(tables)} table(s)")
-            
-            for table_idx, table in enumerate(tables):
-                # Only process table 3 (index 2)
-                if table_idx != 2:
-                    print(f"Skipping table {table_idx + 1}...")
-                    continue
-                
-                print(f"Processing table {table_idx + 1}...")
-                
-                # Extract rows (skip headers)
-                rows = table.find_elements(By.XPATH, ".//tr")
-                print(f"  Found {len(rows)} rows")
-                
-                all_data = []
-                
-                for row_idx, row in enumerate(rows):
-                    cells = row.find_elements(By.XPATH, "./td")
-                    if cells:
-                        row_data = [cell.text.strip() for cell in cells]
-                        all_data.append(row_data)
-                
-                # Only create DataFrame if we have data rows
-                if all_data:
-                    # Check if row limit is set and if we would exceed it
-                    if rowCount > 0 and (self.total_rows_extracted + len(all_data)) > rowCount:
-                        # Trim data to not exceed row limit
-                        rows_to_take = rowCount - self.total_rows_extracted
-                        if rows_to_take > 0:
-                            all_data = all_data[:rows_to_take]
-                            print(f"  Row limit reached. Trimmed to {rows_to_take} rows")
-                        else:
-                            print(f"  Row limit already reached, skipping this table")
-                            continue
-                    
-                    self.total_rows_extracted += len(all_data)
-                    df = pd.DataFrame(all_data)
-                    self.data.append(df)
-                    print(f"  Extracted {len(all_data)} data rows from table {table_idx + 1}")
-                    print(f"  Total rows so far: {self.total_rows_extracted}")
-                    
-                    # Stop extraction if row limit reached
-                    if rowCount > 0 and self.total_rows_extracted >= rowCount:
-                        print(f"Row limit of {rowCount} reached. Stopping extraction.")
-                        return True
-            
-            return True
-        except TimeoutException:
-            print("Error: Table did not appear within timeout period")
+            with self.instrumentation.span('form_setup'):
+                report = self.driver.execute_script(CONFIGURE_FORM_SCRIPT, value)
+            if report and report.get('postback'):
+                self.wait_for_postback('select_occasion', report['select'])
+                report = self.driver.execute_script(CONFIGURE_FORM_SCRIPT, value)
+                report['occasion_changed'] = True
+            detail(f"  Form configured by script: occasion {'changed' if report['occasion_changed'] else 'unchanged'}, "
+                   f"{report['checkboxes_checked']}/{report['checkboxes_total']} checkbox(es) ticked, "
+                   f"table format {'set' if report['table_format_changed'] else 'found' if report['table_format_found'] else 'not found'}")
+            return report
+        except Exception as e:
+            print(f"  Warning: Form script failed ({e}), using per-element setup")
+            return None
+    
+    def process_occasion_browser(self, value, text):
+        """Drive the form for one occasion in the browser and store the popup's table"""
+        report = self.configure_form_via_script(value) if SCRIPT_FORM_SETUP else None
+        
+        # Per-element steps only for whatever the script could not handle
+        if not report or not report['occasion_selected']:
+            # Select the measurement occasion
+            try:
+                selected = self.retry_step('select_occasion', self.select_measurement_occasion, value)
+            except Exception as e:
+                print(f"  {e}")
+                selected = False
+            if not selected:
+                print(f"Skipping {text} - could not select")
+                return False
+        
+        if not report:
+            # Check all checkboxes
+            self.check_all_checkboxes()
+        
+        if not report or not report['table_format_found']:
+            # Select table format
+            self.select_table_format()
+        
+        # Click start button; this also extracts the popup into the database.
+        # Retried only while no popup opened at all
+        try:
+            started = self.retry_step('start', self.click_start_button)
+        except Exception as e:
+            print(f"  {e}")
+            started = False
+        if not started:
+            print(f"Skipping {text} - no result popup")
             return False
+        return True
+    
+    def start_hybrid_http(self, occasion_value):
+        """Hand the browser's session over to an HTTP client for the remaining occasions (hybrid engine)"""
+        if not self.popup_url:
+            print("  Hybrid: no popup URL captured yet, staying in the browser")
+            return
+        try:
+            self.http_client = TrafikverketHttpClient(self.url, session=self.http_session)
+            self.http_client.adopt_browser(self.driver, self.popup_url, occasion_value)
+            if self.http_client.result_url_param:
+                print(f"  Hybrid: fetching further occasions directly from the popup URL "
+                      f"(parameter '{self.http_client.result_url_param}')")
+            else:
+                print("  Hybrid: fetching further occasions by posting the form over HTTP")
         except Exception as e:
-            print(f"Error extracting table data: {e}")
+            print(f"  Hybrid: could not hand over to HTTP ({e}), staying in the browser")
+            self.http_client = None
+    
+    def open_http_form(self):
+        """Load the request form over HTTP (http engine); returns the occasions"""
+        self.http_client = TrafikverketHttpClient(self.url, session=self.http_session)
+        self.page_metadata = self.http_client.open()
+        if self.page_metadata:
+            detail(f"  Cached metadata: {self.page_metadata}")
+        
+        occasions = self.http_client.get_occasions()
+        print(f"Found {len(occasions)} measurement occasion(s):")
+        for value, text in occasions:
+            detail(f"  - {text}")
+        return occasions
+    
+    def fetch_http_table(self, value):
+        """Fetch one occasion's result page over HTTP, archive it and parse its data table"""
+        html = self.http_client.fetch_result(value)
+        self.archive_page(html, self.http_client.last_result_url)
+        return parse_table(html, 2)
+    
+    def process_occasion_http(self, value, text):
+        """Fetch one occasion's result table over HTTP and store it; returns success"""
+        try:
+            table = self.retry_step('fetch', self.fetch_http_table, value)
+            if table is None:
+                print(f"  Data table (table 3) not found in result for {text}")
+                return False
+            return self.store_table(table)
+        except Exception as e:
+            print(f"Error fetching {text} over HTTP: {e}")
             return False
     
     def load_translations(self):
         """Load translations from translation.txt file"""
-        translations = {}
-        translation_file = "translation.txt"
+        translation_file = translation_path()
         
         if not os.path.exists(translation_file):
             print(f"Warning: {translation_file} not found, skipping translations")
-            return translations
+            return {}
         
         try:
-            with open(translation_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Split by comma to get individual key=value pairs
-            pairs = content.split(',')
-            
-            for pair in pairs:
-                pair = pair.strip()
-                # Skip empty lines and comments
-                if not pair or pair.startswith('#'):
-                    continue
-                
-                # Split by = to separate key and value
-                if '=' in pair:
-                    parts = pair.split('=', 1)  # Use maxsplit=1 in case value contains =
-                    if len(parts) == 2:
-                        swedish = parts[0].strip()
-                        english = parts[1].strip()
-                        if swedish and english:  # Only add if both parts are non-empty
-                            translations[swedish] = english
-            
+            translations = load_translation_file(translation_file)
             print(f"Loaded {len(translations)} translation(s)")
             return translations
         except Exception as e:
@@ -867,175 +1434,232 @@ class TrafikverketScraper:
         if not translations:
             return df
         
-        # Normalize translation keys (remove extra whitespace, tabs, etc.)
-        normalized_translations = {}
-        for swedish, english in translations.items():
-            normalized_key = ' '.join(swedish.split())  # Normalize whitespace
-            normalized_translations[normalized_key] = english
-        
-        # Translate column headers
-        normalized_columns = {}
-        for col in df.columns:
-            normalized_col = ' '.join(str(col).split())
-            if normalized_col in normalized_translations:
-                normalized_columns[col] = normalized_translations[normalized_col]
-            else:
-                normalized_columns[col] = col
-        df.columns = [normalized_columns.get(col, col) for col in df.columns]
-        
-        # Sort translation keys by length (longest first) to avoid partial replacements
-        sorted_translations = sorted(normalized_translations.items(), key=lambda x: len(x[0]), reverse=True)
-        
-        # Translate cell values (all columns) - use substring matching
-        for col in df.columns:
-            if df[col].dtype == 'object':  # Only for string columns
-                def translate_value(x):
-                    if pd.isna(x):
-                        return x
-                    text = str(x)
-                    # Normalize whitespace in the text
-                    normalized_text = ' '.join(text.split())
-                    # Replace translation keys in order (longest first)
-                    for swedish, english in sorted_translations:
-                        if swedish in normalized_text:
-                            normalized_text = normalized_text.replace(swedish, english)
-                    return normalized_text
-                
-                df[col] = df[col].apply(translate_value)
-        
-        return df
+        # Compiled once per process into a single regex; each distinct cell
+        # value of a column is translated only once
+        return compile_translations(translations).apply(df)
     
-    def save_to_excel(self, filename=None):
-        """Save extracted data to CSV file (comma-separated values) for easier ETL processing"""
-        if not self.data:
-            print("No data to save")
-            return False
-        
+    def csv_output_path(self, filename=None):
+        """Path of the CSV output file inside OUTPUT_DIRECTORY"""
         if filename is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"trafikverket_data_{timestamp}.csv"
         else:
             # Replace .xlsx with .csv if needed
             filename = filename.replace('.xlsx', '.csv')
+        return os.path.join(OUTPUT_DIRECTORY, os.path.basename(filename))
+    
+    def open_csv_output(self, filename=None):
+        """Start streaming parsed tables to a CSV file (translations applied per batch)"""
+        self.csv_writer = StreamingCsvWriter(self.csv_output_path(filename), self.load_translations())
+        detail(f"Streaming rows to {self.csv_writer.path}")
+    
+    def save_to_excel(self, filename=None):
+        """Finish the streamed CSV file (comma-separated values) and move it into place atomically.
+        
+        `filename` (placed in OUTPUT_DIRECTORY, .xlsx becomes .csv) overrides
+        the path given to open_csv_output.
+        """
+        writer = self.csv_writer
+        self.csv_writer = None
+        if writer is None or not writer.rows:
+            print("No data to save")
+            if writer:
+                writer.abort()
+            return False
         
         try:
-            # Create output directory if it doesn't exist
-            if not os.path.exists(OUTPUT_DIRECTORY):
-                os.makedirs(OUTPUT_DIRECTORY)
-                print(f"Created output directory: {OUTPUT_DIRECTORY}")
-            
-            # Construct full filepath
-            filepath = os.path.join(OUTPUT_DIRECTORY, os.path.basename(filename))
-            
             # Extract punkt IDs first
             punkt_ids = self.extract_punkt_ids_from_url()
             print(f"Extracted punkt IDs from URL: {punkt_ids}")
             
-            # Get coordinates for all punkt IDs and try to fetch if missing
-            coordinates_data = {}
-            for punkt_id in punkt_ids:
-                lat, lon = self.get_coordinates(punkt_id)
-                if not lat or not lon:
-                    # Try to fetch from website
-                    lat, lon = self.fetch_coordinate_from_trafikverket(punkt_id)
-                    if lat and lon:
-                        self.coordinate_cache[punkt_id] = (lat, lon)
-                        print(f"  Found coordinates for {punkt_id}: {lat}, {lon}")
-                
-                coordinates_data[punkt_id] = (lat, lon)
-            
-            # Concatenate all dataframes into one
-            combined_df = pd.concat(self.data, ignore_index=True)
-            
-            # Remove numeric column names and convert to proper column headers
-            # If columns are integers (0, 1, 2, etc.), replace with generic Column_N
-            if all(isinstance(col, int) for col in combined_df.columns):
-                combined_df.columns = [f"Column_{i+1}" for i in range(len(combined_df.columns))]
-            
-            # Save the updated cache
-            self.save_coordinate_cache()
+            # Get coordinates for all punkt IDs in one lookup
+            self.resolve_coordinates(punkt_ids)
             
-            # Load and apply translations
-            translations = self.load_translations()
-            if translations:
-                print("Applying translations...")
-                combined_df = self.apply_translations(combined_df, translations)
+            if filename is not None:
+                writer.path = self.csv_output_path(filename)
+            writer.close()
             
-            # Save to CSV file with comma separator and no header
-            combined_df.to_csv(filepath, sep=',', index=False, header=False, encoding='utf-8')
-            
-            full_filepath = os.path.abspath(filepath)
+            full_filepath = os.path.abspath(writer.path)
             print(f"Data successfully saved to: {full_filepath}")
-            print(f"  Total rows: {len(combined_df)}")
+            print(f"  Total rows: {writer.rows}")
             print(f"  Format: CSV (comma-separated values)")
             return True
         except Exception as e:
             print(f"Error saving to CSV: {e}")
+            writer.abort()
             import traceback
             traceback.print_exc()
             return False
     
+    def open_parquet_output(self):
+        """Collect parsed tables for the Parquet partitions (needs pyarrow)"""
+        try:
+            self.parquet_writer = ParquetPartitionWriter(self.parquet_directory)
+        except ImportError as e:
+            print(f"Warning: {e}")
+            self.parquet_directory = None
+    
+    def save_to_parquet(self):
+        """Merge the collected rows into their county/road/month Parquet partitions"""
+        writer = self.parquet_writer
+        self.parquet_writer = None
+        if writer is None or not writer.rows:
+            return False
+        try:
+            with self.instrumentation.span('parquet', rows=writer.rows):
+                partitions = writer.close()
+            print(f"Updated {partitions} Parquet partition(s) in {os.path.abspath(writer.directory)} "
+                  f"({writer.rows} rows)")
+            return True
+        except Exception as e:
+            print(f"Error saving to Parquet: {e}")
+            return False
+    
+    def process_occasion(self, value, text):
+        """Scrape one measurement occasion with the configured engine"""
+        self.last_table_result = None
+        self.current_occasion = (value, text)
+        self.instrumentation.count('occasions')
+        with self.instrumentation.span('occasion', occasion=value, text=text):
+            if self.engine == 'http':
+                self.process_occasion_http(value, text)
+            elif self.engine == 'hybrid' and self.http_client:
+                # Fall back to the browser if the direct fetch fails
+                if not self.process_occasion_http(value, text):
+                    self.process_occasion_browser(value, text)
+            else:
+                self.process_occasion_browser(value, text)
+                if self.engine == 'hybrid':
+                    self.start_hybrid_http(value)
+    
     def run(self, output_file=None):
-        """Run the complete scraping workflow"""
+        """Run the complete scraping workflow and return a summary dict"""
+        started = time.time()
+        summary = {
+            'url': self.url,
+            'status': 'ok',
+            'occasions': 0,
+            'rows_inserted': 0,
+            'error': None,
+            'elapsed': 0.0,
+            'occasions_skipped': 0,
+            'occasions_resumed': 0,
+            'wait_times': self.wait_times,
+            'retry_counts': self.retry_counts,
+        }
         try:
-            self.setup_driver()
-            self.navigate_to_page()
-            
-            # Get all measurement occasions
-            occasions = self.get_measurement_occasions()
-            
-            if not occasions:
-                print("No measurement occasions found")
-                return
-            
-            # Iterate through each measurement occasion
-            for idx, (value, text) in enumerate(occasions):
-                # Check if row limit has been reached
-                if rowCount > 0 and self.total_rows_extracted >= rowCount:
-                    print(f"\nRow limit of {rowCount} reached. Stopping processing of measurement occasions.")
-                    break
+            if output_file and CSV_EXPORT:
+                self.open_csv_output(output_file)
+            if self.parquet_directory:
+                self.open_parquet_output()
+            
+            with self.instrumentation.span('url', url=self.url, engine=self.engine):
+                if self.engine == 'http':
+                    occasions = self.retry_step('navigate', self.open_http_form)
+                else:
+                    self.setup_driver()
+                    try:
+                        self.retry_step('navigate', self.navigate_to_page)
+                    except TimeoutException:
+                        print("Warning: Page did not finish loading, continuing anyway...")
+                    
+                    # Get all measurement occasions
+                    occasions = self.get_measurement_occasions()
                 
-                print(f"\n{'='*60}")
-                print(f"Processing {idx + 1}/{len(occasions)}: {text}")
-                print(f"{'='*60}")
+                summary['occasions'] = len(occasions)
+                if not occasions:
+                    print("No measurement occasions found")
+                    summary['status'] = 'no_occasions'
+                    return summary
                 
-                # Select the measurement occasion
-                if not self.select_measurement_occasion(value):
-                    print(f"Skipping {text} - could not select")
-                    continue
+                if self.incremental:
+                    occasions = self.filter_new_occasions(occasions)
+                    summary['occasions_skipped'] = summary['occasions'] - len(occasions)
                 
-                # Check all checkboxes
-                self.check_all_checkboxes()
+                # Occasions of this run whose table did not reach the database
+                unfinished = 0
                 
-                # Select table format
-                self.select_table_format()
+                # Iterate through each measurement occasion
+                for idx, (value, text) in enumerate(occasions):
+                    # Check if row limit has been reached
+                    if rowCount > 0 and self.total_rows_extracted >= rowCount:
+                        print(f"\nRow limit of {rowCount} reached. Stopping processing of measurement occasions.")
+                        break
+                    
+                    print(f"\n{'='*60}")
+                    print(f"Processing {idx + 1}/{len(occasions)}: {text}")
+                    print(f"{'='*60}")
+                    
+                    if self.journal and self.journal.is_occasion_done(self.url, value):
+                        print("Already completed in journal, skipping")
+                        summary['occasions_resumed'] += 1
+                        continue
+                    
+                    self.process_occasion(value, text)
+                    
+                    # Only occasions whose table reached the database count as done
+                    if self.last_table_result is None:
+                        unfinished += 1
+                    elif self.journal:
+                        self.journal.record_occasion(self.url, value, text, *self.last_table_result)
                 
-                # Click start button
-                self.click_start_button()
+                if self.journal and not (rowCount > 0 and self.total_rows_extracted >= rowCount):
+                    if unfinished:
+                        print(f"\n{unfinished} occasion(s) not stored; the URL stays open in the journal for --resume")
+                    else:
+                        self.journal.record_url(self.url, self.total_rows_extracted)
                 
-                # Extract data from popup and insert into database
-                self.handle_popup_window()
-            
-            # Print summary
-            print(f"\n{'='*60}")
-            print(f"Scraping completed successfully!")
-            print(f"Total rows inserted into database: {self.total_rows_extracted}")
-            print(f"{'='*60}")
+                # Print summary
+                print(f"\n{'='*60}")
+                print(f"Scraping completed successfully!")
+                print(f"Total rows inserted into database: {self.total_rows_extracted}")
+                counters = self.instrumentation.counters
+                print(f"Rows parsed: {counters.get('rows_parsed', 0)}, inserted: {counters.get('rows_inserted', 0)}, "
+                      f"already stored: {counters.get('rows_skipped', 0)}, dropped: {counters.get('rows_dropped', 0)}, "
+                      f"failed to store: {counters.get('rows_failed', 0)}")
+                if self.wait_times:
+                    print("Time spent waiting per step:")
+                    for step, seconds in sorted(self.wait_times.items(), key=lambda item: -item[1]):
+                        print(f"  {step}: {seconds:.2f}s")
+                if self.retry_counts:
+                    print(f"Retries: {sum(self.retry_counts.values())} "
+                          f"({', '.join(f'{step}: {count}' for step, count in sorted(self.retry_counts.items()))})")
+                print(f"{'='*60}")
                 
+                # Publish the streamed CSV (coordinates still need the open page)
+                if self.csv_writer:
+                    self.save_to_excel()
+                    
         except Exception as e:
             print(f"Fatal error during scraping: {e}")
+            summary['status'] = 'failed'
+            summary['error'] = str(e)
         finally:
-            # Close database connection
-            if self.db_cursor:
-                self.db_cursor.close()
-            if self.db_connection:
-                self.db_connection.close()
+            # Parsed rows are valid even if the run failed later on
+            self.save_to_parquet()
+            
+            summary['rows_inserted'] = self.total_rows_extracted
+            summary['elapsed'] = time.time() - started
+            summary['counters'] = self.instrumentation.counters
+            self.instrumentation.close(url=self.url, status=summary['status'], elapsed=round(summary['elapsed'], 3))
+            
+            self.close_database()
             
-            # Close browser
-            if self.driver:
-                print("Closing browser...")
-                time.sleep(2)
-                self.driver.quit()
+            # A failed run leaves its partial CSV behind as <file>.part
+            if self.csv_writer:
+                self.csv_writer.abort()
+                self.csv_writer = None
+            
+            if self.http_client and self.http_session is None:
+                self.http_client.close()
+            
+            # Close our own browser; a shared session is only cleaned for the next URL
+            if self.browser and self.owns_browser:
+                self.browser.quit()
+            elif self.browser:
+                self.browser.reset()
+        
+        return summary
 
 
 
@@ -1079,7 +1703,75 @@ def main():
         help='Run browser in headless mode (faster, no UI)'
     )
     
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=1,
+        help='Number of URLs to scrape in parallel, one headless browser per worker (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--engine',
+        choices=ENGINES,
+        default=SCRAPER_ENGINE,
+        help=f"Scraping engine: 'selenium' drives Chrome, 'http' posts the form directly without a browser, "
+             f"'hybrid' runs the first occasion in Chrome and fetches the rest over HTTP (default: {SCRAPER_ENGINE})"
+    )
+    
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='Re-scrape every measurement occasion, including those already stored'
+    )
+    
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Skip URLs and measurement occasions completed by a previous, interrupted run'
+    )
+    
+    parser.add_argument(
+        '--journal',
+        default=JOURNAL_FILE,
+        help=f'Checkpoint journal file used by --resume (default: {JOURNAL_FILE})'
+    )
+    
+    parser.add_argument(
+        '--archive',
+        nargs='?',
+        const=ARCHIVE_DIRECTORY,
+        default=None,
+        help=f'Keep every result page in a compressed raw HTML archive (default directory: {ARCHIVE_DIRECTORY})'
+    )
+    
+    parser.add_argument(
+        '--parquet',
+        nargs='?',
+        const=PARQUET_DIRECTORY,
+        default=None,
+        help=f'Also write stored rows to Parquet partitions by county/road/month (default directory: {PARQUET_DIRECTORY})'
+    )
+    
+    parser.add_argument(
+        '-v', '--verbose',
+        action='store_true',
+        help='Print every scraping step and row (default: progress and summaries only)'
+    )
+    
+    parser.add_argument(
+        '--metrics',
+        default=METRICS_FILE,
+        help=f'JSON-lines file for timing spans and row counters, "" to disable (default: {METRICS_FILE})'
+    )
+    
+    parser.add_argument(
+        '--trace-memory',
+        action='store_true',
+        help='Record tracemalloc peaks per span in the metrics file (slower)'
+    )
+    
     args = parser.parse_args()
+    set_verbose(args.verbose or is_verbose())
     
     urls_to_process = []
     
@@ -1115,33 +1807,275 @@ def main():
     print(f"Processing {len(urls_to_process)} URL(s)")
     print(f"{'='*70}\n")
     
-    # Process each URL
-    for url_idx, url in enumerate(urls_to_process, 1):
-        print(f"\n{'='*70}")
-        print(f"URL {url_idx}/{len(urls_to_process)}")
-        print(f"{'='*70}")
-        print(f"URL: {url}")
-        
-        # Generate output filename based on URL hash if not specified
-        if args.output:
-            output_file = args.output if len(urls_to_process) == 1 else f"{args.output.replace('.csv', '')}_{url_idx}.csv"
-        else:
-            # Create a hash-based filename for each URL
-            import hashlib
-            url_hash = hashlib.md5(url.encode()).hexdigest()[:8]
-            output_file = f"trafikverket_data_{url_hash}.csv"
-        
-        print(f"Output file: {output_file}\n")
-        
+    tasks = [
+        {
+            'url_idx': url_idx,
+            'url': url,
+            'output_file': output_file_for_url(args.output, url_idx, url, len(urls_to_process)),
+            'headless': args.headless,
+            'engine': args.engine,
+            'incremental': not args.full,
+            'journal': args.journal,
+            'archive': args.archive,
+            'parquet': args.parquet,
+            'verbose': is_verbose(),
+            'metrics': args.metrics,
+            'trace_memory': args.trace_memory,
+        }
+        for url_idx, url in enumerate(urls_to_process, 1)
+    ]
+    
+    journal = ScrapeJournal(args.journal)
+    if args.resume:
+        journal.load()
+        tasks = [task for task in tasks if not journal.is_url_done(task['url'])]
+        print(f"Resuming from {journal.path}: {len(urls_to_process) - len(tasks)} URL(s) already completed, "
+              f"{len(journal.completed_occasions)} occasion(s) done\n")
+        if not tasks:
+            print("Nothing left to do")
+            return
+    else:
+        rotated = journal.reset()
+        if rotated:
+            print(f"Previous journal kept as {rotated} (rename it back and use --resume to continue it)\n")
+    
+    if args.workers > 1:
+        results = run_parallel(tasks, args.workers)
+    else:
+        # Process each URL with one warm browser (or one pooled HTTP session)
+        results = []
+        browser = BrowserSession(headless=args.headless)
+        http_session = create_session() if args.engine in ('http', 'hybrid') else None
         try:
-            scraper = TrafikverketScraper(url, headless=args.headless)
-            scraper.run(output_file=output_file)
-        except Exception as e:
-            print(f"Error processing URL {url_idx}: {e}")
-            continue
+            for task in tasks:
+                print(f"\n{'='*70}")
+                print(f"URL {task['url_idx']}/{len(urls_to_process)}")
+                print(f"{'='*70}")
+                print(f"URL: {task['url']}")
+                print(f"Output file: {task['output_file']}\n")
+                results.append(scrape_url(task, browser, http_session))
+        finally:
+            browser.quit()
+            if http_session:
+                http_session.close()
+    
+    print_run_summary(results)
+
+
+def output_file_for_url(output, url_idx, url, url_count):
+    """Build the output filename for one URL of a multi-URL run"""
+    if output:
+        return output if url_count == 1 else f"{output.replace('.csv', '')}_{url_idx}.csv"
+    # Create a hash-based filename for each URL
+    url_hash = hashlib.md5(url.encode()).hexdigest()[:8]
+    return f"trafikverket_data_{url_hash}.csv"
+
+
+def scrape_url(task, browser=None, http_session=None):
+    """Scrape one URL and return its summary; never raises (used by worker processes)"""
+    if browser is None:
+        browser = _worker_browser
+    if http_session is None:
+        http_session = _worker_http_session
+    try:
+        set_verbose(task['verbose'])
+        journal = ScrapeJournal(task['journal']).load()
+        archive = RawHtmlArchive(task['archive']) if task.get('archive') else None
+        instrumentation = Instrumentation(task['metrics'], task['trace_memory'])
+        scraper = TrafikverketScraper(task['url'], headless=task['headless'], browser=browser,
+                                      engine=task['engine'], http_session=http_session,
+                                      incremental=task['incremental'], journal=journal, archive=archive,
+                                      instrumentation=instrumentation, parquet=task.get('parquet'))
+        summary = scraper.run(output_file=task['output_file'])
+    except Exception as e:
+        print(f"Error processing URL {task['url_idx']}: {e}")
+        summary = {'url': task['url'], 'status': 'failed', 'occasions': 0, 'rows_inserted': 0,
+                   'occasions_skipped': 0, 'occasions_resumed': 0, 'error': str(e), 'elapsed': 0.0,
+                   'wait_times': {}, 'retry_counts': {}, 'counters': {}}
+    summary['url_idx'] = task['url_idx']
+    return summary
+
+
+# Browser and HTTP session kept warm for all URLs handled by one worker process
+_worker_browser = None
+_worker_http_session = None
+
+
+def _init_worker(headless, engine):
+    """Pool initializer: give this worker process its own browser or HTTP session"""
+    global _worker_browser, _worker_http_session
+    # The browser only starts if the selenium engine actually uses it
+    _worker_browser = BrowserSession(headless=headless)
+    # Finalizers run when the worker exits after pool.close()/join()
+    multiprocessing.util.Finalize(None, _worker_browser.quit, exitpriority=10)
+    if engine in ('http', 'hybrid'):
+        _worker_http_session = create_session()
+        multiprocessing.util.Finalize(None, _worker_http_session.close, exitpriority=10)
+
+
+def run_parallel(tasks, workers):
+    """Fan URLs out to a pool of worker processes, each with its own headless browser"""
+    workers = min(workers, len(tasks))
+    engine = tasks[0]['engine']
+    if engine == 'http':
+        print(f"Starting {workers} worker process(es), one HTTP session each\n")
+    else:
+        print(f"Starting {workers} worker process(es), one headless browser each\n")
+    
+    # Every worker drives its own Chrome; visible windows would just get in the way
+    tasks = [dict(task, headless=True) for task in tasks]
+    
+    results = []
+    # Each worker keeps one browser for all of its URLs; the session is reset
+    # (or restarted if it crashed) between URLs
+    pool = multiprocessing.Pool(processes=workers, initializer=_init_worker, initargs=(True, engine))
+    try:
+        for summary in pool.imap_unordered(scrape_url, tasks):
+            results.append(summary)
+            status = summary['status'] if not summary['error'] else f"{summary['status']} ({summary['error']})"
+            print(f"[{len(results)}/{len(tasks)}] URL {summary['url_idx']}: "
+                  f"{summary['rows_inserted']} rows in {summary['elapsed']:.1f}s - {status}")
+        # close/join (not terminate) lets workers run their finalizers and quit Chrome
+        pool.close()
+        pool.join()
+    except BaseException:
+        pool.terminate()
+        raise
+    
+    return sorted(results, key=lambda r: r['url_idx'])
+
+
+# Scraper (with its database connection) reused by one re-ingest worker process
+_reingest_connection = None
+_reingest_features = None
+_reingest_archive = None
+
+
+def _close_reingest_connection():
+    if _reingest_connection is not None:
+        _reingest_connection.close()
+
+
+def _init_reingest_worker(directory):
+    """Pool initializer: one database connection per re-ingest worker"""
+    global _reingest_connection, _reingest_features, _reingest_archive
+    _reingest_archive = RawHtmlArchive(directory)
+    _reingest_connection = connect_database()
+    _reingest_features = table_features(_reingest_connection)
+    multiprocessing.util.Finalize(None, _close_reingest_connection, exitpriority=10)
+
+
+def reingest_entry(entry):
+    """Parse one archived page and store its table; returns (sha256, inserted, skipped, error)"""
+    try:
+        table = parse_table(_reingest_archive.read(entry), 2)
+        if table is None:
+            return entry['sha256'], 0, 0, 'data table (table 3) not found'
+        parsed, _ = parse_table_batch(table, entry.get('metadata') or {})
+        rows = batch_to_rows(parsed)
+        if not rows:
+            return entry['sha256'], 0, 0, None
+        cursor = _reingest_connection.cursor()
+        try:
+            result = insert_traffic_rows(_reingest_connection, cursor, rows, _reingest_features)
+        finally:
+            cursor.close()
+        if result is None:
+            return entry['sha256'], 0, 0, 'table could not be stored'
+        return (entry['sha256'],) + result + (None,)
+    except Exception as e:
+        return entry['sha256'], 0, 0, str(e)
+
+
+def reingest_archive(directory=None, workers=None):
+    """Re-parse every archived result page into the database, one process per core"""
+    archive = RawHtmlArchive(directory)
+    entries = archive.latest_entries()
+    if not entries:
+        print(f"No archived pages in {archive.directory}")
+        return {'pages': 0, 'rows_inserted': 0, 'rows_skipped': 0, 'failed': 0}
+    
+    # Tables are created once here, not concurrently by every worker
+    connection = connect_database()
+    try:
+        ensure_tables(connection)
+    finally:
+        connection.close()
+    
+    workers = min(workers or os.cpu_count() or 1, len(entries))
+    print(f"Re-ingesting {len(entries)} archived page(s) from {archive.directory} with {workers} worker(s)\n")
+    
+    started = time.time()
+    totals = {'pages': len(entries), 'rows_inserted': 0, 'rows_skipped': 0, 'failed': 0}
+    pool = multiprocessing.Pool(processes=workers, initializer=_init_reingest_worker,
+                                initargs=(archive.directory,))
+    try:
+        for done, (digest, inserted, skipped, error) in enumerate(
+                pool.imap_unordered(reingest_entry, entries, chunksize=4), 1):
+            totals['rows_inserted'] += inserted
+            totals['rows_skipped'] += skipped
+            if error:
+                totals['failed'] += 1
+                print(f"[{done}/{len(entries)}] {digest[:12]}: {error}")
+            else:
+                print(f"[{done}/{len(entries)}] {digest[:12]}: {inserted} rows inserted, {skipped} already stored")
+        pool.close()
+        pool.join()
+    except BaseException:
+        pool.terminate()
+        raise
+    
+    print(f"\n{'='*70}")
+    print(f"Re-ingested {totals['pages']} page(s) in {time.time() - started:.1f}s: "
+          f"{totals['rows_inserted']} rows inserted, {totals['rows_skipped']} already stored, "
+          f"{totals['failed']} page(s) failed")
+    print(f"{'='*70}")
+    return totals
+
+
+def print_run_summary(results):
+    """Print the merged summary of a multi-URL run"""
+    failed = [r for r in results if r['status'] == 'failed']
+    total_rows = sum(r['rows_inserted'] for r in results)
+    total_occasions = sum(r['occasions'] for r in results)
+    skipped_occasions = sum(r.get('occasions_skipped', 0) for r in results)
+    resumed_occasions = sum(r.get('occasions_resumed', 0) for r in results)
     
     print(f"\n{'='*70}")
-    print("All URLs processed successfully!")
+    if failed:
+        print(f"Processed {len(results)} URL(s), {len(failed)} failed")
+    else:
+        print("All URLs processed successfully!")
+    print(f"  Measurement occasions: {total_occasions} ({skipped_occasions} already stored, "
+          f"{resumed_occasions} completed in an earlier run)")
+    print(f"  Rows inserted: {total_rows}")
+    counters = {}
+    for r in results:
+        for name, value in r.get('counters', {}).items():
+            counters[name] = counters.get(name, 0) + value
+    if counters:
+        print(f"  Rows parsed: {counters.get('rows_parsed', 0)}, already stored: {counters.get('rows_skipped', 0)}, "
+              f"dropped: {counters.get('rows_dropped', 0)}, failed to store: {counters.get('rows_failed', 0)}")
+    
+    wait_times = {}
+    for r in results:
+        for step, seconds in r.get('wait_times', {}).items():
+            wait_times[step] = wait_times.get(step, 0.0) + seconds
+    if wait_times:
+        print("  Time spent waiting per step:")
+        for step, seconds in sorted(wait_times.items(), key=lambda item: -item[1]):
+            print(f"    {step}: {seconds:.2f}s")
+    
+    retry_counts = {}
+    for r in results:
+        for step, count in r.get('retry_counts', {}).items():
+            retry_counts[step] = retry_counts.get(step, 0) + count
+    if retry_counts:
+        print(f"  Retries: {sum(retry_counts.values())} "
+              f"({', '.join(f'{step}: {count}' for step, count in sorted(retry_counts.items()))})")
+    for r in failed:
+        print(f"  ✗ URL {r['url_idx']}: {r['url']}")
+        print(f"      {r['error']}")
     print(f"{'='*70}")
 
 
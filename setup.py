@@ -16,7 +16,11 @@ setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/yourusername/trafikverket-scraper",
-    py_modules=["scraper", "cli", "config"],
+    py_modules=[
+        "scraper", "cli", "config", "browser", "html_tables", "http_engine", "journal",
+        "table_parser", "translations", "archive", "instrumentation", "coordinates", "exporters",
+        "partitions", "long_format", "rollups", "traffic_metrics",
+    ],
     classifiers=[
         "Programming Language :: Python :: 3",
         "Programming Language :: Python :: 3.9",
@@ -33,7 +37,14 @@ setup(
         "pandas>=1.3.0,<2.0.0",
         "openpyxl>=3.0.0,<3.1.0",
         "webdriver-manager>=3.8.0,<4.0.0",
+        "requests>=2.28.0",
     ],
+    extras_require={
+        # zstd compression for the raw HTML archive (gzip otherwise)
+        "archive": ["zstandard>=0.18.0"],
+        # Partitioned Parquet export
+        "parquet": ["pyarrow>=8.0.0"],
+    },
     entry_points={
         "console_scripts": [
             "trafikverket-scraper=cli:main",
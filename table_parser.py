@@ -0,0 +1,205 @@
+"""
+Batch parser for Trafikverket result tables
+Maps data columns from the table's <th> headers (via the names in
+translation.txt) and converts a whole table at once with vectorized pandas
+operations into a typed batch in public.traffic_data column order
+"""
+
+import functools
+
+import pandas as pd
+
+from translations import normalize_text, read_translation_file, translation_path
+
+try:
+    from config import MEASUREMENT_TIME_FORMAT
+except ImportError:
+    MEASUREMENT_TIME_FORMAT = '%Y-%m-%d %H:%M'
+
+
+class HeaderMappingError(ValueError):
+    """The table headers do not name every vehicle type; retrying will not help"""
+
+
+# Insert column order of public.traffic_data
+TRAFFIC_DATA_COLUMNS = [
+    'measurement_time', 'county', 'road_number', 'punkt_nummer',
+    'all_vehicles_count', 'all_vehicles_avg_speed',
+    'passenger_car_count', 'passenger_car_avg_speed',
+    'heavy_vehicles_count', 'heavy_vehicles_avg_speed',
+    'heavy_vehicles_trailer_count', 'heavy_vehicles_trailer_avg_speed',
+    'heavy_vehicles_no_trailer_count', 'heavy_vehicles_no_trailer_avg_speed',
+    'three_axle_tractor_trailer_count', 'three_axle_tractor_trailer_avg_speed',
+    'two_axle_tractor_trailer_count', 'two_axle_tractor_trailer_avg_speed',
+    'three_axle_tractor_no_trailer_count', 'three_axle_tractor_no_trailer_avg_speed',
+    'two_axle_tractor_no_trailer_count', 'two_axle_tractor_no_trailer_avg_speed',
+    'passenger_car_trailer_count', 'passenger_car_trailer_avg_speed',
+    'passenger_car_no_trailer_count', 'passenger_car_no_trailer_avg_speed',
+]
+
+# Vehicle type header (English name from translation.txt) -> column prefix,
+# in the order Trafikverket currently renders them
+VEHICLE_TYPE_COLUMNS = {
+    'All vehicles': 'all_vehicles',
+    'Heavy vehicles': 'heavy_vehicles',
+    'Passenger car': 'passenger_car',
+    'Heavy vehicles with trailer': 'heavy_vehicles_trailer',
+    'Heavy vehicles without trailer': 'heavy_vehicles_no_trailer',
+    'Three-axle tractor with trailer': 'three_axle_tractor_trailer',
+    'Two-axle tractor with trailer': 'two_axle_tractor_trailer',
+    'Three-axle tractor without trailer': 'three_axle_tractor_no_trailer',
+    'Two-axle tractor without trailer': 'two_axle_tractor_no_trailer',
+    'Passenger car with trailer': 'passenger_car_trailer',
+    'Passenger car without trailer': 'passenger_car_no_trailer',
+}
+
+TIME_HEADER = 'time'
+SPEED_HEADER = 'average speed'
+HEADER_ROW_LABELS = ('tidpunkt', 'time', 'tid')
+
+
+def default_column_mapping():
+    """Fixed layout used before header mapping: time, then count/speed pairs"""
+    mapping = {'measurement_time': 0}
+    for position, prefix in enumerate(VEHICLE_TYPE_COLUMNS.values()):
+        mapping[f'{prefix}_count'] = 1 + 2 * position
+        mapping[f'{prefix}_avg_speed'] = 2 + 2 * position
+    return mapping
+
+
+@functools.lru_cache(maxsize=None)
+def _header_lookup():
+    """normalized lower-case header -> canonical English name"""
+    lookup = {}
+    for swedish, english in read_translation_file().items():
+        lookup[normalize_text(swedish).lower()] = english.lower()
+    for english in list(VEHICLE_TYPE_COLUMNS) + ['Time', 'Average speed']:
+        lookup.setdefault(english.lower(), english.lower())
+    return lookup
+
+
+def canonical_header(text):
+    """English lower-case name of a header cell (unchanged if unknown)"""
+    key = normalize_text(text).lower()
+    return _header_lookup().get(key, key)
+
+
+def build_column_mapping(table):
+    """Map traffic_data column names to data-cell indexes from the table headers.
+
+    Returns (mapping, source) where source is 'headers', or 'default' for a
+    table without header rows. Raises HeaderMappingError when the headers do not
+    name every vehicle type, rather than guessing the layout.
+    """
+    prefixes = {english.lower(): prefix for english, prefix in VEHICLE_TYPE_COLUMNS.items()}
+    header_rows = table.get('header_rows') or ([[(text, 1) for text in table['headers']]]
+                                               if table.get('headers') else [])
+
+    for row_number, header_row in enumerate(header_rows):
+        time_index = None
+        found = []  # (prefix, first cell index, colspan)
+        cursor = 0
+        for text, colspan in header_row:
+            name = canonical_header(text)
+            if name == TIME_HEADER:
+                time_index = cursor
+            elif name in prefixes:
+                found.append((prefixes[name], cursor, colspan))
+            cursor += colspan
+        if not found:
+            continue
+
+        if len(found) != len(VEHICLE_TYPE_COLUMNS) or len({prefix for prefix, _, _ in found}) != len(found):
+            missing = set(VEHICLE_TYPE_COLUMNS.values()) - {prefix for prefix, _, _ in found}
+            raise HeaderMappingError(f"Unrecognised table headers (missing: {sorted(missing)}); "
+                             f"check the header names in {translation_path()}")
+
+        # Is the speed listed before the count within each vehicle type?
+        speed_first = False
+        if row_number + 1 < len(header_rows):
+            sub_headers = [canonical_header(text) for text, _ in header_rows[row_number + 1]]
+            sub_headers = [name for name in sub_headers if name != TIME_HEADER]
+            speed_first = bool(sub_headers) and sub_headers[0] == SPEED_HEADER
+
+        mapping = {'measurement_time': time_index if time_index is not None else 0}
+        paired = all(colspan == 2 for _, _, colspan in found)
+        first_data = mapping['measurement_time'] + 1
+        for position, (prefix, start, _) in enumerate(found):
+            # Grouped headers span their two cells; flat headers list one name per pair
+            if not paired:
+                start = first_data + 2 * position
+            count_index, speed_index = (start + 1, start) if speed_first else (start, start + 1)
+            mapping[f'{prefix}_count'] = count_index
+            mapping[f'{prefix}_avg_speed'] = speed_index
+        return mapping, 'headers'
+
+    if header_rows:
+        raise HeaderMappingError(f"No vehicle type found in table headers; check the header names in {translation_path()}")
+    return default_column_mapping(), 'default'
+
+
+def parse_measurement_times(values):
+    """Vectorized timestamp parsing with an explicit format, inferring only leftovers"""
+    times = pd.to_datetime(values, format=MEASUREMENT_TIME_FORMAT, errors='coerce')
+    leftovers = times.isna() & values.notna() & (values != '')
+    if leftovers.any():
+        times[leftovers] = pd.to_datetime(values[leftovers], errors='coerce')
+    return times
+
+
+def parse_counts(values):
+    """Vectorized parse_count_value: whole numbers, 0 for blank or invalid"""
+    cleaned = values.str.replace(r'\s+', '', regex=True)
+    return pd.to_numeric(cleaned, errors='coerce').fillna(0).astype('int64')
+
+
+def parse_speeds(values):
+    """Vectorized parse_speed_value: Swedish decimal comma, NaN for blank or invalid"""
+    cleaned = values.str.strip().str.replace(',', '.', regex=False)
+    return pd.to_numeric(cleaned, errors='coerce').astype('float64')
+
+
+def parse_table_batch(table, metadata):
+    """Convert an extracted table into a typed DataFrame in TRAFFIC_DATA_COLUMNS order.
+
+    `metadata` supplies county, road number and punkt nummer (page metadata).
+    Returns (batch, stats) with stats counting parsed and dropped rows and the
+    source of the column mapping.
+    """
+    mapping, source = build_column_mapping(table)
+    width = max(mapping.values()) + 1
+
+    rows = [row for row in table['rows'] if len(row) >= width]
+    stats = {'rows': 0, 'dropped': len(table['rows']) - len(rows), 'mapping': source}
+    if not rows:
+        return pd.DataFrame(columns=TRAFFIC_DATA_COLUMNS), stats
+
+    cells = pd.DataFrame([row[:width] for row in rows], dtype=object).astype(str)
+    time_values = cells[mapping['measurement_time']].str.strip()
+
+    # Repeated header rows inside the body
+    body = ~time_values.str.lower().isin(HEADER_ROW_LABELS)
+    cells, time_values = cells[body], time_values[body]
+
+    batch = pd.DataFrame(index=cells.index)
+    batch['measurement_time'] = parse_measurement_times(time_values)
+    batch['county'] = metadata.get('county')
+    batch['road_number'] = metadata.get('road number')
+    batch['punkt_nummer'] = metadata.get('punkt nummer')
+    for column in TRAFFIC_DATA_COLUMNS[4:]:
+        if column.endswith('_count'):
+            batch[column] = parse_counts(cells[mapping[column]])
+        else:
+            batch[column] = parse_speeds(cells[mapping[column]])
+
+    parsed = batch['measurement_time'].notna()
+    stats['dropped'] += int((~parsed).sum())
+    batch = batch[parsed].reset_index(drop=True)
+    stats['rows'] = len(batch)
+    return batch[TRAFFIC_DATA_COLUMNS], stats
+
+
+def batch_to_rows(batch):
+    """Plain Python tuples (None for missing values) for DB-API bulk inserts"""
+    values = batch.astype(object).where(batch.notna(), None)
+    return list(values.itertuples(index=False, name=None))
@@ -0,0 +1,206 @@
+"""
+Traffic metrics for Trafikverket data
+Capacity (max flow), free-flow speed (max speed), V/C ratio, delay index and
+CO2 emissions per vehicle type, grouped per measurement point, road, county
+or for all data, optionally by hour of day. These are the notebook's
+definitions:
+
+    VC_Ratio    = Flow / Capacity            Capacity       = max Flow
+    Delay_Index = 1 - Speed / FreeFlow_Speed FreeFlow_Speed = max Speed
+    Emissions   = Flow * emission factor (g CO2 per km) * distance
+
+Capacity and free-flow speed are constant per group and vehicle type, so the
+means of the per-row ratios follow from running sums and maxima. traffic_data
+is therefore read once, in columnar NumPy batches from a server-side cursor,
+and memory only grows with the number of groups, not with the rows.
+"""
+
+import numpy as np
+import pandas as pd
+from psycopg2 import sql
+
+from long_format import VEHICLE_TYPES
+
+try:
+    from config import EMISSION_FACTORS, EMISSION_DISTANCE_KM
+except ImportError:
+    # g CO2 per vehicle km
+    EMISSION_FACTORS = {
+        'all_vehicles': 120, 'passenger_car': 120, 'passenger_car_no_trailer': 120,
+        'passenger_car_trailer': 200, 'heavy_vehicles': 600, 'heavy_vehicles_trailer': 1200,
+        'heavy_vehicles_no_trailer': 800, 'three_axle_tractor_trailer': 1500,
+        'three_axle_tractor_no_trailer': 1000, 'two_axle_tractor_trailer': 1200,
+        'two_axle_tractor_no_trailer': 800,
+    }
+    EMISSION_DISTANCE_KM = 1.0
+
+try:
+    from config import METRICS_BATCH_SIZE
+except ImportError:
+    METRICS_BATCH_SIZE = 50000
+
+# grouping -> traffic_data column (None: everything in one group)
+GROUPINGS = {'point': 'punkt_nummer', 'road': 'road_number', 'county': 'county', 'all': None}
+
+# Per-slot sums and maxima (slot = group x vehicle type x hour)
+_SUMS = ['flow_n', 'flow_sum', 'speed_n', 'speed_sum', 'flow_speed_sum', 'flow_speed_weight']
+_MAXIMA = ['flow_max', 'speed_max']
+
+
+class TrafficMetrics:
+    """Accumulates flow/speed statistics batch by batch; result() derives the metrics.
+
+    Batches are NumPy arrays: group keys (n), hours of day (n, ignored unless
+    by_hour) and counts and speeds (n x len(VEHICLE_TYPES), NaN for missing).
+    """
+
+    def __init__(self, by_hour=False, emission_factors=None, distance_km=None):
+        self.by_hour = by_hour
+        self.hours = 24 if by_hour else 1
+        self.emission_factors = EMISSION_FACTORS if emission_factors is None else emission_factors
+        self.distance_km = EMISSION_DISTANCE_KM if distance_km is None else distance_km
+        self.groups = {}  # group key -> code
+        self.rows = 0
+        self._stats = {name: np.zeros(0) for name in _SUMS}
+        self._stats.update({name: np.full(0, -np.inf) for name in _MAXIMA})
+
+    def _slots(self):
+        return max(len(self.groups), 1) * len(VEHICLE_TYPES) * self.hours
+
+    def _grow(self):
+        size = self._slots()
+        for name, values in self._stats.items():
+            if len(values) < size:
+                grown = np.full(size, -np.inf if name in _MAXIMA else 0.0)
+                grown[:len(values)] = values
+                self._stats[name] = grown
+
+    def add_batch(self, groups, hours, counts, speeds):
+        """Fold one batch of traffic_data rows into the statistics"""
+        if len(groups) == 0:
+            return
+        index = self.groups
+        codes = np.fromiter((index.setdefault(key, len(index)) for key in groups), dtype=np.int64, count=len(groups))
+        self._grow()
+        size = self._slots()
+        types = len(VEHICLE_TYPES)
+
+        hour = np.asarray(hours, dtype=np.int64) if self.by_hour else np.zeros(len(groups), dtype=np.int64)
+        slot = (codes[:, None] * types + np.arange(types)[None, :]) * self.hours + hour[:, None]
+        slot, flow, speed = slot.ravel(), np.asarray(counts, dtype=float).ravel(), np.asarray(speeds, dtype=float).ravel()
+
+        has_flow, has_speed = ~np.isnan(flow), ~np.isnan(speed)
+        both = has_flow & has_speed
+        stats = self._stats
+        stats['flow_n'] += np.bincount(slot[has_flow], minlength=size)
+        stats['flow_sum'] += np.bincount(slot[has_flow], weights=flow[has_flow], minlength=size)
+        stats['speed_n'] += np.bincount(slot[has_speed], minlength=size)
+        stats['speed_sum'] += np.bincount(slot[has_speed], weights=speed[has_speed], minlength=size)
+        stats['flow_speed_sum'] += np.bincount(slot[both], weights=flow[both] * speed[both], minlength=size)
+        stats['flow_speed_weight'] += np.bincount(slot[both], weights=flow[both], minlength=size)
+        np.maximum.at(stats['flow_max'], slot[has_flow], flow[has_flow])
+        np.maximum.at(stats['speed_max'], slot[has_speed], speed[has_speed])
+        self.rows += len(groups)
+
+    def result(self):
+        """DataFrame with one row per group, vehicle type (and hour) that has data"""
+        columns = ['group', 'vehicle_type'] + (['hour'] if self.by_hour else []) + [
+            'measurements', 'flow_sum', 'capacity', 'vc_ratio_mean', 'speed_mean', 'free_flow_speed',
+            'delay_index_mean', 'delay_index_weighted', 'delay_index_sum', 'emission_factor', 'emissions_g']
+        if not self.groups:
+            return pd.DataFrame(columns=columns)
+
+        shape = (len(self.groups), len(VEHICLE_TYPES), self.hours)
+        stats = {name: values[:np.prod(shape)].reshape(shape) for name, values in self._stats.items()}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Capacity and free-flow speed span all hours of a group and vehicle type
+            capacity = np.broadcast_to(stats['flow_max'].max(axis=2, keepdims=True), shape)
+            free_flow = np.broadcast_to(stats['speed_max'].max(axis=2, keepdims=True), shape)
+            capacity = np.where(capacity > 0, capacity, np.nan)
+            free_flow = np.where(free_flow > 0, free_flow, np.nan)
+            flow_mean = stats['flow_sum'] / stats['flow_n']
+            speed_mean = stats['speed_sum'] / stats['speed_n']
+            factors = np.array([self.emission_factors.get(code, 0.0) for code in VEHICLE_TYPES], dtype=float)
+            factors = np.broadcast_to(factors[None, :, None], shape)
+            metrics = {
+                'measurements': np.maximum(stats['flow_n'], stats['speed_n']),
+                'flow_sum': stats['flow_sum'],
+                'capacity': capacity,
+                'vc_ratio_mean': flow_mean / capacity,
+                'speed_mean': speed_mean,
+                'free_flow_speed': free_flow,
+                'delay_index_mean': 1 - speed_mean / free_flow,
+                'delay_index_weighted': 1 - stats['flow_speed_sum'] / (stats['flow_speed_weight'] * free_flow),
+                'delay_index_sum': stats['speed_n'] - stats['speed_sum'] / free_flow,
+                'emission_factor': factors,
+                'emissions_g': stats['flow_sum'] * factors * self.distance_km,
+            }
+
+        group_index, type_index, hour_index = np.indices(shape)
+        keys = np.array(list(self.groups), dtype=object)
+        df = pd.DataFrame({'group': keys[group_index.ravel()],
+                           'vehicle_type': np.array(VEHICLE_TYPES, dtype=object)[type_index.ravel()]})
+        if self.by_hour:
+            df['hour'] = hour_index.ravel()
+        for name, values in metrics.items():
+            df[name] = np.asarray(values, dtype=float).ravel()
+        df = df[df['measurements'] > 0].reset_index(drop=True)
+        df['measurements'] = df['measurements'].astype('int64')
+        return df[columns]
+
+
+def stream_batches(connection, grouping='point', start=None, end=None, batch_size=None):
+    """Yield (groups, hours, counts, speeds) NumPy batches of traffic_data from a server-side cursor"""
+    if grouping not in GROUPINGS:
+        raise ValueError(f"Unknown grouping '{grouping}', expected one of {tuple(GROUPINGS)}")
+    group_column = GROUPINGS[grouping]
+    types = len(VEHICLE_TYPES)
+    select = [sql.Identifier(group_column) if group_column else sql.SQL("NULL"),
+              sql.SQL("extract(hour from measurement_time)::int")]
+    select += [sql.Identifier(f'{code}_count') for code in VEHICLE_TYPES]
+    select += [sql.Identifier(f'{code}_avg_speed') for code in VEHICLE_TYPES]
+
+    conditions, params = [], []
+    if start:
+        conditions.append(sql.SQL("measurement_time >= %s"))
+        params.append(start)
+    if end:
+        conditions.append(sql.SQL("measurement_time < %s"))
+        params.append(end)
+    query = sql.SQL("SELECT {} FROM public.traffic_data").format(sql.SQL(', ').join(select))
+    if conditions:
+        query += sql.SQL(" WHERE ") + sql.SQL(" AND ").join(conditions)
+
+    # A named cursor keeps the result on the server; rows arrive batch_size at a time
+    cursor = connection.cursor(name='traffic_metrics')
+    cursor.itersize = batch_size or METRICS_BATCH_SIZE
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(cursor.itersize)
+            if not rows:
+                break
+            columns = list(zip(*rows))
+            groups = ['' if value is None else value for value in columns[0]]
+            hours = np.array(columns[1], dtype=np.int64)
+            counts = np.array(columns[2:2 + types], dtype=float).T
+            speeds = np.array(columns[2 + types:], dtype=float).T
+            yield groups, hours, counts, speeds
+    finally:
+        cursor.close()
+
+
+def compute_traffic_metrics(connection, grouping='point', by_hour=False, start=None, end=None,
+                            emission_factors=None, distance_km=None, batch_size=None, progress=None):
+    """V/C ratio, delay index and emissions per group and vehicle type, in one pass over traffic_data.
+
+    grouping is 'point', 'road', 'county' or 'all'; start/end limit measurement_time
+    (end exclusive). progress, if given, is called with the rows read so far.
+    """
+    metrics = TrafficMetrics(by_hour=by_hour, emission_factors=emission_factors, distance_km=distance_km)
+    for batch in stream_batches(connection, grouping, start, end, batch_size):
+        metrics.add_batch(*batch)
+        if progress:
+            progress(metrics.rows)
+    connection.rollback()  # Ends the read-only transaction of the named cursor
+    return metrics.result()
@@ -0,0 +1,119 @@
+"""
+Swedish -> English translations from translation.txt
+The file holds comma-separated "Swedish=English" pairs. Translations are
+compiled once per process into a single regex that replaces every key in
+one pass (longest key first), and DataFrame columns are translated per
+distinct value.
+"""
+
+import os
+import re
+
+import pandas as pd
+
+try:
+    from config import TRANSLATION_FILE
+except ImportError:
+    TRANSLATION_FILE = "translation.txt"
+
+
+def normalize_text(text):
+    """Collapse whitespace (tabs, newlines, repeated spaces) to single spaces"""
+    return ' '.join(str(text).split())
+
+
+def translation_path(path=None):
+    """Path of the translation file; relative paths are resolved next to this module"""
+    path = path or TRANSLATION_FILE
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+    return path
+
+
+def read_translation_file(path=None):
+    """Parse translation.txt into a {swedish: english} dict (empty if missing)"""
+    path = translation_path(path)
+    translations = {}
+    if not os.path.exists(path):
+        return translations
+
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    # Split by comma to get individual key=value pairs
+    for pair in content.split(','):
+        pair = pair.strip()
+        # Skip empty lines and comments
+        if not pair or pair.startswith('#') or '=' not in pair:
+            continue
+        # Use maxsplit=1 in case value contains =
+        swedish, english = (part.strip() for part in pair.split('=', 1))
+        if swedish and english:
+            translations[swedish] = english
+    return translations
+
+
+# path -> (modification time, translations); re-read only when the file changes
+_file_cache = {}
+
+
+def load_translation_file(path=None):
+    """read_translation_file, cached per process until the file is modified"""
+    path = translation_path(path)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    cached = _file_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, read_translation_file(path))
+        _file_cache[path] = cached
+    return cached[1]
+
+
+class CompiledTranslations:
+    """A translation dict compiled into one alternation regex"""
+
+    def __init__(self, translations):
+        # Keys are matched against whitespace-normalized text
+        self.mapping = {normalize_text(swedish): english for swedish, english in translations.items()}
+        keys = sorted(self.mapping, key=len, reverse=True)
+        self.pattern = re.compile('|'.join(re.escape(key) for key in keys)) if keys else None
+
+    def translate_text(self, text):
+        """Normalize whitespace and replace every Swedish key in one pass"""
+        text = normalize_text(text)
+        if self.pattern is None:
+            return text
+        return self.pattern.sub(lambda match: self.mapping[match.group(0)], text)
+
+    def translate_header(self, column):
+        """Exact (whitespace-normalized) translation of a column header"""
+        return self.mapping.get(normalize_text(column), column)
+
+    def translate_series(self, series):
+        """Translate a text column, each distinct value only once"""
+        present = series.notna()
+        lookup = {value: self.translate_text(value) for value in pd.unique(series[present])}
+        return series.map(lookup).where(present, series)
+
+    def apply(self, df):
+        """Translate headers and all text columns of a DataFrame (in place; returns it)"""
+        df.columns = [self.translate_header(column) for column in df.columns]
+        for column in df.columns:
+            if df[column].dtype == 'object':  # Only for string columns
+                df[column] = self.translate_series(df[column])
+        return df
+
+
+# Compiled translations per distinct dict, reused for every export in this process
+_compiled_cache = {}
+
+
+def compile_translations(translations):
+    """CompiledTranslations for a {swedish: english} dict, cached per process"""
+    key = tuple(sorted(translations.items()))
+    compiled = _compiled_cache.get(key)
+    if compiled is None:
+        compiled = _compiled_cache[key] = CompiledTranslations(translations)
+    return compiled